@@ -0,0 +1,464 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.e2e_load
+~~~~~~~~~~~~~~~~~
+
+This script load tests the whole stack on localhost. It starts
+``start_backend.py`` on one or more ports, ``tracker.py`` and
+``start_proxy.py`` with a generated virtual host configuration routing
+``bench.local`` to the backends and ``tracker.local`` to the tracker, then
+sends a weighted mix of requests (see :data:`SCENARIOS`) at a fixed rate.
+
+The load is open-loop: the send time of every request is fixed in advance
+(constant or Poisson arrivals) and its latency is measured from that time,
+so a slow server delays the following requests instead of slowing the
+generator down, and queueing shows in the tail. ``--connections`` is the
+number of requests that may be outstanding at once; when they are all busy
+the lag of the generator is reported.
+
+The throughput, the latency quantiles (p50, p90, p99, p99.9) per scenario,
+the ``/stats`` of the proxy admin listener and the commit are written to a
+JSON file; ``--compare`` prints the change against an earlier one.
+
+Usage::
+
+  $ python bench/e2e_load.py --rate 300 --duration 20 --connections 32
+  $ python bench/e2e_load.py --engine asyncio --mix proxy-page=1 \\
+        --compare bench/results/e2e-3f2a1c0-20251020-101500.json
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from upstream_latency import percentile
+
+#: Directory of the start scripts.
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+#: Default directory of the result files.
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+#: Loopback ports of the proxy, its admin listener, the tracker and the
+#: first backend; the other backends take the following ports.
+PROXY_PORT = 9600
+ADMIN_PORT = 9601
+TRACKER_PORT = 9602
+BACKEND_PORT = 9610
+
+#: Seconds a request may take before it counts as a timeout.
+REQUEST_TIMEOUT = 10.0
+
+#: Seconds the services have to start listening.
+START_TIMEOUT = 10.0
+
+#: Latency quantiles reported, in percent.
+QUANTILES = (50, 90, 99, 99.9)
+
+#: Default request mix, scenario=weight.
+DEFAULT_MIX = 'proxy-page=4,proxy-static=2,proxy-tracker=1,backend-page=2,tracker-list=1'
+
+_COOKIE = 'Cookie: auth=true\r\n'
+
+#: name -> (service, request). The service is ``proxy``, ``backend`` (the
+#: first one, bypassing the proxy) or ``tracker``.
+SCENARIOS = {
+    'proxy-page': ('proxy',
+        "GET /index.html HTTP/1.1\r\nHost: bench.local\r\n" + _COOKIE +
+        "Connection: close\r\n\r\n"),
+    'proxy-static': ('proxy',
+        "GET /css/styles.css HTTP/1.1\r\nHost: bench.local\r\n" + _COOKIE +
+        "Connection: close\r\n\r\n"),
+    'proxy-tracker': ('proxy',
+        "GET /get-channels HTTP/1.1\r\nHost: tracker.local\r\n" + _COOKIE +
+        "Connection: close\r\n\r\n"),
+    'backend-page': ('backend',
+        "GET /index.html HTTP/1.1\r\nHost: bench.local\r\n" + _COOKIE +
+        "Connection: close\r\n\r\n"),
+    'tracker-list': ('tracker',
+        "GET /get-list HTTP/1.1\r\nHost: tracker.local\r\n" + _COOKIE +
+        "Connection: close\r\n\r\n"),
+    'tracker-submit': ('tracker',
+        "POST /submit-info HTTP/1.1\r\nHost: tracker.local\r\n" + _COOKIE +
+        "Content-Type: application/json\r\nContent-Length: 44\r\n"
+        "Connection: close\r\n\r\n"
+        '{"ip": "127.0.0.1", "port": 7000, "name": ""}'),
+}
+
+PROXY_CONF = '''host "bench.local" {{
+{upstreams}
+    dist_policy {policy}
+}}
+
+host "tracker.local" {{
+    proxy_pass http://127.0.0.1:{tracker};
+}}
+'''
+
+
+def parse_mix(text):
+    """
+    Parse ``scenario=weight,...``.
+
+    :rtype list: (scenario, weight) pairs.
+    :raises ValueError: on an unknown scenario or a bad weight.
+    """
+    mix = []
+    for item in text.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in SCENARIOS:
+            raise ValueError("unknown scenario {!r}, one of {}".format(
+                name, ', '.join(SCENARIOS)))
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def schedule(rate, duration, arrival, mix, seed):
+    """
+    The send offsets and scenarios of the whole run.
+
+    :params rate (float): requests per second.
+    :params duration (float): seconds of load.
+    :params arrival (str): ``constant`` or ``poisson`` inter-arrival times.
+    :params mix (list): (scenario, weight) pairs.
+
+    :rtype list: (offset in seconds, scenario) sorted by offset.
+    """
+    rng = random.Random(seed)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    jobs = []
+    offset = 0.0
+    while offset < duration:
+        jobs.append((offset, rng.choices(names, weights)[0]))
+        offset += rng.expovariate(rate) if arrival == 'poisson' else 1.0 / rate
+    return jobs
+
+
+def send(address, raw):
+    """
+    One request on a new connection, read to the end of the response.
+
+    :rtype tuple: (status code or None, response bytes, error name or None).
+    """
+    try:
+        with socket.create_connection(address, timeout=REQUEST_TIMEOUT) as sock:
+            sock.sendall(raw)
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+    except socket.timeout:
+        return None, 0, 'timeout'
+    except OSError as e:
+        return None, 0, type(e).__name__
+    response = b''.join(chunks)
+    try:
+        return int(response.split(b' ', 2)[1]), len(response), None
+    except (IndexError, ValueError):
+        return None, len(response), 'bad_response'
+
+
+def drive(jobs, targets, connections):
+    """
+    Send ``jobs`` from ``connections`` threads, each request at its offset.
+
+    :params targets (dict): service -> (host, port).
+
+    :rtype list: (offset, scenario, latency, lag, status, bytes, error).
+    """
+    requests = {name: (targets[service], raw.encode('latin-1'))
+                for name, (service, raw) in SCENARIOS.items()}
+    counter = itertools.count()
+    results = []
+    start = time.perf_counter() + 0.1
+
+    def worker():
+        while True:
+            index = next(counter)
+            if index >= len(jobs):
+                return
+            offset, name = jobs[index]
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            began = time.perf_counter()
+            status, size, error = send(*requests[name])
+            done = time.perf_counter()
+            results.append((offset, name, done - scheduled, began - scheduled,
+                            status, size, error))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summary(latencies, window):
+    """Count, throughput and latency quantiles in milliseconds."""
+    latencies = sorted(latencies)
+    result = {"requests": len(latencies),
+              "throughput": len(latencies) / window if window else None}
+    if latencies:
+        result["mean_ms"] = statistics.fmean(latencies) * 1e3
+        for q in QUANTILES:
+            result["p{}_ms".format(str(q).replace('.', ''))] = percentile(latencies, q) * 1e3
+        result["max_ms"] = latencies[-1] * 1e3
+    return result
+
+
+def report(results, warmup, duration):
+    """
+    Aggregate the results of the measured window (after ``warmup``).
+
+    :rtype dict: ``"overall"`` and ``"scenarios"`` summaries.
+    """
+    window = duration - warmup
+    measured = [r for r in results if r[0] >= warmup]
+    document = {"overall": None, "scenarios": {}}
+    groups = {}
+    for item in measured:
+        groups.setdefault(item[1], []).append(item)
+    for name, items in sorted(groups.items()) + [(None, measured)]:
+        ok = [latency for _, _, latency, _, status, _, error in items
+              if error is None and status < 500]
+        entry = summary(ok, window)
+        entry["offered"] = len(items)
+        entry["errors"] = {}
+        entry["statuses"] = {}
+        for _, _, _, _, status, _, error in items:
+            if error is not None:
+                entry["errors"][error] = entry["errors"].get(error, 0) + 1
+            else:
+                entry["statuses"][str(status)] = entry["statuses"].get(str(status), 0) + 1
+        entry["received_bytes"] = sum(item[5] for item in items)
+        if name is None:
+            lags = sorted(item[3] for item in items)
+            entry["max_lag_ms"] = lags[-1] * 1e3 if lags else None
+            document["overall"] = entry
+        else:
+            document["scenarios"][name] = entry
+    return document
+
+
+def wait_listening(process, port, log_path):
+    """Wait until ``port`` accepts, failing early if ``process`` exited."""
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    with open(log_path, errors='replace') as f:
+        tail = f.read()[-2000:]
+    raise RuntimeError("{} did not listen on {}:\n{}".format(process.args[1], port, tail))
+
+
+@contextlib.contextmanager
+def services(args, workdir):
+    """
+    Run the backends, the tracker and the proxy for the ``with`` block.
+
+    :rtype dict: service -> (host, port) of the targets.
+    """
+    backend_ports = [args.backend_port + i for i in range(args.backends)]
+    conf = os.path.join(workdir, 'proxy.conf')
+    with open(conf, 'w') as f:
+        f.write(PROXY_CONF.format(
+            upstreams='\n'.join('    proxy_pass http://127.0.0.1:{};'.format(port)
+                                for port in backend_ports),
+            policy=args.policy, tracker=args.tracker_port))
+    log_level = ['--log-level', 'warning']
+    commands = [('backend-{}'.format(port), port,
+                 ['start_backend.py', '--server-ip', '127.0.0.1',
+                  '--server-port', str(port)] + log_level)
+                for port in backend_ports]
+    commands.append(('tracker', args.tracker_port,
+                     ['tracker.py', '--server-ip', '127.0.0.1',
+                      '--server-port', str(args.tracker_port)]))
+    commands.append(('proxy', args.proxy_port,
+                     ['start_proxy.py', '--server-ip', '127.0.0.1',
+                      '--server-port', str(args.proxy_port), '--config', conf,
+                      '--engine', args.engine, '--cache-size', str(args.cache_size),
+                      '--admin-port', str(args.admin_port)] + log_level))
+    processes = []
+    try:
+        for name, port, command in commands:
+            log_path = os.path.join(workdir, name + '.log')
+            with open(log_path, 'w') as log_file:
+                process = subprocess.Popen([sys.executable] + command, cwd=ROOT,
+                                           stdout=log_file, stderr=subprocess.STDOUT)
+            processes.append(process)
+            wait_listening(process, port, log_path)
+        yield {
+            'proxy': ('127.0.0.1', args.proxy_port),
+            'backend': ('127.0.0.1', backend_ports[0]),
+            'tracker': ('127.0.0.1', args.tracker_port),
+        }
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def proxy_stats(port):
+    """The ``/stats`` document of the proxy admin listener, or None."""
+    try:
+        with urllib.request.urlopen('http://127.0.0.1:{}/stats'.format(port), timeout=5) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def commit():
+    """Short hash of the checked out commit, with ``-dirty`` for local changes."""
+    try:
+        head = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return head + ('-dirty' if dirty else '')
+
+
+def print_report(document, baseline=None):
+    """Print one line per scenario, with the change against ``baseline``."""
+    columns = ['p{}_ms'.format(str(q).replace('.', '')) for q in QUANTILES]
+    print("{:<15} {:>8} {:>9} {:>9} {:>9} {:>9} {:>9} {:>7}".format(
+        'scenario', 'requests', 'req/s', *[c[:-3] + ' ms' for c in columns], 'errors'))
+    rows = sorted(document["scenarios"].items()) + [('overall', document["overall"])]
+    for name, entry in rows:
+        values = [entry.get(c) for c in columns]
+        print("{:<15} {:>8} {:>9.1f} {} {:>7}".format(
+            name, entry["requests"], entry["throughput"] or 0.0,
+            ' '.join('{:>9.2f}'.format(v) if v is not None else '{:>9}'.format('-')
+                     for v in values),
+            sum(entry["errors"].values())))
+        if baseline is None:
+            continue
+        old = baseline["overall"] if name == 'overall' else baseline["scenarios"].get(name)
+        if not old:
+            continue
+        changes = []
+        for key in ['throughput'] + columns:
+            if old.get(key) and entry.get(key) is not None:
+                changes.append('{:>+8.1f}%'.format((entry[key] / old[key] - 1) * 100))
+            else:
+                changes.append('{:>9}'.format('-'))
+        print("{:<15} {:>8} {}".format('  vs baseline', '', ' '.join(changes)))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='e2e_load',
+        description='Open-loop load test of the backend, proxy and tracker')
+    parser.add_argument('--rate', type=float, default=200.0,
+        help='Requests per second offered. Default is 200.')
+    parser.add_argument('--duration', type=float, default=10.0,
+        help='Seconds of load, warm-up included. Default is 10.')
+    parser.add_argument('--warmup', type=float, default=2.0,
+        help='Seconds at the start left out of the results. Default is 2.')
+    parser.add_argument('--connections', type=int, default=32,
+        help='Requests outstanding at most. Default is 32.')
+    parser.add_argument('--arrival', choices=['constant', 'poisson'], default='poisson')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+        help='Weighted scenarios among {}. Default is {}.'.format(
+            ', '.join(SCENARIOS), DEFAULT_MIX))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--backends', type=int, default=2,
+        help='Backends behind bench.local. Default is 2.')
+    parser.add_argument('--policy', default='round-robin',
+        help='dist_policy of bench.local. Default is round-robin.')
+    parser.add_argument('--engine', choices=['thread', 'asyncio'], default='thread')
+    parser.add_argument('--cache-size', type=int, default=0,
+        help='Proxy response cache in MB. Default is 0, off.')
+    parser.add_argument('--proxy-port', type=int, default=PROXY_PORT)
+    parser.add_argument('--admin-port', type=int, default=ADMIN_PORT)
+    parser.add_argument('--tracker-port', type=int, default=TRACKER_PORT)
+    parser.add_argument('--backend-port', type=int, default=BACKEND_PORT)
+    parser.add_argument('--output', default=None,
+        help='Result file. Default is {}/e2e-<commit>-<time>.json.'.format(
+            os.path.relpath(RESULTS_DIR)))
+    parser.add_argument('--compare', default=None,
+        help='Earlier result file to compare with.')
+    args = parser.parse_args()
+    if args.warmup >= args.duration:
+        parser.error('--warmup must be shorter than --duration')
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    jobs = schedule(args.rate, args.duration, args.arrival, mix, args.seed)
+    workdir = tempfile.mkdtemp(prefix='weaprous-bench-')
+    started = time.strftime('%Y%m%d-%H%M%S')
+    with services(args, workdir) as targets:
+        results = drive(jobs, targets, args.connections)
+        stats = proxy_stats(args.admin_port)
+
+    document = report(results, args.warmup, args.duration)
+    revision = commit()
+    document.update({
+        "commit": revision,
+        "started": started,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "logs": workdir,
+        "proxy_stats": stats,
+    })
+    output = args.output or os.path.join(
+        RESULTS_DIR, 'e2e-{}-{}.json'.format(revision, started))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("baseline {} ({})".format(baseline.get("commit"), args.compare))
+    print_report(document, baseline)
+    if document["overall"]["max_lag_ms"] and document["overall"]["max_lag_ms"] > 100:
+        print("generator lagged up to {:.0f} ms behind the schedule: the services or "
+              "--connections saturated".format(document["overall"]["max_lag_ms"]))
+    print("results written to {}".format(output))
+
+
+if __name__ == "__main__":
+    main()
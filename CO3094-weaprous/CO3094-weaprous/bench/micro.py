@@ -0,0 +1,331 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.micro
+~~~~~~~~~~~~~~~~~
+
+This script times the hot functions of a request in-process, without any
+network: :meth:`Request.prepare <daemon.request.Request.prepare>` on
+browser-like requests, :meth:`Response.build_response_header` and
+:meth:`Response.build_response` per MIME class (the static file cache is
+warm after the calibration), :class:`CaseInsensitiveDict` operations,
+:func:`resolve_routing_policy <daemon.proxy.resolve_routing_policy>` per
+``dist_policy`` and ``parse_virtual_hosts`` on generated configurations
+of several sizes.
+
+Each case is calibrated to run for about ``--min-time`` seconds, then
+timed ``--repeat`` times with :func:`time.perf_counter_ns`; the minimum
+and the median per call are reported. The minimum is the figure to
+compare between commits, the median shows the noise. Results are written
+to JSON like those of :mod:`bench.e2e_load` and ``--compare`` prints the
+change against an earlier file.
+
+Usage::
+
+  $ python bench/micro.py
+  $ python bench/micro.py --filter response --compare bench/results/micro-3f2a1c0-20251020-101500.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from e2e_load import RESULTS_DIR, ROOT, commit
+
+sys.path.insert(0, ROOT)
+
+from daemon import CaseInsensitiveDict, Request, Response, WeApRous
+from daemon.balancer import POLICIES
+from daemon.proxy import resolve_routing_policy, upstream_tracker
+from daemon.routing import compile_routes
+from start_proxy import parse_virtual_hosts
+
+#: Requests as a browser sends them to the backend.
+BROWSER_GET = (
+    "GET /index.html HTTP/1.1\r\n"
+    "Host: app1.local:8080\r\n"
+    "Connection: keep-alive\r\n"
+    "Cache-Control: max-age=0\r\n"
+    "sec-ch-ua: \"Chromium\";v=\"124\", \"Google Chrome\";v=\"124\", \"Not-A.Brand\";v=\"99\"\r\n"
+    "sec-ch-ua-mobile: ?0\r\n"
+    "sec-ch-ua-platform: \"Linux\"\r\n"
+    "Upgrade-Insecure-Requests: 1\r\n"
+    "User-Agent: Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36\r\n"
+    "Accept: text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,"
+    "image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7\r\n"
+    "Sec-Fetch-Site: same-origin\r\n"
+    "Sec-Fetch-Mode: navigate\r\n"
+    "Sec-Fetch-User: ?1\r\n"
+    "Sec-Fetch-Dest: document\r\n"
+    "Referer: http://app1.local:8080/login.html\r\n"
+    "Accept-Encoding: gzip, deflate, br, zstd\r\n"
+    "Accept-Language: en-US,en;q=0.9,vi;q=0.8\r\n"
+    "Cookie: auth=true; theme=dark; _ga=GA1.1.1234567890.1712345678\r\n"
+    "\r\n"
+)
+
+BROWSER_LOGIN = (
+    "POST /login HTTP/1.1\r\n"
+    "Host: app1.local:8080\r\n"
+    "Connection: keep-alive\r\n"
+    "Content-Length: 32\r\n"
+    "Origin: http://app1.local:8080\r\n"
+    "Content-Type: application/x-www-form-urlencoded\r\n"
+    "User-Agent: Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36\r\n"
+    "Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8\r\n"
+    "Referer: http://app1.local:8080/login.html\r\n"
+    "Accept-Encoding: gzip, deflate, br\r\n"
+    "Accept-Language: en-US,en;q=0.9\r\n"
+    "\r\n"
+    "username=admin&password=password"
+)
+
+FETCH_JSON = (
+    "POST /join-channel HTTP/1.1\r\n"
+    "Host: tracker.local:8000\r\n"
+    "Connection: keep-alive\r\n"
+    "Content-Length: 58\r\n"
+    "Content-Type: application/json\r\n"
+    "Accept: */*\r\n"
+    "Origin: http://app1.local:8080\r\n"
+    "User-Agent: Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36\r\n"
+    "Cookie: auth=true\r\n"
+    "\r\n"
+    '{"channel": "general", "username": "alice", "port": 7001}'
+)
+
+#: Static paths per MIME class served by :meth:`Response.build_response`.
+STATIC_PATHS = {
+    'html-small': '/index.html',
+    'html-large': '/chat.html',
+    'css': '/css/styles.css',
+    'png': '/images/welcome.png',
+    'jpeg': '/images/welcome.jpg',
+    'icon': '/images/favicon.ico',
+    'octet-stream': '/download.bin',
+}
+
+#: Host blocks of the generated configurations.
+CONFIG_SIZES = (10, 100, 1000)
+
+
+app = WeApRous()
+
+@app.route('/login', methods=['POST'])
+def login(headers, body):
+    return {"auth": True}
+
+@app.route('/join-channel', methods=['POST'])
+def join_channel(headers, body):
+    return {"success": True}
+
+
+def request_cases():
+    routes = app.routes
+    return {
+        'request.prepare browser-get': lambda: Request().prepare(BROWSER_GET, routes),
+        'request.prepare form-login': lambda: Request().prepare(BROWSER_LOGIN, routes),
+        'request.prepare json-post': lambda: Request().prepare(FETCH_JSON, routes),
+    }
+
+
+def response_cases():
+    cases = {}
+    request = Request().prepare(BROWSER_GET, app.routes)
+
+    def header():
+        resp = Response()
+        resp.headers['Content-Type'] = 'text/html'
+        resp._content = b'x' * 512
+        return resp.build_response_header(request)
+
+    cases['response.build_response_header'] = header
+    for name, path in STATIC_PATHS.items():
+        static = Request().prepare(BROWSER_GET.replace('/index.html', path, 1), app.routes)
+        cases['response.build_response ' + name] = \
+            lambda static=static: Response().build_response(static)
+    return cases
+
+
+def dictionary_cases():
+    headers = Request().prepare(BROWSER_GET, app.routes).headers
+    table = CaseInsensitiveDict(headers)
+    return {
+        'dict.init browser headers': lambda: CaseInsensitiveDict(headers),
+        'dict.get hit': lambda: table['User-Agent'],
+        'dict.get miss': lambda: table.get('X-Forwarded-For'),
+        'dict.set': lambda: table.__setitem__('Content-Type', 'text/html'),
+        'dict.contains': lambda: 'cookie' in table,
+    }
+
+
+def routing_cases():
+    cases = {}
+    upstreams = ['127.0.0.1:{}'.format(9100 + i) for i in range(8)]
+    for upstream in upstreams:
+        # Give the EWMA policy latencies to compare.
+        upstream_tracker.acquire(upstream)
+        upstream_tracker.release(upstream, 0.001 * (1 + int(upstream[-1])))
+    for policy in POLICIES:
+        # Compiled once, like the proxy does at startup and on reload
+        routes = compile_routes({
+            'app.local': (upstreams, policy, {}),
+            'api.local': (upstreams[:2], policy, {'locations': {
+                '/v1': (upstreams[2:4], policy, {}),
+            }}),
+        }, upstream_tracker)
+
+        def resolve(routes=routes):
+            host, port = resolve_routing_policy('app.local', routes, '/index.html')
+            upstream_tracker.release('{}:{}'.format(host, port))
+
+        cases['routing.resolve ' + policy] = resolve
+    return cases
+
+
+def generate_config(hosts):
+    """A configuration of ``hosts`` host blocks using most directives."""
+    blocks = []
+    for i in range(hosts):
+        upstreams = ''.join(
+            '    proxy_pass http://10.0.{}.{}:{} max_conns=16 queue=32 queue_timeout=500ms;\n'
+            .format(i // 250, j + 1, 9000 + i % 1000) for j in range(3))
+        blocks.append(
+            'host "app{i}.example.local" {{\n'
+            '    proxy_set_header Host $host;\n'
+            '{upstreams}'
+            '    dist_policy least-conn\n'
+            '    proxy_connect_timeout 2;\n'
+            '    proxy_read_timeout 30s;\n'
+            '    proxy_coalesce on;\n'
+            '    location /api {{\n'
+            '        proxy_pass http://10.1.{a}.1:9100;\n'
+            '        proxy_read_timeout 500ms;\n'
+            '    }}\n'
+            '}}\n'.format(i=i, upstreams=upstreams, a=i // 250))
+    return '\n'.join(blocks)
+
+
+def config_cases(directory):
+    cases = {}
+    for hosts in CONFIG_SIZES:
+        path = os.path.join(directory, 'proxy-{}.conf'.format(hosts))
+        with open(path, 'w') as f:
+            f.write(generate_config(hosts))
+
+        def parse(path=path):
+            # parse_virtual_hosts prints every route.
+            with contextlib.redirect_stdout(io.StringIO()):
+                return parse_virtual_hosts(path)
+
+        cases['config.parse_virtual_hosts {} hosts'.format(hosts)] = parse
+    return cases
+
+
+def measure(function, min_time, repeat):
+    """
+    Time ``function``.
+
+    :params min_time (float): seconds each repetition lasts at least.
+    :params repeat (int): repetitions.
+
+    :rtype dict: calls per repetition, min and median nanoseconds per call.
+    """
+    loops = 1
+    while True:
+        started = time.perf_counter_ns()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter_ns() - started
+        if elapsed >= min_time * 1e9:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time * 1e9 / elapsed) + 1))
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for _ in range(loops):
+            function()
+        timings.append((time.perf_counter_ns() - started) / loops)
+    return {"loops": loops, "min_ns": min(timings), "median_ns": statistics.median(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='micro',
+        description='Microbenchmarks of parsing, response building and routing')
+    parser.add_argument('--filter', default=None,
+        help='Only run the cases whose name contains this text.')
+    parser.add_argument('--min-time', type=float, default=0.2,
+        help='Seconds per repetition. Default is 0.2.')
+    parser.add_argument('--repeat', type=int, default=5,
+        help='Repetitions per case. Default is 5.')
+    parser.add_argument('--output', default=None,
+        help='Result file. Default is {}/micro-<commit>-<time>.json.'.format(
+            os.path.relpath(RESULTS_DIR)))
+    parser.add_argument('--compare', default=None,
+        help='Earlier result file to compare with.')
+    args = parser.parse_args()
+
+    # The static files are looked up relative to the working directory.
+    os.chdir(ROOT)
+    cases = {}
+    for group in (request_cases, response_cases, dictionary_cases, routing_cases):
+        cases.update(group())
+    cases.update(config_cases(tempfile.mkdtemp(prefix='weaprous-micro-')))
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["cases"]
+
+    print("{:<42} {:>10} {:>12} {:>12} {:>9}".format(
+        'case', 'loops', 'min ns', 'median ns', 'change'))
+    results = {}
+    for name, function in cases.items():
+        if args.filter and args.filter not in name:
+            continue
+        result = results[name] = measure(function, args.min_time, args.repeat)
+        change = ''
+        if name in baseline:
+            change = '{:+.1f}%'.format((result["min_ns"] / baseline[name]["min_ns"] - 1) * 100)
+        print("{:<42} {:>10} {:>12.0f} {:>12.0f} {:>9}".format(
+            name, result["loops"], result["min_ns"], result["median_ns"], change))
+
+    revision = commit()
+    started = time.strftime('%Y%m%d-%H%M%S')
+    output = args.output or os.path.join(
+        RESULTS_DIR, 'micro-{}-{}.json'.format(revision, started))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            "commit": revision,
+            "started": started,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+            "cases": results,
+        }, f, indent=2)
+    print("results written to {}".format(output))
+
+
+if __name__ == "__main__":
+    main()
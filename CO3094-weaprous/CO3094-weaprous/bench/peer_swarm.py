@@ -0,0 +1,396 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.peer_swarm
+~~~~~~~~~~~~~~~~~
+
+This script runs a swarm of chat peers in one process against a real
+``tracker.py``, to see how the peer and tracker code behave as the swarm
+grows, without one process per peer.
+
+``peer.py`` keeps its state in module globals, so every virtual peer is a
+separate copy of the module loaded with :mod:`importlib`, with its own
+``my_p2p_port``, ``connected_peers``, ``chat_history`` and
+``message_queue``. The peers run the real code paths: their P2P server,
+``register_to_tracker``, ``get_peers_from_tracker``, ``join_channel``,
+``connect_to_peer``, ``send_to_peer`` and ``broadcast_to_channel``. Only
+``send_http_request`` is wrapped, to count and time the tracker calls.
+
+For each swarm size a fresh tracker is started and the swarm goes through
+these phases:
+
+- ``register``, ``discover`` (``/get-list``) and ``join`` of one channel:
+  tracker request rate and latency;
+- ``direct``: every peer connects to the next one and sends it a message;
+- ``broadcast``: a few peers connect to every member, then broadcast to
+  the channel ``--rounds`` times. ``broadcast_to_channel`` sleeps 0.5 s
+  after connecting to a member it did not know, so the connections are
+  made first and timed on their own.
+
+With ``--transport memory`` the P2P links run on a
+:class:`MemoryTransport <daemon.transport.MemoryTransport>` with the given
+``--latency``, ``--bandwidth`` and ``--loss``, instead of loopback TCP;
+the tracker is still reached over TCP.
+
+Every message carries its send time; the delivery latency is taken from
+the timestamp the receiving peer puts on it, the fan-out time of a
+broadcast from its last delivery. Messages a receiver could not decode
+(two messages read by one ``recv``) count as lost.
+
+Usage::
+
+  $ python bench/peer_swarm.py --sizes 10,50,200 --broadcasters 2
+  $ python bench/peer_swarm.py --transport memory --latency 0.02 --loss 0.01
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import queue
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from e2e_load import RESULTS_DIR, ROOT, commit, summary
+
+sys.path.insert(0, ROOT)
+
+from daemon import handoff
+from daemon.transport import TCP, MemoryTransport
+
+#: Source of the virtual peers.
+PEER_PATH = os.path.join(ROOT, 'peer.py')
+
+#: Loopback port of the tracker and first P2P port of the virtual peers.
+TRACKER_PORT = 9700
+P2P_BASE_PORT = 21000
+
+#: Channel every peer joins.
+CHANNEL = 'swarm'
+
+#: Seconds to wait for the last deliveries of a phase.
+SETTLE_TIMEOUT = 10.0
+
+#: Marker of the messages sent by the simulator.
+MARKER = 'swarm'
+
+
+class TrackerCalls:
+    """Latencies of the tracker calls of the current phase."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+
+    def wrap(self, function):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                with self.lock:
+                    self.errors += 1
+                raise
+            finally:
+                with self.lock:
+                    self.latencies.append(time.perf_counter() - started)
+        return timed
+
+    def take(self):
+        with self.lock:
+            latencies, errors = self.latencies, self.errors
+            self.latencies, self.errors = [], 0
+        return latencies, errors
+
+
+def load_peer(index, p2p_port, tracker_port, calls, transport):
+    """A new copy of ``peer.py`` set up as one virtual peer."""
+    spec = importlib.util.spec_from_file_location('swarm_peer_{}'.format(index), PEER_PATH)
+    peer = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(peer)
+    peer.my_ip = '127.0.0.1'
+    peer.my_p2p_port = p2p_port
+    peer.my_username = 'peer{}'.format(index)
+    peer.tracker_ip = '127.0.0.1'
+    peer.tracker_port = tracker_port
+    peer.transport = transport
+    peer.send_http_request = calls.wrap(peer.send_http_request)
+    return peer
+
+
+def peer_id(peer):
+    return '{}:{}'.format(peer.my_ip, peer.my_p2p_port)
+
+
+def start_tracker(port, workdir):
+    log_path = os.path.join(workdir, 'tracker-{}.log'.format(port))
+    with open(log_path, 'w') as log_file:
+        process = subprocess.Popen(
+            [sys.executable, 'tracker.py', '--server-ip', '127.0.0.1',
+             '--server-port', str(port)],
+            cwd=ROOT, stdout=log_file, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("tracker did not start, see {}".format(log_path))
+
+
+def run_all(function, items, concurrency):
+    """Call ``function`` on every item from ``concurrency`` threads."""
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(function, items))
+
+
+def message(kind, sender, number):
+    return '{}|{}|{}|{}|{!r}'.format(MARKER, kind, sender, number, time.time())
+
+
+def collect(peers, expected, timeout=SETTLE_TIMEOUT):
+    """
+    Drain the message queues of ``peers`` until ``expected`` simulator
+    messages arrived or ``timeout`` passed.
+
+    :rtype list: (kind, sender, number, latency in seconds).
+    """
+    received = []
+    deadline = time.monotonic() + timeout
+    while len(received) < expected and time.monotonic() < deadline:
+        for peer in peers:
+            while True:
+                try:
+                    item = peer.message_queue.get_nowait()
+                except queue.Empty:
+                    break
+                parts = str(item.get('message', '')).split('|')
+                if len(parts) != 5 or parts[0] != MARKER:
+                    continue
+                arrived = datetime.datetime.fromisoformat(item['timestamp']).timestamp()
+                received.append((parts[1], parts[2], parts[3], arrived - float(parts[4])))
+        time.sleep(0.01)
+    return received
+
+
+def phase_result(calls, started, **extra):
+    latencies, errors = calls.take()
+    elapsed = time.perf_counter() - started
+    result = {"seconds": elapsed}
+    if latencies:
+        tracker = summary(latencies, elapsed)
+        tracker["errors"] = errors
+        result["tracker"] = tracker
+    result.update(extra)
+    return result
+
+
+def run_swarm(size, args, workdir, port_offset):
+    """Run every phase with ``size`` peers and return their measurements."""
+    calls = TrackerCalls()
+    tracker_port = args.tracker_port + port_offset
+    tracker = start_tracker(tracker_port, workdir)
+    transport = TCP
+    if args.transport == 'memory':
+        transport = MemoryTransport(args.latency, args.bandwidth, args.loss, seed=args.seed)
+    peers = [load_peer(i, args.p2p_port + port_offset * args.max_peers + i,
+                       tracker_port, calls, transport) for i in range(size)]
+    threads = [threading.Thread(target=peer.start_p2p_server, daemon=True)
+               for peer in peers]
+    results = {"peers": size}
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+
+        started = time.perf_counter()
+        run_all(lambda peer: peer.register_to_tracker(), peers, args.concurrency)
+        results["register"] = phase_result(calls, started)
+
+        started = time.perf_counter()
+        run_all(lambda peer: peer.get_peers_from_tracker(), peers, args.concurrency)
+        results["discover"] = phase_result(
+            calls, started, known=sum(len(peer.peers_info) for peer in peers) / size)
+
+        peers[0].send_http_request('POST', '/add-channel', {"name": CHANNEL})
+        calls.take()
+        started = time.perf_counter()
+        joined = run_all(lambda peer: peer.join_channel(CHANNEL), peers, args.concurrency)
+        results["join"] = phase_result(calls, started, joined=sum(joined))
+
+        # Every peer sends one message to the next one.
+        pairs = [(peer, peers[(i + 1) % size]) for i, peer in enumerate(peers)]
+        started = time.perf_counter()
+        run_all(lambda pair: pair[0].connect_to_peer(pair[1].my_ip, pair[1].my_p2p_port),
+                pairs, args.concurrency)
+        connected = time.perf_counter() - started
+        started = time.perf_counter()
+        sent = run_all(lambda pair: pair[0].send_to_peer(
+            peer_id(pair[1]), message('direct', pair[0].my_username, 0)),
+            pairs, args.concurrency)
+        received = collect(peers, sum(sent))
+        results["direct"] = phase_result(
+            calls, started, connect_seconds=connected, sent=sum(sent),
+            delivered=len(received), latency=summary([r[3] for r in received], None))
+
+        # A few peers broadcast to the whole channel.
+        broadcasters = peers[:args.broadcasters]
+        started = time.perf_counter()
+        run_all(lambda item: item[0].connect_to_peer(item[1].my_ip, item[1].my_p2p_port),
+                [(sender, member) for sender in broadcasters for member in peers
+                 if member is not sender], args.concurrency)
+        connected = time.perf_counter() - started
+        calls.take()
+        started = time.perf_counter()
+        fanouts = []
+        latencies = []
+        delivered = expected = 0
+        for number in range(args.rounds):
+            def send(sender):
+                begun = time.perf_counter()
+                count = sender.broadcast_to_channel(
+                    CHANNEL, message('channel', sender.my_username, number))
+                return count, time.perf_counter() - begun
+            outcomes = run_all(send, broadcasters, len(broadcasters))
+            round_expected = sum(count for count, _ in outcomes)
+            received = collect(peers, round_expected)
+            expected += round_expected
+            delivered += len(received)
+            latencies.extend(r[3] for r in received)
+            for sender in broadcasters:
+                own = [r[3] for r in received if r[1] == sender.my_username]
+                if own:
+                    fanouts.append(max(own))
+            time.sleep(args.interval)
+        results["broadcast"] = phase_result(
+            calls, started, connect_seconds=connected, broadcasters=len(broadcasters),
+            rounds=args.rounds, sent=expected, delivered=delivered,
+            latency=summary(latencies, None), fanout=summary(fanouts, None))
+        results["threads"] = threading.active_count()
+        if transport is not TCP:
+            results["transport"] = dict(transport.stats)
+    finally:
+        # Stop the P2P accept loops and close every peer connection.
+        handoff.stopping.set()
+        for thread in threads:
+            thread.join(handoff.ACCEPT_POLL * 4)
+        for peer in peers:
+            for sock in list(peer.connected_peers.values()):
+                with contextlib.suppress(OSError):
+                    sock.shutdown(socket.SHUT_RDWR)
+        handoff.stopping.clear()
+        tracker.terminate()
+        tracker.wait()
+    return results
+
+
+def print_results(results, out):
+    out.write("{:>6} {:>10} {:>10} {:>10} {:>10} {:>12} {:>12} {:>12} {:>9}\n".format(
+        'peers', 'reg req/s', 'reg p99', 'join p99', 'disc p99', 'direct p99',
+        'bcast p99', 'fanout max', 'lost'))
+
+    def ms(value):
+        return '{:.1f}ms'.format(value) if value is not None else '-'
+
+    for entry in results:
+        lost = sum(entry[name]["sent"] - entry[name]["delivered"]
+                   for name in ('direct', 'broadcast'))
+        out.write("{:>6} {:>10.0f} {:>10} {:>10} {:>10} {:>12} {:>12} {:>12} {:>9}\n".format(
+            entry["peers"], entry["register"]["tracker"]["throughput"],
+            ms(entry["register"]["tracker"].get("p99_ms")),
+            ms(entry["join"]["tracker"].get("p99_ms")),
+            ms(entry["discover"]["tracker"].get("p99_ms")),
+            ms(entry["direct"]["latency"].get("p99_ms")),
+            ms(entry["broadcast"]["latency"].get("p99_ms")),
+            ms(entry["broadcast"]["fanout"].get("max_ms")), lost))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='peer_swarm',
+        description='In-process swarm of chat peers against a real tracker')
+    parser.add_argument('--sizes', default='10,50,200',
+        help='Comma separated swarm sizes. Default is 10,50,200.')
+    parser.add_argument('--broadcasters', type=int, default=2,
+        help='Peers broadcasting to the channel. Default is 2.')
+    parser.add_argument('--rounds', type=int, default=5,
+        help='Broadcasts per broadcaster. Default is 5.')
+    parser.add_argument('--interval', type=float, default=0.2,
+        help='Seconds between two broadcast rounds. Default is 0.2.')
+    parser.add_argument('--concurrency', type=int, default=16,
+        help='Peers calling the tracker or connecting at once. Default is 16.')
+    parser.add_argument('--transport', choices=['tcp', 'memory'], default='tcp',
+        help='Transport of the P2P links. Default is tcp.')
+    parser.add_argument('--latency', type=float, default=0.0,
+        help='One-way latency of the memory transport in seconds.')
+    parser.add_argument('--bandwidth', type=float, default=None,
+        help='Bytes per second of each memory link direction. Default is unlimited.')
+    parser.add_argument('--loss', type=float, default=0.0,
+        help='Segment loss probability of the memory transport.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tracker-port', type=int, default=TRACKER_PORT)
+    parser.add_argument('--p2p-port', type=int, default=P2P_BASE_PORT)
+    parser.add_argument('--output', default=None,
+        help='Result file. Default is {}/swarm-<commit>-<time>.json.'.format(
+            os.path.relpath(RESULTS_DIR)))
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    args.max_peers = max(sizes)
+
+    # Two sockets per connection, several connections per peer.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    out = sys.stdout
+    workdir = tempfile.mkdtemp(prefix='weaprous-swarm-')
+    started = time.strftime('%Y%m%d-%H%M%S')
+    results = []
+    # The peers print every message they handle.
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for offset, size in enumerate(sizes):
+            results.append(run_swarm(size, args, workdir, offset))
+            out.write("{} peers done\n".format(size))
+            out.flush()
+
+    print_results(results, out)
+    revision = commit()
+    output = args.output or os.path.join(
+        RESULTS_DIR, 'swarm-{}-{}.json'.format(revision, started))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            "commit": revision,
+            "started": started,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+            "logs": workdir,
+            "swarms": results,
+        }, f, indent=2)
+    print("results written to {}".format(output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.upstream_latency
+~~~~~~~~~~~~~~~~~
+
+This script compares the latency of the proxy to backend hop over loopback
+TCP and over a Unix domain socket. It starts the same WeApRous backend on
+both transports in-process and times :func:`forward_request
+<daemon.proxy.forward_request>` against each, alternating the two so that
+both see the same machine load.
+
+Usage::
+
+  $ python bench/upstream_latency.py --requests 2000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from daemon import WeApRous
+from daemon.backend import run_backend
+from daemon.proxy import FORWARD_ERROR, GATEWAY_TIMEOUT, forward_request
+
+#: Loopback port of the TCP backend.
+TCP_PORT = 9550
+
+#: Request sent on every exchange.
+REQUEST = (
+    "GET /ping HTTP/1.1\r\n"
+    "Host: bench.local\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+)
+
+
+app = WeApRous()
+
+@app.route('/ping', methods=['GET'])
+def ping(headers, body):
+    return {"pong": True}
+
+
+def percentile(samples, q):
+    """
+    Nearest-rank percentile of sorted ``samples``.
+
+    :param samples (list): sorted latencies.
+    :param q (float): percentile between 0 and 100.
+    """
+    index = max(0, min(len(samples) - 1, int(round(q / 100.0 * len(samples))) - 1))
+    return samples[index]
+
+
+def summary(samples):
+    """Mean, p50, p90 and p99 of ``samples`` in microseconds."""
+    samples = sorted(samples)
+    return {
+        "mean": statistics.fmean(samples) * 1e6,
+        "p50": percentile(samples, 50) * 1e6,
+        "p90": percentile(samples, 90) * 1e6,
+        "p99": percentile(samples, 99) * 1e6,
+    }
+
+
+def wait_ready(host, port, timeout=5.0):
+    """Wait until a backend answers, the backends start in threads."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = forward_request(host, port, REQUEST)
+        if response not in (FORWARD_ERROR, GATEWAY_TIMEOUT):
+            return
+        time.sleep(0.05)
+    raise RuntimeError("backend {}:{} did not start".format(host, port))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='upstream_latency',
+        description='Loopback TCP versus Unix domain socket upstream latency')
+    parser.add_argument('--requests', type=int, default=1000,
+        help='Exchanges per transport. Default is 1000.')
+    parser.add_argument('--tcp-port', type=int, default=TCP_PORT)
+    args = parser.parse_args()
+
+    routes = app.routes
+    path = os.path.join(tempfile.mkdtemp(prefix='weaprous-'), 'backend.sock')
+    targets = {
+        'tcp': ('127.0.0.1', args.tcp_port),
+        'unix': (path, None),
+    }
+    # The backends print every request, keep that out of the measurement.
+    with contextlib.redirect_stdout(io.StringIO()):
+        threading.Thread(target=run_backend, args=('127.0.0.1', args.tcp_port, routes),
+                         daemon=True).start()
+        threading.Thread(target=run_backend, args=(None, None, routes, path),
+                         daemon=True).start()
+        for host, port in targets.values():
+            wait_ready(host, port)
+
+        samples = {name: [] for name in targets}
+        errors = {name: 0 for name in targets}
+        for _ in range(args.requests):
+            for name, (host, port) in targets.items():
+                started = time.perf_counter()
+                response = forward_request(host, port, REQUEST)
+                elapsed = time.perf_counter() - started
+                if response in (FORWARD_ERROR, GATEWAY_TIMEOUT):
+                    errors[name] += 1
+                else:
+                    samples[name].append(elapsed)
+
+    print("{:<6} {:>10} {:>10} {:>10} {:>10} {:>7}".format(
+        'hop', 'mean us', 'p50 us', 'p90 us', 'p99 us', 'errors'))
+    for name in targets:
+        stats = summary(samples[name])
+        print("{:<6} {mean:>10.1f} {p50:>10.1f} {p90:>10.1f} {p99:>10.1f} {:>7}".format(
+            name, errors[name], **stats))
+
+
+if __name__ == "__main__":
+    main()
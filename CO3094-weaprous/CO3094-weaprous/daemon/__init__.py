@@ -17,4 +17,5 @@ from .response import Response
 from .request import Request
 from .backend import create_backend
 from .httpadapter import HttpAdapter
-from .dictionary import CaseInsensitiveDict
\ No newline at end of file
+from .dictionary import CaseInsensitiveDict
+from .cache import ResponseCache
@@ -0,0 +1,307 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.admin
+~~~~~~~~~~~~~~~~~
+
+This module measures the proxy per host block and upstream, and serves the
+measurements on a separate admin listener:
+
+- ``GET /stats``: JSON document with, per upstream and host, the request
+  and error counts, bytes, and mean / p50 / p90 / p99 of the connect time,
+  time to first byte and total time; plus the in-flight counts, latency
+  estimates, ``max_conns`` state, policy selection counts, tunnels, TLS and
+  cache counters.
+- ``GET /metrics``: the same measurements in the Prometheus text format.
+- ``GET /profile?seconds=5&allocations=10``: samples the stacks of the
+  proxy for that long (see :mod:`daemon.profiler`) and answers the
+  collapsed stacks, with the top allocating lines when asked.
+
+Keep the admin port on a loopback or management address, it is not
+authenticated.
+
+Usage::
+
+  >>> observe_exchange('app1.local', '10.0.0.5:9001', timings)
+  >>> serve_admin(listener, sources)
+
+Requirement:
+-----------------
+- metrics: :class:`Registry <Registry>` storage and exposition format.
+"""
+
+import json
+import socket
+import threading
+from urllib.parse import parse_qs
+
+from . import handoff, profiler
+from .metrics import LATENCY_BUCKETS, Registry, quantile
+
+#: Registry of the proxy measurements, apart from the backend metrics.
+PROXY_METRICS = Registry()
+
+#: Quantiles reported by ``/stats``.
+QUANTILES = (0.5, 0.9, 0.99)
+
+#: Seconds the admin listener waits for a request.
+ADMIN_TIMEOUT = 5.0
+
+_LABELS = ('host', 'upstream')
+
+#: Exchanges per host and upstream.
+upstream_requests = PROXY_METRICS.counter(
+    'proxy_upstream_requests_total', 'Exchanges with an upstream.', _LABELS)
+
+#: Failed exchanges per host, upstream and kind of error.
+upstream_errors = PROXY_METRICS.counter(
+    'proxy_upstream_errors_total', 'Failed exchanges with an upstream.',
+    _LABELS + ('kind',))
+
+#: Time to connect an upstream.
+connect_seconds = PROXY_METRICS.histogram(
+    'proxy_upstream_connect_seconds', 'Time to connect the upstream.', _LABELS)
+
+#: Time from the request sent to the first response byte.
+ttfb_seconds = PROXY_METRICS.histogram(
+    'proxy_upstream_ttfb_seconds', 'Time to the first response byte.', _LABELS)
+
+#: Time of the whole exchange.
+total_seconds = PROXY_METRICS.histogram(
+    'proxy_upstream_response_seconds', 'Time of the whole upstream exchange.', _LABELS)
+
+#: Request bytes sent to upstreams.
+sent_bytes = PROXY_METRICS.counter(
+    'proxy_upstream_sent_bytes_total', 'Request bytes sent to the upstream.', _LABELS)
+
+#: Response bytes received from upstreams.
+received_bytes = PROXY_METRICS.counter(
+    'proxy_upstream_received_bytes_total', 'Response bytes received from the upstream.',
+    _LABELS)
+
+
+def observe_exchange(host, upstream, timings):
+    """
+    Record one upstream exchange.
+
+    :params host (str): host block of the route.
+    :params upstream (str): upstream name.
+    :params timings (dict): measurements filled by
+                            :func:`forward_request <daemon.proxy.forward_request>`,
+                            or only ``error`` when the request never left.
+    """
+    labels = (host, upstream)
+    upstream_requests.inc(labels)
+    if 'error' in timings:
+        upstream_errors.inc(labels + (timings['error'],))
+    if 'connect' in timings:
+        connect_seconds.observe(timings['connect'], labels)
+    if 'ttfb' in timings:
+        ttfb_seconds.observe(timings['ttfb'], labels)
+    if 'total' in timings:
+        total_seconds.observe(timings['total'], labels)
+    if timings.get('sent'):
+        sent_bytes.inc(labels, timings['sent'])
+    if timings.get('received'):
+        received_bytes.inc(labels, timings['received'])
+
+
+def install_sources(tracker, tunnels, tls=None, cache=None):
+    """
+    Expose the state other proxy objects keep as function metrics.
+
+    :params tracker (UpstreamTracker): in-flight, EWMA, selections, limits.
+    :params tunnels (TunnelStats): upgrade tunnels.
+    :params tls (callable): returns the TLSContexts in use, or None.
+    :params cache (ResponseCache): optional response cache.
+
+    :rtype dict: name -> callable returning the snapshot used by ``/stats``.
+    """
+    PROXY_METRICS.gauge('proxy_upstream_in_flight', 'Requests in flight.', ('upstream',)) \
+        .set_function(lambda: {(name, ): entry['inflight']
+                               for name, entry in tracker.snapshot().items()})
+    PROXY_METRICS.gauge('proxy_upstream_ewma_seconds', 'Peak-EWMA latency.', ('upstream',)) \
+        .set_function(lambda: {(name, ): entry['ewma']
+                               for name, entry in tracker.snapshot().items()
+                               if entry['ewma'] is not None})
+    PROXY_METRICS.counter('proxy_upstream_selections_total', 'Requests routed by the policy.',
+                          ('host', 'policy', 'upstream')) \
+        .set_function(tracker.selection_counts)
+    PROXY_METRICS.counter('proxy_upstream_rejected_total', 'Requests refused at max_conns.',
+                          ('upstream',)) \
+        .set_function(lambda: {(name, ): entry.get('rejected', 0)
+                               for name, entry in tracker.limiter.snapshot().items()})
+    PROXY_METRICS.gauge('proxy_tunnels_active', 'Open upgrade tunnels.', ('upstream',)) \
+        .set_function(lambda: {(name, ): entry['active']
+                               for name, entry in tunnels.snapshot().items()})
+    sources = {
+        "upstreams": tracker.snapshot,
+        "limits": tracker.limiter.snapshot,
+        "selections": lambda: [
+            {"host": host, "policy": policy, "upstream": upstream, "count": count}
+            for (host, policy, upstream), count in sorted(tracker.selection_counts().items())],
+        "tunnels": tunnels.snapshot,
+    }
+    if tls is not None:
+        sources["tls"] = lambda: tls().snapshot() if tls() is not None else None
+    if cache is not None:
+        PROXY_METRICS.counter('proxy_cache_total', 'Response cache outcomes.', ('result',)) \
+            .set_function(lambda: {(name, ): value for name, value in dict(cache.stats).items()})
+        sources["cache"] = lambda: dict(cache.stats)
+    return sources
+
+
+def _summary(buckets, series):
+    result = {"count": sum(series[:-1]), "mean": None}
+    if result["count"]:
+        result["mean"] = series[-1] / result["count"]
+    for q in QUANTILES:
+        result["p{}".format(int(q * 100))] = quantile(buckets, series, q)
+    return result
+
+
+def stats(sources=None):
+    """
+    The ``/stats`` document.
+
+    :params sources (dict): name -> callable, see :func:`install_sources`.
+
+    :rtype dict: ``"exchanges"``: upstream -> host -> measurements, and one
+                 entry per source.
+    """
+    _, values = PROXY_METRICS.collect()
+    exchanges = {}
+
+    def entry(host, upstream):
+        hosts = exchanges.setdefault(upstream, {})
+        return hosts.setdefault(host, {"requests": 0, "errors": {},
+                                       "sent_bytes": 0, "received_bytes": 0})
+
+    for (name, labels), value in values.items():
+        if name == upstream_requests.name:
+            entry(*labels)["requests"] = value
+        elif name == upstream_errors.name:
+            entry(*labels[:2])["errors"][labels[2]] = value
+        elif name == sent_bytes.name:
+            entry(*labels)["sent_bytes"] = value
+        elif name == received_bytes.name:
+            entry(*labels)["received_bytes"] = value
+        elif name in (connect_seconds.name, ttfb_seconds.name, total_seconds.name):
+            key = name[len('proxy_upstream_'):-len('_seconds')]
+            entry(*labels)[key] = _summary(LATENCY_BUCKETS, value)
+    document = {"exchanges": exchanges}
+    for name, source in (sources or {}).items():
+        document[name] = source()
+    return document
+
+
+def _reply(conn, status, content_type, body):
+    conn.sendall((
+        "HTTP/1.1 {}\r\n"
+        "Content-Type: {}\r\n"
+        "Content-Length: {}\r\n"
+        "Cache-Control: no-store\r\n"
+        "Connection: close\r\n"
+        "\r\n"
+    ).format(status, content_type, len(body)).encode('utf-8') + body)
+
+
+def _profile(query):
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+    try:
+        result = profiler.profile(float(params.get('seconds', profiler.DEFAULT_SECONDS)),
+                                  int(params.get('allocations', 0)))
+    except ValueError as e:
+        return "400 Bad Request", str(e).encode('utf-8')
+    except profiler.ProfilerBusy as e:
+        return "409 Conflict", str(e).encode('utf-8')
+    return "200 OK", result.text().encode('utf-8')
+
+
+def handle_admin(conn, sources):
+    """
+    Answer one admin request on ``conn``.
+
+    :params conn (socket.socket): admin client connection.
+    :params sources (dict): see :func:`install_sources`.
+    """
+    try:
+        conn.settimeout(ADMIN_TIMEOUT)
+        head = b''
+        while b'\r\n\r\n' not in head and len(head) < 8192:
+            chunk = conn.recv(4096)
+            if not chunk:
+                return
+            head += chunk
+        request_line = head.split(b'\r\n', 1)[0].decode('latin-1').split(' ')
+        target = request_line[1] if len(request_line) > 1 else '/'
+        path, _, query = target.partition('?')
+        if request_line[0] != 'GET':
+            _reply(conn, "405 Method Not Allowed", "text/plain", b"405 Method Not Allowed")
+        elif path == '/stats':
+            body = json.dumps(stats(sources), indent=2, default=str).encode('utf-8')
+            _reply(conn, "200 OK", "application/json", body)
+        elif path == '/metrics':
+            _reply(conn, "200 OK", 'text/plain; version=0.0.4; charset=utf-8',
+                   PROXY_METRICS.render().encode('utf-8'))
+        elif path == '/profile':
+            status, body = _profile(query)
+            _reply(conn, status, "text/plain; charset=utf-8", body)
+        else:
+            _reply(conn, "404 Not Found", "text/plain", b"404 Not Found")
+    except socket.error as e:
+        print("[Admin] connection error: {}".format(e))
+    finally:
+        conn.close()
+
+
+def admin_listener(ip, port):
+    """
+    The listening socket of the admin port, handed over on restarts like
+    the proxy ports.
+
+    :rtype socket.socket: listening socket.
+    """
+    return handoff.listen_socket('{}:{}'.format(ip, port),
+                                 lambda: handoff.tcp_socket(ip, port))
+
+
+def serve_admin(listener, sources):
+    """
+    Accept admin requests until the process stops accepting.
+
+    :params listener (socket.socket): see :func:`admin_listener`.
+    :params sources (dict): see :func:`install_sources`.
+    """
+    print("[Admin] Stats on http://{}:{}/stats, /metrics and /profile".format(*listener.getsockname()[:2]))
+    while True:
+        accepted = handoff.accept(listener)
+        if accepted is None:
+            break
+        threading.Thread(target=handle_admin, args=(accepted[0], sources),
+                         daemon=True).start()
+
+
+def start_admin(address, sources):
+    """
+    Open the admin listener and serve it from a daemon thread.
+
+    :params address (tuple): (ip, port) to listen on.
+    :params sources (dict): see :func:`install_sources`.
+
+    :rtype threading.Thread: the serving thread.
+    """
+    listener = admin_listener(*address)
+    thread = threading.Thread(target=serve_admin, args=(listener, sources), daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,389 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.aioproxy
+~~~~~~~~~~~~~~~~~
+
+This module implements the proxy engine on top of :mod:`asyncio`. One event
+loop serves every client: upstream connects are non-blocking, the request
+and the response are relayed chunk by chunk in both directions and every
+wait is bounded by a timeout. Thousands of slow clients or slow upstreams
+then cost coroutines instead of threads.
+
+Upgrade requests (WebSocket) become full-duplex tunnels: both directions
+are relayed until the upstream closes, with the longer tunnel idle timeout.
+HTTP/2 cleartext clients are only served by the threaded engine (see
+:mod:`daemon.h2`); here an ``Upgrade: h2c`` request is tunnelled like any
+other upgrade.
+
+Routing is shared with :mod:`daemon.proxy`: the same routes dict (or
+:class:`LiveRoutes <LiveRoutes>`), the same compiled policies and the same
+:data:`upstream_tracker <daemon.proxy.upstream_tracker>` accounting.
+
+Requirement:
+-----------------
+- asyncio: event loop, streams and timeouts.
+- proxy: routing table, upstream tracker and error response of the threaded engine.
+- handoff: listening socket handoff and draining for restarts without downtime.
+- admin: per-upstream latency histograms and the ``/stats`` admin listener.
+- log: levelled, buffered logging and the access log.
+- trace: request spans, propagated to the upstreams in the ``traceparent`` header.
+"""
+
+import asyncio
+import time
+
+from .framing import FramingError, content_length, head_fields, is_chunked
+from .balancer import UpstreamBusy
+from .proxy import (DEADLINE_HEADER, FORWARD_ERROR, GATEWAY_TIMEOUT,
+                    SERVICE_UNAVAILABLE, forwarded_for, proxy_tls_contexts,
+                    request_deadline, tunnel_stats, upstream_timeouts, upstream_tracker)
+from .routing import LiveRoutes, RoutingTable, as_routing_table, compile_routes
+from .tunnel import TUNNEL_IDLE_TIMEOUT, is_upgrade
+from .tls import HANDSHAKE_TIMEOUT
+from . import admin, handoff, log, trace
+
+#: Seconds a client may take to send its request header.
+HEADER_TIMEOUT = 10.0
+
+#: Seconds without data on either side before the exchange is dropped.
+IDLE_TIMEOUT = 60.0
+
+#: Size of the relayed chunks.
+CHUNK_SIZE = 65536
+
+#: Largest accepted request header.
+MAX_HEADER = 65536
+
+
+def _parse_head(head):
+    """
+    Extract the request target, Host header and body length of a raw
+    request head.
+
+    :params head (bytes): request line and headers up to the blank line.
+
+    :rtype tuple: (hostname, target, length) where length is the
+                  Content-Length, or None when the client side must be
+                  relayed until it closes (chunked body or upgrade tunnel).
+    """
+    start_line, fields = head_fields(head)
+    request_line = start_line.split(' ')
+    target = request_line[1] if len(request_line) > 2 else '/'
+    if is_chunked(fields) or is_upgrade(fields):
+        length = None
+    else:
+        try:
+            length = content_length(fields) or 0
+        except FramingError:
+            length = 0
+    return fields.get('host', ''), target, length
+
+
+async def _pump(reader, writer, idle_timeout, length=None, half_close=False, state=None):
+    """
+    Copy ``reader`` into ``writer`` until end of stream, or until ``length``
+    bytes have been copied. With ``half_close`` the end of stream is passed
+    on to ``writer``. With ``state`` the copied bytes are also counted in
+    ``state['relayed']`` as they go, the time from ``state['sent_at']``
+    to the first byte is kept in ``state['ttfb']`` and the status code of
+    the response in ``state['status']``.
+
+    :rtype int: number of bytes relayed.
+    """
+    total = 0
+    while length is None or total < length:
+        size = CHUNK_SIZE if length is None else min(CHUNK_SIZE, length - total)
+        chunk = await asyncio.wait_for(reader.read(size), idle_timeout)
+        if not chunk:
+            if half_close and writer.can_write_eof():
+                writer.write_eof()
+            break
+        if state is not None and 'ttfb' not in state and 'sent_at' in state:
+            state['ttfb'] = time.perf_counter() - state['sent_at']
+            if chunk.startswith(b'HTTP/'):
+                state['status'] = chunk[9:12].decode('latin-1')
+        writer.write(chunk)
+        await asyncio.wait_for(writer.drain(), idle_timeout)
+        total += len(chunk)
+        if state is not None:
+            state['relayed'] += len(chunk)
+    return total
+
+
+async def _close(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (OSError, asyncio.CancelledError):
+        pass
+
+
+def _with_header(head, name, value):
+    """Replace (or add) one header of a raw request head."""
+    prefix = name.lower().encode('latin-1') + b':'
+    lines = [line for line in head.split(b'\r\n')
+             if not line.lower().startswith(prefix)]
+    lines.insert(1, '{}: {}'.format(name, value).encode('latin-1'))
+    return b'\r\n'.join(lines)
+
+
+async def _exchange(reader, writer, head, length, address, timeouts, tunnel, state):
+    """
+    Connect the upstream at ``address`` (TCP, or a Unix domain socket when
+    its port is None), send it the request and relay the response back to
+    the client.
+
+    :params state (dict): receives the upstream writer in ``'upstream'``
+                          once connected, counts the response bytes
+                          already relayed in ``'relayed'`` and the
+                          measurements of :func:`daemon.admin.observe_exchange`.
+
+    :rtype int: bytes relayed, request body included.
+    """
+    connect_timeout, send_timeout, read_timeout = timeouts
+    idle_timeout = TUNNEL_IDLE_TIMEOUT if tunnel else read_timeout
+    host, port = address
+    if port is None:
+        connect = asyncio.open_unix_connection(host, limit=MAX_HEADER)
+    else:
+        connect = asyncio.open_connection(host, port, limit=MAX_HEADER)
+    started = time.perf_counter()
+    upstream_reader, upstream_writer = await asyncio.wait_for(connect, connect_timeout)
+    state['upstream'] = upstream_writer
+    state['connect'] = time.perf_counter() - started
+    # Send the head with the start of the body: the WeApRous backends
+    # read the whole request with a single recv.
+    first = b''
+    if length:
+        first = await asyncio.wait_for(
+            reader.read(min(length, CHUNK_SIZE)), IDLE_TIMEOUT)
+        length -= len(first)
+    upstream_writer.write(head + first)
+    await asyncio.wait_for(upstream_writer.drain(), send_timeout)
+    state['sent'] = len(head) + len(first)
+    state['sent_at'] = time.perf_counter()
+    request_body = asyncio.ensure_future(_pump(
+        reader, upstream_writer,
+        TUNNEL_IDLE_TIMEOUT if tunnel else send_timeout, length, half_close=tunnel))
+    # The client may reset while its side is still pumped, the upstream
+    # side decides when the exchange is over.
+    request_body.add_done_callback(lambda t: t.cancelled() or t.exception())
+    try:
+        relayed = await _pump(upstream_reader, writer, idle_timeout, state=state)
+    finally:
+        request_body.cancel()
+    if request_body.done() and not request_body.cancelled() and request_body.exception() is None:
+        relayed += request_body.result()
+        state['sent'] += request_body.result()
+    return relayed
+
+
+async def handle_client(reader, writer, routes, contexts=None):
+    """
+    Serve one client connection: read the request head, pick the upstream
+    with the route policy and relay both directions until the upstream
+    closes the response.
+
+    The connect, send and read timeouts of the route bound each step; a
+    route with a request deadline bounds the whole exchange and tells the
+    upstream the time left in the deadline header.
+
+    :params reader (asyncio.StreamReader): client side reader.
+    :params writer (asyncio.StreamWriter): client side writer.
+    :params routes: :class:`LiveRoutes <LiveRoutes>` or routing table.
+    :params contexts (TLSContexts): handshake counters of a TLS listener.
+    """
+    addr = writer.get_extra_info('peername')
+    ssl_object = writer.get_extra_info('ssl_object')
+    if ssl_object is not None and contexts is not None:
+        contexts.record(ssl_object)
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), HEADER_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+            asyncio.TimeoutError, ConnectionError):
+        await _close(writer)
+        return
+
+    started = time.monotonic()
+    head = _with_header(head, 'X-Forwarded-Proto', 'https' if ssl_object else 'http')
+    head = _with_header(head, 'X-Forwarded-For', forwarded_for(
+        head_fields(head)[1].get('x-forwarded-for'), addr))
+    hostname, target, length = _parse_head(head)
+    fields = head_fields(head)[1]
+    tunnel = is_upgrade(fields)
+    route = as_routing_table(routes).lookup(hostname, target)
+    timeouts = upstream_timeouts(route.options)
+    budget = None
+    if not tunnel:
+        deadline = request_deadline(route.options, started,
+                                    fields.get(DEADLINE_HEADER.lower()))
+        if deadline is not None:
+            budget = deadline - time.monotonic()
+            head = _with_header(head, DEADLINE_HEADER, int(budget * 1000))
+    try:
+        try:
+            upstream, address = route.select(wait=False)
+        except UpstreamBusy:
+            # Waiting in the queue of a full upstream blocks, keep it off
+            # the event loop.
+            upstream, address = await asyncio.get_running_loop().run_in_executor(
+                None, route.select)
+    except UpstreamBusy as e:
+        log.sampled(log.WARNING, "[AsyncProxy] {} Host {} rejected: {}", addr, hostname, e)
+        admin.observe_exchange(route.hostname, e.upstream, {"error": "busy"})
+        writer.write(SERVICE_UNAVAILABLE)
+        try:
+            await asyncio.wait_for(writer.drain(), IDLE_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            pass
+        await _close(writer)
+        return
+    log.debug("[AsyncProxy] {} Host {} forwarded to {}", addr, hostname, upstream)
+    if tunnel:
+        tunnel_stats.opened(upstream)
+    relayed = 0
+
+    latency = None
+    failed = False
+    state = {'upstream': None, 'relayed': 0}
+    exchange_started = time.perf_counter()
+    span = trace.span('proxy {} {}'.format(head.split(b' ', 1)[0].decode('latin-1'), target),
+                      parent=fields.get(trace.TRACE_HEADER), host=hostname, upstream=upstream)
+    if span.traceparent() is not None:
+        head = _with_header(head, trace.TRACE_HEADER, span.traceparent())
+    try:
+        with span:
+            relayed = await asyncio.wait_for(
+                _exchange(reader, writer, head, length, address, timeouts, tunnel, state),
+                budget)
+        if not tunnel:
+            latency = time.monotonic() - started
+    except (OSError, asyncio.TimeoutError) as e:
+        log.sampled(log.WARNING, "[AsyncProxy] Upstream {} failed: {!r}", upstream, e)
+        timed_out = isinstance(e, asyncio.TimeoutError)
+        # A refused or unreachable upstream is penalised by the balancer
+        failed = state['upstream'] is None and not timed_out
+        state['error'] = ('timeout' if timed_out
+                          else 'connect' if state['upstream'] is None else 'io')
+        if timed_out and not tunnel:
+            latency = time.monotonic() - started
+        # Only answer when nothing of the upstream response was relayed yet.
+        if not state['relayed'] and not writer.is_closing():
+            answer = GATEWAY_TIMEOUT if timed_out else FORWARD_ERROR
+            state['status'] = answer[9:12].decode('latin-1')
+            writer.write(answer)
+            try:
+                await asyncio.wait_for(writer.drain(), IDLE_TIMEOUT)
+            except (OSError, asyncio.TimeoutError):
+                pass
+    finally:
+        if tunnel:
+            tunnel_stats.closed(upstream, relayed or state['relayed'], False)
+        upstream_tracker.release(upstream, latency, failed)
+        timings = {key: state[key] for key in ('connect', 'ttfb', 'sent', 'error')
+                   if key in state}
+        timings['received'] = state['relayed']
+        if not tunnel:
+            # A tunnel lasts as long as its clients want, keep it out of
+            # the latency histograms.
+            timings['total'] = time.perf_counter() - exchange_started
+        admin.observe_exchange(route.hostname, upstream, timings)
+        if log.access_enabled():
+            log.access(client=addr[0] if isinstance(addr, tuple) else None, host=hostname,
+                       method=head.split(b' ', 1)[0].decode('latin-1'), path=target,
+                       upstream=upstream, status=state.get('status'), sent=state['relayed'],
+                       duration_ms=round((time.monotonic() - started) * 1000, 3))
+        if state['upstream'] is not None:
+            await _close(state['upstream'])
+        await _close(writer)
+
+
+async def _tracked(client):
+    """Count a client connection for the drain of :mod:`daemon.handoff`."""
+    handoff.connection_opened()
+    try:
+        await client
+    finally:
+        handoff.connection_closed()
+
+
+def _listener(ip, port):
+    return handoff.listen_socket('{}:{}'.format(ip, port),
+                                 lambda: handoff.tcp_socket(ip, port), backlog=1024)
+
+
+async def serve(ip, port, routes, tls_port=None, admin_address=None):
+    """
+    Listen on ``ip:port`` and serve clients until the process stops
+    accepting (see :mod:`daemon.handoff`), then drain the clients in
+    progress.
+
+    :params ip (str): IP address to bind the proxy server.
+    :params port (int): port number to listen on.
+    :params routes: :class:`LiveRoutes <LiveRoutes>` or routing table.
+    :params tls_port (int): optional port of a TLS listener.
+    :params admin_address (tuple): optional (ip, port) of the admin
+                                   listener, see :mod:`daemon.admin`.
+    """
+    server = await asyncio.start_server(
+        lambda r, w: _tracked(handle_client(r, w, routes)),
+        sock=_listener(ip, port), limit=MAX_HEADER)
+    print("[AsyncProxy] Listening on IP {} port {}".format(ip, port))
+    servers = [server]
+    contexts = None
+    if tls_port is not None:
+        contexts = proxy_tls_contexts(routes)
+        servers.append(await asyncio.start_server(
+            lambda r, w: _tracked(handle_client(r, w, routes, contexts)),
+            sock=_listener(ip, tls_port), limit=MAX_HEADER,
+            ssl=contexts.default_context(), ssl_handshake_timeout=HANDSHAKE_TIMEOUT))
+        print("[AsyncProxy] Listening for TLS on IP {} port {}".format(ip, tls_port))
+    if admin_address is not None:
+        admin.start_admin(admin_address, admin.install_sources(
+            upstream_tracker, tunnel_stats, lambda: contexts))
+    handoff.ready()
+    while not handoff.stopping.is_set():
+        await asyncio.sleep(handoff.ACCEPT_POLL)
+    for server in servers:
+        server.close()
+    await asyncio.get_running_loop().run_in_executor(None, handoff.drain)
+
+
+def run_proxy(ip, port, routes, tls_port=None, admin_address=None):
+    """
+    Starts the asyncio proxy engine and blocks until interrupted.
+
+    :params ip (str): IP address to bind the proxy server.
+    :params port (int): port number to listen on.
+    :params routes (dict): dictionary mapping hostnames and location, or a
+                           :class:`LiveRoutes <LiveRoutes>`.
+    :params tls_port (int): optional port of a TLS listener, see
+                            :mod:`daemon.tls`.
+    :params admin_address (tuple): optional (ip, port) of the admin
+                                   listener, see :mod:`daemon.admin`.
+    """
+    if isinstance(routes, LiveRoutes):
+        if routes.install_sighup():
+            print("[AsyncProxy] SIGHUP reloads the routing table")
+        routes.start_watcher()
+    else:
+        if not isinstance(routes, RoutingTable):
+            routes = compile_routes(routes, upstream_tracker)
+        routes.install(upstream_tracker)
+    if handoff.install():
+        print("[AsyncProxy] SIGUSR2 hands the listeners to a new process, SIGTERM drains")
+    try:
+        asyncio.run(serve(ip, port, routes, tls_port, admin_address))
+    except OSError as e:
+        print("Socket error: {}".format(e))
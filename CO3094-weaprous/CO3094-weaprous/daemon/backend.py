@@ -26,6 +26,11 @@ Requirements:
 - response: response utilities.
 - httpadapter: the class for handling HTTP requests.
 - CaseInsensitiveDict: provides dictionary for managing headers or routes.
+- handoff: listening socket handoff for restarts without downtime.
+- transport: :class:`MemoryTransport <MemoryTransport>` in-process listeners, TCP by default.
+- metrics: request counters and histograms, see :meth:`WeApRous.enable_metrics`.
+- ratelimit: per client rate limits and admission control, see :meth:`WeApRous.enable_rate_limit`.
+- timeouts: read and write deadlines, connection limit and idle connection reaper.
 
 
 Notes:
@@ -37,13 +42,19 @@ Notes:
 Usage Example:
 --------------
 >>> create_backend("127.0.0.1", 9000, routes={})
+>>> create_backend(None, None, routes={}, unix_socket="/tmp/app1.sock")
+>>> create_backend("10.0.0.1", 9001, routes={}, transport=MemoryTransport())
 
 """
 
+import os
 import socket
+import stat
 import threading
 import argparse
 
+from . import handoff, log, metrics, ratelimit, timeouts
+from .transport import TCP
 from .response import *
 from .httpadapter import HttpAdapter
 from .dictionary import CaseInsensitiveDict
@@ -61,51 +72,126 @@ def handle_client(ip, port, conn, addr, routes):
     daemon = HttpAdapter(ip, port, conn, addr, routes)
 
     # Handle client
-    daemon.handle_client(conn, addr, routes)
+    limits = ratelimit.limits
+    if limits is not None:
+        limits.admission.opened()
+    metrics.in_flight.inc()
+    try:
+        daemon.handle_client(conn, addr, routes)
+    finally:
+        metrics.in_flight.dec()
+        timeouts.connections.close(conn)
+        if limits is not None:
+            limits.admission.closed()
+
+def bind_unix_socket(path):
+    """
+    Creates a stream socket bound to the Unix domain socket ``path``.
 
-def run_backend(ip, port, routes):
+    A socket file left behind by a previous run is removed first; a socket
+    another server still accepts on, or any other kind of file at ``path``,
+    is left alone and the bind fails.
+
+    :param path (str): filesystem path of the socket.
+    :rtype socket.socket: the bound, not yet listening, socket.
+    """
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)
+            else:
+                raise OSError("Unix socket {} is in use".format(path))
+            finally:
+                probe.close()
+    except FileNotFoundError:
+        pass
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    return server
+
+def run_backend(ip, port, routes, unix_socket=None, transport=None):
     """
     Starts the backend server, binds to the specified IP and port, and listens for incoming
     connections. Each connection is handled in a separate thread. The backend accepts incoming
     connections and spawns a thread for each client.
 
+    With ``unix_socket`` the server listens on that Unix domain socket instead, which a
+    proxy on the same machine reaches with ``proxy_pass unix:/path.sock``; the socket file
+    is removed when the server stops. With a ``transport`` the server listens on it
+    instead of TCP, e.g. on a :class:`MemoryTransport <daemon.transport.MemoryTransport>`.
+
+    SIGUSR2 restarts the server without refusing connections and SIGTERM stops it once
+    the connections in progress are served (see :mod:`daemon.handoff`). Connections
+    beyond the limit of :mod:`daemon.timeouts` are refused, and its reaper shuts
+    down those that wait idle on their client.
+
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict): Dictionary of route handlers.
+    :param unix_socket (str): optional path of a Unix domain socket to listen on.
+    :param transport: optional :mod:`transport <daemon.transport>`, TCP by default.
     """
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
+    bound = False
+    if handoff.install():
+        print("[Backend] SIGUSR2 hands the listener to a new process, SIGTERM drains")
     try:
-        server.bind((ip, port))
-        server.listen(50)
-        print("[Backend] Listening on port {}".format(port))
+        if unix_socket:
+            server = handoff.listen_socket(unix_socket, lambda: bind_unix_socket(unix_socket))
+            bound = True
+        else:
+            server = (transport or TCP).listen(ip, port)
+        if unix_socket:
+            print("[Backend] Listening on unix socket {}".format(unix_socket))
+        else:
+            print("[Backend] Listening on port {}".format(port))
         if routes != {}:
             print("[Backend] route settings {}".format(routes))
+        timeouts.start_reaper()
+        handoff.ready()
 
         while True:
-            conn, addr = server.accept()
+            accepted = handoff.accept(server)
+            if accepted is None:
+                break
+            conn, addr = accepted
+            if not timeouts.connections.open(conn):
+                log.sampled(log.WARNING, "[Backend] {} connections open, refusing {}",
+                            len(timeouts.connections), addr)
+                timeouts.refuse(conn)
+                continue
             #
             #  TODO: implement the step of the client incomping connection
             #        using multi-thread programming with the
             #        provided handle_client routine
             
-            client_thread = threading.Thread(
-                target=handle_client,
-                args=(ip, port, conn, addr, routes),
-                daemon=True  # Daemon thread để tự kết thúc khi main thread dừng
-            )
-            client_thread.start()
+            handoff.spawn(handle_client, (ip, port, conn, addr, routes))
+        handoff.drain()
     except socket.error as e:
       print("Socket error: {}".format(e))
-
-def create_backend(ip, port, routes={}):
+    finally:
+        # The successor keeps serving on the same socket file.
+        if bound and not handoff.handed_off():
+            try:
+                os.unlink(unix_socket)
+            except OSError:
+                pass
+
+def create_backend(ip, port, routes={}, unix_socket=None, transport=None):
     """
     Entry point for creating and running the backend server.
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict, optional): Dictionary of route handlers. Defaults to empty dict.
+    :param unix_socket (str, optional): listen on this Unix domain socket path instead
+                                        of ``ip:port``.
+    :param transport (optional): listen on this :mod:`transport <daemon.transport>`
+                                 rather than TCP.
     """
 
-    run_backend(ip, port, routes)
\ No newline at end of file
+    run_backend(ip, port, routes, unix_socket, transport)
\ No newline at end of file
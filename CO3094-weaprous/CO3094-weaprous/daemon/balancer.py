@@ -0,0 +1,444 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.balancer
+~~~~~~~~~~~~~~~~~
+
+This module keeps the per-upstream load state used by the proxy routing
+policies. Every upstream is identified by its ``"host:port"`` string as
+written in ``proxy_pass``.
+
+The :class:`UpstreamTracker <UpstreamTracker>` counts in-flight requests and
+keeps a peak-EWMA of the observed latency. All updates happen under a single
+lock so that selection and accounting stay consistent across proxy threads.
+
+Usage::
+
+  >>> tracker = UpstreamTracker()
+  >>> selected = tracker.pick_p2c(["10.0.0.1:9001", "10.0.0.2:9001"])
+  >>> ...
+  >>> tracker.release(selected, latency=0.012)
+"""
+
+import collections
+import math
+import random
+import threading
+import time
+
+#: Decay window (seconds) of the peak-EWMA latency.
+DEFAULT_DECAY = 10.0
+
+#: Latency (seconds) assumed for an upstream that has never answered.
+#: It keeps new or idle upstreams attractive without dominating the choice.
+DEFAULT_RTT = 0.005
+
+#: Latency (seconds) recorded for an exchange that failed, e.g. a refused
+#: connection. A dead upstream fails fast and would otherwise look cheap.
+FAILURE_PENALTY = 1.0
+
+#: Seconds a request waits in the queue of a full upstream by default.
+DEFAULT_QUEUE_TIMEOUT = 1.0
+
+
+class UpstreamBusy(Exception):
+    """Raised when an upstream is at ``max_conns`` and its queue is full or
+    the wait for a free slot timed out."""
+
+    def __init__(self, upstream, reason):
+        super().__init__("{} is busy: {}".format(upstream, reason))
+        self.upstream = upstream
+        self.reason = reason
+
+
+class ConnectionLimiter:
+    """
+    Per-upstream concurrency limits with a bounded FIFO of waiters.
+
+    Every request admitted to an upstream holds one slot until it is
+    released; upstreams without a limit are only counted. When a limited
+    upstream is full a request may wait for a slot: a released slot is
+    handed directly to the oldest waiter, so waiters are served in arrival
+    order and newcomers cannot overtake them.
+
+    :attrs limits (dict): upstream -> (max_conns, queue, queue_timeout).
+    :attrs active (dict): upstream -> admitted requests.
+    :attrs stats (dict): upstream -> {"queued", "rejected", "timeouts",
+                         "fallbacks"} counters.
+    """
+
+    def __init__(self):
+        self.limits = {}
+        self.active = {}
+        self.stats = {}
+        self._waiters = {}
+        self.lock = threading.Lock()
+
+    def configure(self, limits):
+        """
+        Replace the limits of all upstreams. Waiters of an upstream that is
+        no longer limited are admitted at once.
+
+        :param limits (dict): upstream -> (max_conns, queue, queue_timeout).
+        """
+        with self.lock:
+            self.limits = dict(limits)
+            for upstream, waiters in self._waiters.items():
+                if upstream not in self.limits:
+                    while waiters:
+                        self._grant(upstream, waiters.popleft())
+
+    def _count(self, upstream, name):
+        counters = self.stats.setdefault(
+            upstream, {"queued": 0, "rejected": 0, "timeouts": 0, "fallbacks": 0})
+        counters[name] += 1
+
+    def _grant(self, upstream, waiter):
+        """Admit a waiter (lock must be held)."""
+        self.active[upstream] = self.active.get(upstream, 0) + 1
+        waiter.set()
+
+    def try_admit(self, upstream):
+        """
+        Take a slot on ``upstream`` if one is free and nobody is waiting.
+
+        :param upstream (str): ``"host:port"`` of the upstream.
+        :rtype bool: whether the request was admitted.
+        """
+        with self.lock:
+            limit = self.limits.get(upstream)
+            if limit is not None and (self.active.get(upstream, 0) >= limit[0]
+                                      or self._waiters.get(upstream)):
+                return False
+            self.active[upstream] = self.active.get(upstream, 0) + 1
+            return True
+
+    def wait(self, upstream):
+        """
+        Queue for a slot on a full ``upstream``, for at most its
+        ``queue_timeout``.
+
+        :param upstream (str): ``"host:port"`` of the upstream.
+        :raises UpstreamBusy: when the queue is full or the wait timed out.
+        """
+        with self.lock:
+            limit = self.limits.get(upstream)
+            if limit is None:
+                self.active[upstream] = self.active.get(upstream, 0) + 1
+                return
+            max_conns, queue, queue_timeout = limit
+            waiters = self._waiters.setdefault(upstream, collections.deque())
+            if self.active.get(upstream, 0) < max_conns and not waiters:
+                self.active[upstream] = self.active.get(upstream, 0) + 1
+                return
+            if len(waiters) >= queue:
+                self._count(upstream, "rejected")
+                raise UpstreamBusy(upstream, "queue full")
+            waiter = threading.Event()
+            waiters.append(waiter)
+            self._count(upstream, "queued")
+        waiter.wait(queue_timeout)
+        with self.lock:
+            # A slot handed over right at the timeout still counts.
+            if waiter.is_set():
+                return
+            waiters.remove(waiter)
+            self._count(upstream, "timeouts")
+        raise UpstreamBusy(upstream, "queue timeout")
+
+    def fallback(self, upstream):
+        """Count a request sent elsewhere because ``upstream`` was full."""
+        with self.lock:
+            self._count(upstream, "fallbacks")
+
+    def release(self, upstream):
+        """
+        Give back the slot of a finished request, to the oldest waiter
+        when there is one.
+
+        :param upstream (str): ``"host:port"`` of the upstream.
+        """
+        with self.lock:
+            waiters = self._waiters.get(upstream)
+            limit = self.limits.get(upstream)
+            active = max(0, self.active.get(upstream, 0) - 1)
+            self.active[upstream] = active
+            if waiters and (limit is None or active < limit[0]):
+                self._grant(upstream, waiters.popleft())
+
+    def snapshot(self):
+        """
+        Return a copy of the current state.
+
+        :rtype dict: upstream -> {"active", "max_conns", "waiting", and the
+                     counters of :attr:`stats`}.
+        """
+        with self.lock:
+            names = set(self.active) | set(self.limits) | set(self.stats)
+            result = {}
+            for name in names:
+                limit = self.limits.get(name)
+                entry = {
+                    "active": self.active.get(name, 0),
+                    "max_conns": limit[0] if limit else None,
+                    "waiting": len(self._waiters.get(name, ())),
+                }
+                entry.update(self.stats.get(name, {}))
+                result[name] = entry
+            return result
+
+
+class UpstreamTracker:
+    """
+    Lock-protected in-flight counters and peak-EWMA latencies per upstream.
+
+    The peak-EWMA rises immediately to any sample larger than the current
+    estimate and decays towards smaller samples with a time constant of
+    ``decay`` seconds, so a backend that suddenly slows down is penalised at
+    once while recovery is observed gradually. A failed exchange counts as a
+    sample of :data:`FAILURE_PENALTY`; without new samples the estimate
+    decays back towards :data:`DEFAULT_RTT`, so a failed upstream is tried
+    again after a while.
+
+    Admission against the ``max_conns`` limits is kept by :attr:`limiter`;
+    :meth:`release` gives the request's slot back as well.
+
+    :attrs inflight (dict): upstream -> number of requests in flight.
+    :attrs ewma (dict): upstream -> peak-EWMA latency in seconds.
+    :attrs limiter (ConnectionLimiter): per-upstream concurrency limits.
+    :attrs selections (dict): (host, policy, upstream) -> times the route
+                              of ``host`` sent a request to ``upstream``.
+    """
+
+    def __init__(self, decay=DEFAULT_DECAY, rng=None):
+        """
+        Initialize an empty tracker.
+
+        :param decay (float): decay window of the latency average in seconds.
+        :param rng (random.Random): optional random source (tests, benchmarks).
+        """
+        self.decay = decay
+        self.inflight = {}
+        self.ewma = {}
+        self._stamp = {}
+        self._rng = rng or random.Random()
+        self.lock = threading.Lock()
+        self.limiter = ConnectionLimiter()
+        self.selections = {}
+
+    def acquire(self, upstream):
+        """
+        Mark one more request in flight on ``upstream``.
+
+        :param upstream (str): ``"host:port"`` of the upstream.
+        """
+        with self.lock:
+            self.inflight[upstream] = self.inflight.get(upstream, 0) + 1
+
+    def release(self, upstream, latency=None, failed=False):
+        """
+        Mark a request finished on ``upstream`` and record its latency.
+
+        :param upstream (str): ``"host:port"`` of the upstream.
+        :param latency (float): observed round trip in seconds, or None when
+                                the request got no answer.
+        :param failed (bool): the exchange failed, e.g. the connection was
+                              refused; recorded as :data:`FAILURE_PENALTY`.
+        """
+        with self.lock:
+            count = self.inflight.get(upstream, 0)
+            self.inflight[upstream] = max(0, count - 1)
+            if failed:
+                latency = max(latency or 0.0, self.ewma.get(upstream, 0.0), FAILURE_PENALTY)
+            if latency is not None:
+                self._observe(upstream, latency, time.monotonic())
+        self.limiter.release(upstream)
+
+    def selected(self, host, policy, upstream):
+        """
+        Count one request routed to ``upstream``.
+
+        :param host (str): host block of the route.
+        :param policy (str): ``dist_policy`` of the route.
+        :param upstream (str): upstream that got the request.
+        """
+        key = (host, policy, upstream)
+        with self.lock:
+            self.selections[key] = self.selections.get(key, 0) + 1
+
+    def cancel(self, upstream):
+        """
+        Undo an :meth:`acquire` whose request was never admitted to
+        ``upstream`` (sent elsewhere or rejected by its limit).
+
+        :param upstream (str): ``"host:port"`` of the upstream.
+        """
+        with self.lock:
+            self.inflight[upstream] = max(0, self.inflight.get(upstream, 0) - 1)
+
+    def _observe(self, upstream, latency, now):
+        """Fold one latency sample into the peak-EWMA (lock must be held)."""
+        prev = self.ewma.get(upstream)
+        if prev is None or latency > prev:
+            self.ewma[upstream] = latency
+        else:
+            elapsed = max(0.0, now - self._stamp.get(upstream, now))
+            weight = math.exp(-elapsed / self.decay)
+            self.ewma[upstream] = prev * weight + latency * (1.0 - weight)
+        self._stamp[upstream] = now
+
+    def cost(self, upstream):
+        """
+        Expected cost of sending one more request to ``upstream``: its
+        latency estimate times the number of requests it would then hold.
+
+        :rtype float: relative load score, lower is better.
+        """
+        return self._cost(upstream)
+
+    def _cost(self, upstream):
+        rtt = self.ewma.get(upstream)
+        if rtt is None:
+            rtt = DEFAULT_RTT
+        else:
+            # Without samples the estimate decays back towards the default
+            elapsed = max(0.0, time.monotonic() - self._stamp[upstream])
+            weight = math.exp(-elapsed / self.decay)
+            rtt = rtt * weight + DEFAULT_RTT * (1.0 - weight)
+        return rtt * (self.inflight.get(upstream, 0) + 1)
+
+    def pick_least(self, upstreams):
+        """
+        Select the upstream with the fewest in-flight requests and acquire it.
+
+        :param upstreams (list): candidate ``"host:port"`` strings.
+        :rtype str: the selected upstream.
+        """
+        with self.lock:
+            selected = min(upstreams, key=lambda u: self.inflight.get(u, 0))
+            self.inflight[selected] = self.inflight.get(selected, 0) + 1
+        return selected
+
+    def pick_p2c(self, upstreams):
+        """
+        Power-of-two-choices: draw two distinct upstreams at random, keep the
+        one with the lower :meth:`cost` and acquire it.
+
+        :param upstreams (list): candidate ``"host:port"`` strings.
+        :rtype str: the selected upstream.
+        """
+        with self.lock:
+            if len(upstreams) == 1:
+                selected = upstreams[0]
+            else:
+                first, second = self._rng.sample(upstreams, 2)
+                if self._cost(second) < self._cost(first):
+                    selected = second
+                else:
+                    selected = first
+            self.inflight[selected] = self.inflight.get(selected, 0) + 1
+        return selected
+
+    def snapshot(self):
+        """
+        Return a copy of the current state.
+
+        :rtype dict: upstream -> {"inflight": int, "ewma": float or None}.
+        """
+        with self.lock:
+            names = set(self.inflight) | set(self.ewma)
+            return {
+                name: {
+                    "inflight": self.inflight.get(name, 0),
+                    "ewma": self.ewma.get(name),
+                }
+                for name in names
+            }
+
+    def selection_counts(self):
+        """
+        Return a copy of :attr:`selections`.
+
+        :rtype dict: (host, policy, upstream) -> count.
+        """
+        with self.lock:
+            return dict(self.selections)
+
+
+class RoundRobinPolicy:
+    """
+    Cycles through the upstreams in configuration order.
+
+    :attrs upstreams (tuple): candidate ``"host:port"`` strings.
+    """
+
+    name = 'round-robin'
+
+    def __init__(self, upstreams, tracker):
+        self.upstreams = tuple(upstreams)
+        self.tracker = tracker
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def select(self):
+        """Return the next upstream and acquire it in the tracker."""
+        with self._lock:
+            selected = self.upstreams[self._next]
+            self._next = (self._next + 1) % len(self.upstreams)
+        self.tracker.acquire(selected)
+        return selected
+
+
+class LeastConnPolicy:
+    """
+    Picks the upstream with the fewest in-flight requests.
+
+    :attrs upstreams (tuple): candidate ``"host:port"`` strings.
+    """
+
+    name = 'least-conn'
+
+    def __init__(self, upstreams, tracker):
+        self.upstreams = tuple(upstreams)
+        self.tracker = tracker
+
+    def select(self):
+        """Return the least loaded upstream, already acquired."""
+        return self.tracker.pick_least(self.upstreams)
+
+
+class P2CEwmaPolicy:
+    """
+    Power of two random choices weighted by peak-EWMA latency times
+    in-flight requests.
+
+    :attrs upstreams (tuple): candidate ``"host:port"`` strings.
+    """
+
+    name = 'p2c-ewma'
+
+    def __init__(self, upstreams, tracker):
+        self.upstreams = tuple(upstreams)
+        self.tracker = tracker
+
+    def select(self):
+        """Return the cheaper of two random upstreams, already acquired."""
+        return self.tracker.pick_p2c(self.upstreams)
+
+
+#: Policy classes by ``dist_policy`` name.
+POLICIES = {
+    RoundRobinPolicy.name: RoundRobinPolicy,
+    LeastConnPolicy.name: LeastConnPolicy,
+    P2CEwmaPolicy.name: P2CEwmaPolicy,
+}
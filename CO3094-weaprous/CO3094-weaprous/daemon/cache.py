@@ -0,0 +1,472 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.cache
+~~~~~~~~~~~~~~~~~
+
+This module provides the shared HTTP response cache used by the proxy. It
+implements the subset of RFC 9111 needed for a reverse proxy in front of
+WeApRous backends:
+
+- freshness from ``Cache-Control: s-maxage / max-age`` or ``Expires``,
+- ``no-store``, ``private``, ``no-cache`` and ``Vary`` handling,
+- revalidation of stale entries with ``ETag`` / ``Last-Modified``.
+
+Entries are kept in a byte-budgeted LRU. When a cache directory is given,
+entries evicted from memory spill to disk (with their own byte budget) and
+are promoted back to memory on the next hit.
+
+Usage::
+
+  >>> cache = ResponseCache(max_bytes=64 * 1024 * 1024)
+  >>> entry = cache.lookup(("app1.local", "/css/styles.css"), req_headers)
+  >>> if entry is None:
+  >>>     cache.store(("app1.local", "/css/styles.css"), req_headers, raw)
+"""
+
+import copy
+import email.utils
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from . import log
+
+#: Status codes whose responses may be stored.
+CACHEABLE_STATUS = (200, 203, 204, 300, 301, 308, 404, 410)
+
+#: Headers refreshed from a ``304 Not Modified`` answer.
+REFRESH_HEADERS = ("cache-control", "expires", "date", "etag", "last-modified", "vary")
+
+
+def parse_response(raw):
+    """
+    Split a raw HTTP response into its parts.
+
+    :params raw (bytes): complete response as read from the backend.
+
+    :rtype tuple: (status_code, status_line, headers, body) where headers is a
+                  list of (name, value) pairs in wire order. Returns None for
+                  a malformed response.
+    """
+    head, sep, body = raw.partition(b"\r\n\r\n")
+    if not sep:
+        return None
+    lines = head.decode("iso-8859-1").split("\r\n")
+    status_line = lines[0]
+    parts = status_line.split(" ", 2)
+    try:
+        status_code = int(parts[1])
+    except (IndexError, ValueError):
+        return None
+    headers = []
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers.append((name.strip(), value.strip()))
+    return status_code, status_line, headers, body
+
+
+def header_dict(headers):
+    """
+    Fold a list of header pairs into a dict with lower-case names. Repeated
+    headers are joined with ``", "`` as allowed by RFC 9110.
+
+    :rtype dict: lower-case name -> value.
+    """
+    folded = {}
+    for name, value in headers:
+        key = name.lower()
+        if key in folded:
+            folded[key] = folded[key] + ", " + value
+        else:
+            folded[key] = value
+    return folded
+
+
+def parse_cache_control(value):
+    """
+    Parse a ``Cache-Control`` value.
+
+    :rtype dict: lower-case directive -> argument (None for bare directives).
+    """
+    directives = {}
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "=" in item:
+            key, arg = item.split("=", 1)
+            directives[key.strip().lower()] = arg.strip().strip('"')
+        else:
+            directives[item.lower()] = None
+    return directives
+
+
+def _parse_seconds(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class CacheEntry:
+    """
+    One stored response variant.
+
+    :attrs status_line (str): original status line.
+    :attrs headers (list): response headers as (name, value) pairs.
+    :attrs body (bytes): response body, or None while spilled to disk.
+    :attrs stored_at (float): wall clock time the response was stored.
+    :attrs lifetime (float): freshness lifetime in seconds.
+    :attrs etag (str): validator sent back in ``If-None-Match``.
+    :attrs last_modified (str): validator sent back in ``If-Modified-Since``.
+    """
+
+    __attrs__ = [
+        "status_line",
+        "headers",
+        "body",
+        "stored_at",
+        "lifetime",
+        "age",
+        "etag",
+        "last_modified",
+        "size",
+        "path",
+    ]
+
+    def __init__(self, status_line, headers, body, lifetime, age=0):
+        self.status_line = status_line
+        self.headers = headers
+        self.body = body
+        self.stored_at = time.time()
+        self.lifetime = lifetime
+        #: Age already accumulated upstream (``Age`` header).
+        self.age = age
+        fields = header_dict(headers)
+        self.etag = fields.get("etag")
+        self.last_modified = fields.get("last-modified")
+        self.size = len(body) + sum(len(n) + len(v) + 4 for n, v in headers)
+        #: Spill file when the body lives on disk.
+        self.path = None
+
+    def current_age(self, now=None):
+        """Age of the stored response in seconds."""
+        return self.age + max(0.0, (now or time.time()) - self.stored_at)
+
+    def is_fresh(self, now=None):
+        """Whether the entry can be served without revalidation."""
+        return self.current_age(now) < self.lifetime
+
+    def has_validator(self):
+        """Whether a conditional request can revalidate the entry."""
+        return bool(self.etag or self.last_modified)
+
+    def to_bytes(self, cache_status, not_modified=False):
+        """
+        Serialise the entry for a client.
+
+        :params cache_status (str): value of the ``X-Cache`` header.
+        :params not_modified (bool): answer ``304 Not Modified`` without body.
+
+        :rtype bytes: full HTTP response.
+        """
+        if not_modified:
+            status_line = "HTTP/1.1 304 Not Modified"
+            body = b""
+        else:
+            status_line = self.status_line
+            body = self.body
+        lines = [status_line]
+        for name, value in self.headers:
+            if name.lower() in ("age", "x-cache"):
+                continue
+            if not_modified and name.lower() == "content-length":
+                continue
+            lines.append("{}: {}".format(name, value))
+        lines.append("Age: {}".format(int(self.current_age())))
+        lines.append("X-Cache: {}".format(cache_status))
+        head = "\r\n".join(lines) + "\r\n\r\n"
+        return head.encode("iso-8859-1") + body
+
+
+def freshness_lifetime(headers):
+    """
+    Compute the freshness lifetime of a response for a shared cache.
+
+    :params headers (dict): lower-case response headers.
+
+    :rtype float: lifetime in seconds, or None when the response carries no
+                  explicit freshness information.
+    """
+    directives = parse_cache_control(headers.get("cache-control"))
+    if "no-cache" in directives:
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            seconds = _parse_seconds(directives[name])
+            if seconds is not None:
+                return seconds
+    expires = headers.get("expires")
+    if expires is not None:
+        expires_at = _parse_date(expires)
+        if expires_at is None:
+            # An invalid Expires means "already expired".
+            return 0
+        date = _parse_date(headers.get("date")) or time.time()
+        return max(0, expires_at - date)
+    return None
+
+
+def is_storable(status_code, headers, req_headers):
+    """
+    Decide whether a response may be stored by a shared cache.
+
+    :params status_code (int): response status code.
+    :params headers (dict): lower-case response headers.
+    :params req_headers (dict): lower-case request headers.
+
+    :rtype bool: True when the response can be stored.
+    """
+    if status_code not in CACHEABLE_STATUS:
+        return False
+    directives = parse_cache_control(headers.get("cache-control"))
+    if "no-store" in directives or "private" in directives:
+        return False
+    if "no-store" in parse_cache_control(req_headers.get("cache-control")):
+        return False
+    if headers.get("vary", "").strip() == "*":
+        return False
+    if "set-cookie" in headers:
+        return False
+    if "authorization" in req_headers and not (
+            "public" in directives or "s-maxage" in directives):
+        return False
+    lifetime = freshness_lifetime(headers)
+    if lifetime is None:
+        return False
+    if lifetime == 0 and not ("etag" in headers or "last-modified" in headers):
+        return False
+    return True
+
+
+class ResponseCache:
+    """
+    Thread-safe, byte-budgeted LRU of HTTP responses with optional disk spill.
+
+    Responses are grouped by key (normally ``(host, target)``). The ``Vary``
+    header names seen for a key select which request headers distinguish its
+    variants.
+
+    :attrs max_bytes (int): memory budget in bytes.
+    :attrs cache_dir (str): spill directory, or None to drop evicted entries.
+    :attrs max_disk_bytes (int): disk budget in bytes.
+    :attrs stats (dict): hit/miss/revalidation/eviction counters.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, cache_dir=None,
+                 max_disk_bytes=None, max_entry_bytes=None):
+        """
+        Initialize an empty cache.
+
+        :param max_bytes (int): memory budget in bytes.
+        :param cache_dir (str): optional spill directory, created if missing.
+        :param max_disk_bytes (int): disk budget, defaults to 4 x max_bytes.
+        :param max_entry_bytes (int): largest storable response, defaults to
+                                      1/8 of the memory budget.
+        """
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else 4 * max_bytes
+        self.max_entry_bytes = max_entry_bytes or max(1, max_bytes // 8)
+        self.stats = {"hit": 0, "miss": 0, "revalidated": 0, "stored": 0,
+                      "evicted": 0, "spilled": 0}
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._vary = {}
+        self.lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _variant(self, key, req_headers):
+        names = self._vary.get(key, ())
+        return key, tuple(req_headers.get(name, "") for name in names)
+
+    def lookup(self, key, req_headers):
+        """
+        Find the stored variant matching the request.
+
+        :params key (tuple): cache key, usually ``(host, target)``.
+        :params req_headers (dict): lower-case request headers.
+
+        :rtype CacheEntry: the entry (fresh or stale), or None.
+        """
+        with self.lock:
+            variant = self._variant(key, req_headers)
+            entry = self._memory.get(variant)
+            if entry is not None:
+                self._memory.move_to_end(variant)
+                return entry
+            entry = self._disk.pop(variant, None)
+            if entry is None:
+                return None
+            self._disk_bytes -= entry.size
+            if not self._load(entry):
+                return None
+            self._insert(variant, entry)
+            return entry
+
+    def store(self, key, req_headers, raw):
+        """
+        Store a backend response if it is cacheable.
+
+        :params key (tuple): cache key, usually ``(host, target)``.
+        :params req_headers (dict): lower-case request headers.
+        :params raw (bytes): full response from the backend.
+
+        :rtype CacheEntry: the stored entry, or None when not cacheable.
+        """
+        parsed = parse_response(raw)
+        if parsed is None:
+            return None
+        status_code, status_line, headers, body = parsed
+        fields = header_dict(headers)
+        if not is_storable(status_code, fields, req_headers):
+            return None
+        entry = CacheEntry(status_line, headers, body,
+                           freshness_lifetime(fields),
+                           _parse_seconds(fields.get("age")) or 0)
+        if entry.size > self.max_entry_bytes:
+            return None
+        names = tuple(name.strip().lower()
+                      for name in fields.get("vary", "").split(",") if name.strip())
+        with self.lock:
+            if self._vary.get(key, ()) != names:
+                self._drop_key(key)
+                self._vary[key] = names
+            variant = self._variant(key, req_headers)
+            self._discard(variant)
+            self._insert(variant, entry)
+            self.stats["stored"] += 1
+        return entry
+
+    def refresh(self, entry, raw):
+        """
+        Update a stale entry from a ``304 Not Modified`` response.
+
+        :params entry (CacheEntry): the revalidated entry.
+        :params raw (bytes): the 304 response from the backend.
+
+        :rtype bool: True when the entry is fresh again.
+        """
+        parsed = parse_response(raw)
+        if parsed is None or parsed[0] != 304:
+            return False
+        updates = header_dict(parsed[2])
+        with self.lock:
+            headers = [(n, v) for n, v in entry.headers
+                       if n.lower() not in updates or n.lower() not in REFRESH_HEADERS]
+            for name, value in parsed[2]:
+                if name.lower() in REFRESH_HEADERS:
+                    headers.append((name, value))
+            entry.headers = headers
+            fields = header_dict(headers)
+            lifetime = freshness_lifetime(fields)
+            entry.lifetime = lifetime or 0
+            entry.age = _parse_seconds(fields.get("age")) or 0
+            entry.stored_at = time.time()
+            entry.etag = fields.get("etag")
+            entry.last_modified = fields.get("last-modified")
+            self.stats["revalidated"] += 1
+        return True
+
+    def record(self, outcome):
+        """Count a ``hit`` or ``miss`` for the statistics."""
+        with self.lock:
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+
+    def _insert(self, variant, entry):
+        self._memory[variant] = entry
+        self._memory_bytes += entry.size
+        while self._memory_bytes > self.max_bytes and self._memory:
+            old_variant, old = self._memory.popitem(last=False)
+            self._memory_bytes -= old.size
+            self.stats["evicted"] += 1
+            if self.cache_dir and old is not entry:
+                self._spill(old_variant, old)
+
+    def _discard(self, variant):
+        entry = self._memory.pop(variant, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size
+        entry = self._disk.pop(variant, None)
+        if entry is not None:
+            self._disk_bytes -= entry.size
+            self._unlink(entry)
+
+    def _drop_key(self, key):
+        for store in (self._memory, self._disk):
+            for variant in [v for v in store if v[0] == key]:
+                self._discard(variant)
+
+    def _spill(self, variant, entry):
+        name = hashlib.sha1(repr(variant).encode("utf-8")).hexdigest()
+        path = os.path.join(self.cache_dir, name)
+        try:
+            with open(path, "wb") as spill:
+                spill.write(entry.body)
+        except OSError as e:
+            log.sampled(log.WARNING, "[Cache] spill failed for {}: {}", variant[0], e)
+            return
+        # Readers may still hold the in-memory object, keep its body intact.
+        entry = copy.copy(entry)
+        entry.path = path
+        entry.body = None
+        self._disk[variant] = entry
+        self._disk_bytes += entry.size
+        self.stats["spilled"] += 1
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            _, old = self._disk.popitem(last=False)
+            self._disk_bytes -= old.size
+            self._unlink(old)
+
+    def _load(self, entry):
+        try:
+            with open(entry.path, "rb") as spill:
+                entry.body = spill.read()
+        except OSError:
+            return False
+        self._unlink(entry)
+        return True
+
+    def _unlink(self, entry):
+        if entry.path:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            entry.path = None
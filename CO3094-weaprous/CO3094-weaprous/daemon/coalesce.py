@@ -0,0 +1,116 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.coalesce
+~~~~~~~~~~~~~~~~~
+
+This module provides a single-flight helper used by the proxy to collapse
+concurrent identical upstream requests. The first caller of a key (the
+leader) runs the fetch, every caller arriving while it is in flight waits
+for the leader and receives the same result.
+
+Followers are bounded twice: at most ``max_waiters`` callers share a flight
+(the others fetch on their own) and a follower waits at most ``max_wait``
+seconds before giving up on the leader and fetching on its own.
+
+Usage::
+
+  >>> flights = SingleFlight()
+  >>> result, shared = flights.do(key, fetch, max_wait=2.0, max_waiters=64)
+"""
+
+import threading
+
+
+class _Flight:
+    """One in-progress fetch shared by a leader and its followers."""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+
+    :attrs stats (dict): ``leader``, ``shared``, ``overflow`` and ``timeout``
+                         counters.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {"leader": 0, "shared": 0, "overflow": 0, "timeout": 0}
+        self._flights = {}
+
+    def do(self, key, fetch, max_wait=5.0, max_waiters=100):
+        """
+        Run ``fetch()`` once for all concurrent callers of ``key``.
+
+        :param key (hashable): identity of the request.
+        :param fetch (callable): produces the result, called without arguments.
+        :param max_wait (float): seconds a follower waits for the leader.
+        :param max_waiters (int): followers allowed on one flight.
+
+        :rtype tuple: (result, shared) where ``shared`` is True when the
+                      result came from another caller's fetch.
+        """
+        with self.lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.stats["leader"] += 1
+                leader = True
+            elif flight.waiters >= max_waiters:
+                self.stats["overflow"] += 1
+                flight = None
+                leader = False
+            else:
+                flight.waiters += 1
+                leader = False
+
+        if flight is None:
+            return fetch(), False
+
+        if leader:
+            try:
+                flight.result = fetch()
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self.lock:
+                    self._flights.pop(key, None)
+                flight.done.set()
+            return flight.result, False
+
+        if not flight.done.wait(max_wait):
+            with self.lock:
+                self.stats["timeout"] += 1
+            return fetch(), False
+        if flight.error is not None:
+            # The leader failed, do not fan its exception out to everyone.
+            return fetch(), False
+        with self.lock:
+            self.stats["shared"] += 1
+        return flight.result, True
+
+    def inflight(self):
+        """Number of keys currently being fetched."""
+        with self.lock:
+            return len(self._flights)
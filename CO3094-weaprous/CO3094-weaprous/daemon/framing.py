@@ -0,0 +1,320 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.framing
+~~~~~~~~~~~~~~~~~
+
+This module delimits HTTP/1.x messages on a stream socket so that several
+requests and responses can follow each other on one connection. Bodies are
+framed by ``Content-Length`` or ``Transfer-Encoding: chunked`` and are kept
+in their wire form, ready to be relayed unchanged.
+
+Usage::
+
+  >>> reader = MessageReader(conn)
+  >>> head = reader.read_head()
+  >>> body = reader.read_body(head_fields(head)[1])
+"""
+
+#: Largest accepted message head (start line and headers).
+MAX_HEAD = 65536
+
+#: Size of one socket read.
+RECV_SIZE = 65536
+
+
+class FramingError(ValueError):
+    """Raised when a message cannot be delimited."""
+
+
+def head_fields(head):
+    """
+    Parse a message head.
+
+    :params head (bytes): start line and headers, with the final blank line.
+
+    :rtype tuple: (start_line, fields) where fields maps lower-case header
+                  names to values; repeated headers are joined with ``", "``.
+    """
+    lines = head.decode('iso-8859-1').split('\r\n')
+    fields = {}
+    for line in lines[1:]:
+        if ':' not in line:
+            continue
+        name, value = line.split(':', 1)
+        name = name.strip().lower()
+        value = value.strip()
+        fields[name] = fields[name] + ', ' + value if name in fields else value
+    return lines[0], fields
+
+
+def is_chunked(fields):
+    """Whether the last transfer coding of a message is ``chunked``."""
+    codings = fields.get('transfer-encoding', '')
+    return codings.split(',')[-1].strip().lower() == 'chunked'
+
+
+def content_length(fields):
+    """
+    Return the ``Content-Length`` of a message.
+
+    :rtype int: declared length, or None when absent.
+    :raises FramingError: on an invalid or conflicting value.
+    """
+    value = fields.get('content-length')
+    if value is None:
+        return None
+    values = {v.strip() for v in value.split(',')}
+    if len(values) != 1:
+        raise FramingError("Conflicting Content-Length: {}".format(value))
+    try:
+        length = int(values.pop())
+    except ValueError:
+        raise FramingError("Invalid Content-Length: {}".format(value))
+    if length < 0:
+        raise FramingError("Negative Content-Length: {}".format(value))
+    return length
+
+
+def decode_chunked(data):
+    """
+    Decode a complete chunked body.
+
+    :params data (bytes): body in wire form, as read by
+                          :meth:`MessageReader.read_chunked`.
+
+    :rtype bytes: the payload, trailers dropped.
+    :raises FramingError: on an invalid chunk size or a truncated body.
+    """
+    payload = []
+    pos = 0
+    while True:
+        end = data.find(b'\r\n', pos)
+        if end == -1:
+            raise FramingError("Truncated chunk size line")
+        try:
+            size = int(data[pos:end].split(b';', 1)[0].strip(), 16)
+        except ValueError:
+            raise FramingError("Invalid chunk size line {!r}".format(data[pos:end]))
+        pos = end + 2
+        if size == 0:
+            return b''.join(payload)
+        if pos + size > len(data):
+            raise FramingError("Truncated chunk")
+        payload.append(data[pos:pos + size])
+        pos += size + 2
+
+
+class MessageReader:
+    """
+    Buffered reader of HTTP messages from a socket.
+
+    Bytes read past the end of a message stay buffered for the next one,
+    which is what makes pipelined requests work.
+
+    :attrs sock (socket.socket): connection read from.
+    :attrs buffer (bytes): received bytes not consumed yet.
+    """
+
+    def __init__(self, sock, max_head=MAX_HEAD):
+        self.sock = sock
+        self.max_head = max_head
+        self.buffer = b''
+
+    def _fill(self):
+        chunk = self.sock.recv(RECV_SIZE)
+        if chunk:
+            self.buffer += chunk
+        return bool(chunk)
+
+    def read_head(self):
+        """
+        Read the next message head.
+
+        :rtype bytes: the head including its blank line, or None when the
+                      peer closed the connection between two messages.
+        :raises FramingError: if the head is too large or truncated.
+        """
+        while True:
+            end = self.buffer.find(b'\r\n\r\n')
+            if end != -1:
+                head = self.buffer[:end + 4]
+                self.buffer = self.buffer[end + 4:]
+                return head
+            if len(self.buffer) > self.max_head:
+                raise FramingError("Message head larger than {} bytes".format(self.max_head))
+            if not self._fill():
+                if self.buffer.strip():
+                    raise FramingError("Connection closed inside a message head")
+                return None
+
+    def read_exact(self, size):
+        """
+        Read exactly ``size`` bytes.
+
+        :raises FramingError: if the peer closes first.
+        """
+        while len(self.buffer) < size:
+            if not self._fill():
+                raise FramingError("Connection closed inside a message body")
+        data = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return data
+
+    def read_line(self):
+        """Read one CRLF terminated line, CRLF included."""
+        while True:
+            end = self.buffer.find(b'\r\n')
+            if end != -1:
+                line = self.buffer[:end + 2]
+                self.buffer = self.buffer[end + 2:]
+                return line
+            if len(self.buffer) > self.max_head:
+                raise FramingError("Chunk line too long")
+            if not self._fill():
+                raise FramingError("Connection closed inside a chunk line")
+
+    def read_chunked(self):
+        """
+        Read a chunked body, framing and trailers included.
+
+        :rtype bytes: the body in wire form.
+        """
+        parts = []
+        while True:
+            line = self.read_line()
+            parts.append(line)
+            try:
+                size = int(line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise FramingError("Invalid chunk size line {!r}".format(line))
+            if size == 0:
+                break
+            parts.append(self.read_exact(size + 2))
+        # Trailer section ends with an empty line.
+        while True:
+            line = self.read_line()
+            parts.append(line)
+            if line == b'\r\n':
+                return b''.join(parts)
+
+    def read_until_close(self):
+        """Read everything until the peer closes the connection."""
+        while self._fill():
+            pass
+        data, self.buffer = self.buffer, b''
+        return data
+
+    def read_body(self, fields):
+        """
+        Read the body of a request with the given header fields.
+
+        :rtype bytes: the body in wire form, empty when there is none.
+        """
+        if is_chunked(fields):
+            return self.read_chunked()
+        length = content_length(fields)
+        if not length:
+            return b''
+        return self.read_exact(length)
+
+
+def wants_keep_alive(start_line, fields):
+    """
+    Whether the sender of a request (or response) wants the connection to
+    stay open: HTTP/1.1 unless ``Connection: close``, HTTP/1.0 only with
+    ``Connection: keep-alive``.
+    """
+    tokens = {t.strip().lower() for t in fields.get('connection', '').split(',')}
+    if 'close' in tokens:
+        return False
+    if start_line.rstrip().endswith('HTTP/1.0') or start_line.startswith('HTTP/1.0'):
+        return 'keep-alive' in tokens
+    return True
+
+
+def reframe_response(raw, method, keep_alive, keep_alive_header=None):
+    """
+    Make a complete upstream response safe to send on a persistent client
+    connection.
+
+    The upstream response was read until close, so its length is known: a
+    missing ``Content-Length`` is added, bytes past a declared length are
+    dropped, responses to HEAD and 1xx/204/304 responses lose their body,
+    and the hop-by-hop ``Connection`` / ``Keep-Alive`` headers are replaced
+    by the proxy's own decision. A body cut short by the upstream, shorter
+    than its ``Content-Length`` or chunked without the last chunk, is sent
+    with ``Connection: close`` whatever ``keep_alive`` says, so that the
+    client does not take the next response for the rest of it.
+
+    :params raw (bytes): full upstream response.
+    :params method (str): method of the request it answers.
+    :params keep_alive (bool): whether the client connection stays open.
+    :params keep_alive_header (str): optional ``Keep-Alive`` value.
+
+    :rtype bytes: response ready for the client.
+    """
+    head, sep, body = raw.partition(b'\r\n\r\n')
+    if not sep:
+        return raw
+    lines = head.split(b'\r\n')
+    status_line = lines[0]
+    parts = status_line.split(b' ', 2)
+    try:
+        status = int(parts[1])
+    except (IndexError, ValueError):
+        return raw
+    kept = []
+    length = None
+    chunked = False
+    for line in lines[1:]:
+        name = line.split(b':', 1)[0].strip().lower()
+        if name in (b'connection', b'keep-alive'):
+            continue
+        if name == b'content-length':
+            try:
+                length = int(line.split(b':', 1)[1].strip())
+            except (IndexError, ValueError):
+                continue
+        elif name == b'transfer-encoding':
+            chunked = line.split(b':', 1)[1].strip().lower().endswith(b'chunked')
+        kept.append(line)
+
+    truncated = False
+    if status < 200 or status in (204, 304):
+        body = b''
+        kept = [line for line in kept if not line.lower().startswith(b'content-length:')]
+    elif chunked:
+        try:
+            decode_chunked(body)
+            truncated = not body.endswith(b'\r\n\r\n')
+        except FramingError:
+            truncated = True
+    elif length is None:
+        kept.append('Content-Length: {}'.format(len(body)).encode('ascii'))
+    else:
+        truncated = len(body) < length
+        body = body[:length]
+    if method == 'HEAD':
+        body = b''
+        truncated = False
+    if truncated:
+        keep_alive = False
+
+    if keep_alive:
+        kept.append(b'Connection: keep-alive')
+        if keep_alive_header:
+            kept.append('Keep-Alive: {}'.format(keep_alive_header).encode('ascii'))
+    else:
+        kept.append(b'Connection: close')
+    return b'\r\n'.join([status_line] + kept) + b'\r\n\r\n' + body
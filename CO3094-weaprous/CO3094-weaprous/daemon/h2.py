@@ -0,0 +1,649 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.h2
+~~~~~~~~~~~~~~~~~
+
+This module serves HTTP/2 over cleartext TCP (h2c) on the client side of
+the proxy. A client starts it either with prior knowledge (it sends the
+HTTP/2 connection preface right away) or by asking for ``Upgrade: h2c`` on
+an HTTP/1.1 request, which then becomes stream 1.
+
+Each stream is translated into an HTTP/1.1 request and answered by its own
+thread, so many concurrent requests of one client share one connection
+while the backends keep speaking HTTP/1.1. Headers are compressed with
+:mod:`daemon.hpack`; responses are sent within the connection and stream
+flow control windows of the client, and request bodies are acknowledged
+with WINDOW_UPDATE as they arrive.
+
+Usage::
+
+  >>> H2Connection(conn, respond).serve(initial=preface_bytes)
+
+where ``respond(hostname, request)`` returns the raw HTTP/1.1 response to a
+raw HTTP/1.1 request.
+"""
+
+import base64
+import socket
+import threading
+
+from .cache import parse_response
+from .framing import FramingError, decode_chunked
+from .hpack import Decoder, Encoder, HPACKError
+from . import log
+
+#: Connection preface sent by HTTP/2 clients.
+PREFACE = b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n'
+
+# Frame types (RFC 9113 section 6).
+DATA = 0x0
+HEADERS = 0x1
+PRIORITY = 0x2
+RST_STREAM = 0x3
+SETTINGS = 0x4
+PUSH_PROMISE = 0x5
+PING = 0x6
+GOAWAY = 0x7
+WINDOW_UPDATE = 0x8
+CONTINUATION = 0x9
+
+# Frame flags.
+FLAG_END_STREAM = 0x1
+FLAG_ACK = 0x1
+FLAG_END_HEADERS = 0x4
+FLAG_PADDED = 0x8
+FLAG_PRIORITY = 0x20
+
+# Settings identifiers.
+SETTINGS_HEADER_TABLE_SIZE = 0x1
+SETTINGS_ENABLE_PUSH = 0x2
+SETTINGS_MAX_CONCURRENT_STREAMS = 0x3
+SETTINGS_INITIAL_WINDOW_SIZE = 0x4
+SETTINGS_MAX_FRAME_SIZE = 0x5
+SETTINGS_MAX_HEADER_LIST_SIZE = 0x6
+
+# Error codes.
+NO_ERROR = 0x0
+PROTOCOL_ERROR = 0x1
+INTERNAL_ERROR = 0x2
+FLOW_CONTROL_ERROR = 0x3
+STREAM_CLOSED = 0x5
+FRAME_SIZE_ERROR = 0x6
+REFUSED_STREAM = 0x7
+CANCEL = 0x8
+COMPRESSION_ERROR = 0x9
+
+#: Streams a client may have open at once on one connection.
+MAX_CONCURRENT_STREAMS = 100
+
+#: Flow control window of a new stream and of a connection.
+DEFAULT_WINDOW = 65535
+
+#: Largest flow control window allowed by the protocol.
+MAX_WINDOW = 2 ** 31 - 1
+
+#: Largest frame payload we accept (the protocol default).
+MAX_FRAME_SIZE = 16384
+
+#: Largest request body buffered for one stream.
+MAX_REQUEST_BODY = 16 * 1024 * 1024
+
+#: Seconds an h2c connection may stay without any frame or progress.
+IDLE_TIMEOUT = 60.0
+
+#: Headers meaningful for one HTTP/1.1 connection only, never sent on HTTP/2.
+CONNECTION_HEADERS = frozenset((
+    'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade',
+))
+
+
+class H2Error(Exception):
+    """A connection error: the connection is closed with GOAWAY."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class StreamError(H2Error):
+    """A stream error: only the stream is reset with RST_STREAM."""
+
+    def __init__(self, stream_id, code, message):
+        super().__init__(code, message)
+        self.stream_id = stream_id
+
+
+def is_h2c_upgrade(fields):
+    """
+    Whether an upgrade request asks for h2c with the required
+    ``HTTP2-Settings`` header.
+
+    :params fields (dict): lower-case request headers.
+    """
+    tokens = {t.strip().lower() for t in fields.get('upgrade', '').split(',')}
+    return 'h2c' in tokens and 'http2-settings' in fields
+
+
+def decode_settings(payload):
+    """
+    Split a SETTINGS payload into (identifier, value) pairs.
+
+    :raises H2Error: if the payload is not a multiple of 6 bytes.
+    """
+    if len(payload) % 6:
+        raise H2Error(FRAME_SIZE_ERROR, "SETTINGS length is not a multiple of 6")
+    return [(int.from_bytes(payload[i:i + 2], 'big'), int.from_bytes(payload[i + 2:i + 6], 'big'))
+            for i in range(0, len(payload), 6)]
+
+
+def encode_settings(settings):
+    """Build a SETTINGS payload from (identifier, value) pairs."""
+    return b''.join(ident.to_bytes(2, 'big') + value.to_bytes(4, 'big')
+                    for ident, value in settings)
+
+
+def to_http1(stream_id, headers, body):
+    """
+    Translate the headers and body of a stream into an HTTP/1.1 request.
+
+    :params stream_id (int): stream the request arrived on.
+    :params headers (list): decoded (name, value) pairs.
+    :params body (bytes): request body.
+
+    :rtype tuple: (hostname, method, raw HTTP/1.1 request as str).
+    :raises StreamError: on a malformed request.
+    """
+    pseudo = {}
+    fields = []
+    cookies = []
+    regular = False
+    for name, value in headers:
+        if name.startswith(':'):
+            if regular or name in pseudo or name not in (':method', ':path', ':scheme', ':authority'):
+                raise StreamError(stream_id, PROTOCOL_ERROR, "Invalid pseudo-header {}".format(name))
+            pseudo[name] = value
+            continue
+        regular = True
+        if name != name.lower() or name in CONNECTION_HEADERS:
+            raise StreamError(stream_id, PROTOCOL_ERROR, "Invalid header {}".format(name))
+        if name == 'te' and value.strip().lower() != 'trailers':
+            raise StreamError(stream_id, PROTOCOL_ERROR, "TE other than trailers")
+        if name == 'cookie':
+            cookies.append(value)
+        elif name not in ('host', 'content-length'):
+            fields.append((name, value))
+    method = pseudo.get(':method')
+    path = pseudo.get(':path')
+    if not method or not path or ':scheme' not in pseudo or method == 'CONNECT':
+        raise StreamError(stream_id, PROTOCOL_ERROR, "Missing or unsupported pseudo-headers")
+    hostname = pseudo.get(':authority') or dict(headers).get('host', '')
+
+    lines = ['{} {} HTTP/1.1'.format(method, path), 'Host: {}'.format(hostname)]
+    if cookies:
+        lines.append('Cookie: {}'.format('; '.join(cookies)))
+    lines.extend('{}: {}'.format(name, value) for name, value in fields)
+    if body or method in ('POST', 'PUT', 'PATCH'):
+        lines.append('Content-Length: {}'.format(len(body)))
+    request = '\r\n'.join(lines) + '\r\n\r\n' + body.decode('utf-8', 'surrogateescape')
+    return hostname, method, request
+
+
+def from_http1(raw, method):
+    """
+    Translate a raw HTTP/1.1 response into HTTP/2 headers and body.
+
+    :params raw (bytes): complete upstream response.
+    :params method (str): method of the request it answers.
+
+    :rtype tuple: (headers list starting with ``:status``, body bytes).
+    """
+    parsed = parse_response(raw)
+    if parsed is None:
+        return [(':status', '502'), ('content-type', 'text/plain')], b'502 Bad Gateway'
+    status, _, response_headers, body = parsed
+    dropped = set(CONNECTION_HEADERS)
+    chunked = False
+    length = None
+    for name, value in response_headers:
+        lower = name.lower()
+        if lower == 'connection':
+            dropped.update(t.strip().lower() for t in value.split(','))
+        elif lower == 'transfer-encoding':
+            chunked = value.lower().endswith('chunked')
+        elif lower == 'content-length' and value.isdigit():
+            length = int(value)
+    if chunked:
+        try:
+            body = decode_chunked(body)
+        except FramingError:
+            pass
+        length = None
+    elif length is not None:
+        body = body[:length]
+    headers = [(':status', str(status))]
+    for name, value in response_headers:
+        lower = name.lower()
+        if lower in dropped or (lower == 'content-length' and chunked):
+            continue
+        headers.append((lower, value))
+    if status < 200 or status in (204, 304) or method == 'HEAD':
+        body = b''
+    return headers, body
+
+
+class Stream:
+    """
+    State of one client stream.
+
+    :attrs id (int): stream identifier.
+    :attrs headers (list): decoded request headers.
+    :attrs body (bytearray): request body received so far.
+    :attrs request (tuple): (hostname, method, request) when the stream
+                            comes from an HTTP/1.1 upgrade.
+    :attrs remote_closed (bool): the client finished sending.
+    :attrs reset (bool): the stream was reset by either side.
+    :attrs send_window (int): bytes we may still send on the stream.
+    """
+
+    __slots__ = ("id", "headers", "body", "request", "remote_closed", "reset", "send_window")
+
+    def __init__(self, stream_id, send_window):
+        self.id = stream_id
+        self.headers = []
+        self.body = bytearray()
+        self.request = None
+        self.remote_closed = False
+        self.reset = False
+        self.send_window = send_window
+
+
+class H2Connection:
+    """
+    Server side of one h2c connection.
+
+    The thread calling :meth:`serve` reads frames; every complete request is
+    answered by its own thread. Writes to the socket are serialised with a
+    lock, and flow control state is guarded by a condition variable that
+    senders wait on for WINDOW_UPDATE.
+
+    :attrs sock (socket.socket): client connection.
+    :attrs respond (callable): ``respond(hostname, request) -> bytes``.
+    :attrs streams (dict): stream id -> open :class:`Stream`.
+    :attrs stats (dict): counters of ``streams``, ``refused`` and ``reset``.
+    """
+
+    def __init__(self, sock, respond, idle_timeout=IDLE_TIMEOUT):
+        self.sock = sock
+        self.respond = respond
+        self.idle_timeout = idle_timeout
+        self.decoder = Decoder()
+        self.encoder = Encoder()
+        self.streams = {}
+        self.workers = []
+        self.last_stream_id = 0
+        self.send_window = DEFAULT_WINDOW
+        self.recv_window = DEFAULT_WINDOW
+        self.peer_initial_window = DEFAULT_WINDOW
+        self.peer_max_frame = MAX_FRAME_SIZE
+        self.closed = False
+        self.goaway = False
+        self.stats = {"streams": 0, "refused": 0, "reset": 0}
+        self.cond = threading.Condition()
+        self.write_lock = threading.Lock()
+        self._buffer = b''
+        self._continuing = None
+
+    # -- I/O --------------------------------------------------------------
+
+    def _read(self, size):
+        while len(self._buffer) < size:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise EOFError("Connection closed by the client")
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def send_frame(self, frame_type, flags, stream_id, payload=b''):
+        """Write one frame; safe to call from any thread."""
+        header = (len(payload).to_bytes(3, 'big') + bytes([frame_type, flags])
+                  + stream_id.to_bytes(4, 'big'))
+        with self.write_lock:
+            self.sock.sendall(header + payload)
+
+    def _send_headers(self, stream_id, headers, end_stream):
+        block = self.encoder.encode(headers)
+        size = self.peer_max_frame
+        fragments = [block[i:i + size] for i in range(0, len(block), size)] or [b'']
+        flags = FLAG_END_STREAM if end_stream else 0
+        # HEADERS and its CONTINUATIONs must not be interleaved with others.
+        with self.write_lock:
+            for i, fragment in enumerate(fragments):
+                last = FLAG_END_HEADERS if i == len(fragments) - 1 else 0
+                frame_type = HEADERS if i == 0 else CONTINUATION
+                frame_flags = (flags | last) if i == 0 else last
+                self.sock.sendall(len(fragment).to_bytes(3, 'big')
+                                  + bytes([frame_type, frame_flags])
+                                  + stream_id.to_bytes(4, 'big') + fragment)
+
+    def reset_stream(self, stream_id, code):
+        """Reset one stream and forget it."""
+        with self.cond:
+            stream = self.streams.pop(stream_id, None)
+            if stream is not None:
+                stream.reset = True
+            self.stats["reset"] += 1
+            self.cond.notify_all()
+        try:
+            self.send_frame(RST_STREAM, 0, stream_id, code.to_bytes(4, 'big'))
+        except OSError:
+            pass
+
+    # -- connection loop --------------------------------------------------
+
+    def serve(self, initial=b'', upgrade=None):
+        """
+        Run the connection until the client leaves or an error closes it.
+
+        :params initial (bytes): bytes already read from the client; with
+                                 prior knowledge they start with the preface.
+        :params upgrade (tuple): (hostname, method, request, settings header)
+                                 of an HTTP/1.1 upgrade request, answered on
+                                 stream 1.
+        """
+        self._buffer = initial
+        self.sock.settimeout(self.idle_timeout)
+        try:
+            self.send_frame(SETTINGS, 0, 0, encode_settings([
+                (SETTINGS_MAX_CONCURRENT_STREAMS, MAX_CONCURRENT_STREAMS),
+                (SETTINGS_INITIAL_WINDOW_SIZE, DEFAULT_WINDOW),
+                (SETTINGS_MAX_FRAME_SIZE, MAX_FRAME_SIZE),
+            ]))
+            if upgrade is not None:
+                hostname, method, request, settings = upgrade
+                try:
+                    padded = settings.strip() + '=' * (-len(settings.strip()) % 4)
+                    self._apply_settings(decode_settings(base64.urlsafe_b64decode(padded)))
+                except (ValueError, TypeError):
+                    raise H2Error(PROTOCOL_ERROR, "Invalid HTTP2-Settings header")
+                stream = Stream(1, self.peer_initial_window)
+                stream.request = (hostname, method, request)
+                stream.remote_closed = True
+                self.last_stream_id = 1
+                self.streams[1] = stream
+                self._dispatch(stream)
+            if self._read(len(PREFACE)) != PREFACE:
+                raise H2Error(PROTOCOL_ERROR, "Invalid connection preface")
+            while not self.goaway:
+                try:
+                    self._handle_frame(*self._read_frame())
+                except socket.timeout:
+                    with self.cond:
+                        idle = not self.streams
+                    if idle:
+                        self._close(NO_ERROR)
+                        break
+                except StreamError as e:
+                    self.reset_stream(e.stream_id, e.code)
+        except H2Error as e:
+            log.sampled(log.INFO, "[H2] Connection error {}: {}", e.code, e)
+            self._close(e.code)
+        except (EOFError, OSError):
+            # Nobody reads WINDOW_UPDATE any more: release waiting senders.
+            with self.cond:
+                self.closed = True
+                self.cond.notify_all()
+        finally:
+            for worker in self.workers:
+                worker.join(self.idle_timeout)
+            with self.cond:
+                self.closed = True
+                self.cond.notify_all()
+
+    def _close(self, code):
+        try:
+            self.send_frame(GOAWAY, 0, 0, self.last_stream_id.to_bytes(4, 'big')
+                            + code.to_bytes(4, 'big'))
+        except OSError:
+            pass
+        self.goaway = True
+
+    def _read_frame(self):
+        header = self._read(9)
+        length = int.from_bytes(header[:3], 'big')
+        stream_id = int.from_bytes(header[5:9], 'big') & 0x7fffffff
+        if length > MAX_FRAME_SIZE:
+            raise H2Error(FRAME_SIZE_ERROR, "Frame of {} bytes".format(length))
+        return header[3], header[4], stream_id, self._read(length)
+
+    def _handle_frame(self, frame_type, flags, stream_id, payload):
+        if self._continuing is not None and (
+                frame_type != CONTINUATION or stream_id != self._continuing[0]):
+            raise H2Error(PROTOCOL_ERROR, "Expected CONTINUATION")
+        if frame_type == DATA:
+            self._on_data(flags, stream_id, payload)
+        elif frame_type == HEADERS:
+            self._on_headers(flags, stream_id, payload)
+        elif frame_type == CONTINUATION:
+            if self._continuing is None:
+                raise H2Error(PROTOCOL_ERROR, "Unexpected CONTINUATION")
+            self._continuing[2].extend(payload)
+            if flags & FLAG_END_HEADERS:
+                sid, end_stream, block = self._continuing
+                self._continuing = None
+                self._on_header_block(sid, end_stream, bytes(block))
+        elif frame_type == PRIORITY:
+            if len(payload) != 5:
+                raise StreamError(stream_id, FRAME_SIZE_ERROR, "PRIORITY length")
+        elif frame_type == RST_STREAM:
+            if stream_id == 0 or len(payload) != 4:
+                raise H2Error(PROTOCOL_ERROR, "Invalid RST_STREAM")
+            with self.cond:
+                stream = self.streams.pop(stream_id, None)
+                if stream is not None:
+                    stream.reset = True
+                self.cond.notify_all()
+        elif frame_type == SETTINGS:
+            if stream_id:
+                raise H2Error(PROTOCOL_ERROR, "SETTINGS on a stream")
+            if flags & FLAG_ACK:
+                if payload:
+                    raise H2Error(FRAME_SIZE_ERROR, "SETTINGS ACK with payload")
+                return
+            self._apply_settings(decode_settings(payload))
+            self.send_frame(SETTINGS, FLAG_ACK, 0)
+        elif frame_type == PING:
+            if stream_id or len(payload) != 8:
+                raise H2Error(PROTOCOL_ERROR, "Invalid PING")
+            if not flags & FLAG_ACK:
+                self.send_frame(PING, FLAG_ACK, 0, payload)
+        elif frame_type == GOAWAY:
+            # The client opens no more streams; the open ones still finish
+            # and the client closes the connection once it has them.
+            pass
+        elif frame_type == WINDOW_UPDATE:
+            self._on_window_update(stream_id, payload)
+        elif frame_type == PUSH_PROMISE:
+            raise H2Error(PROTOCOL_ERROR, "PUSH_PROMISE from a client")
+        # Unknown frame types are ignored.
+
+    @staticmethod
+    def _strip_padding(flags, payload):
+        if not flags & FLAG_PADDED:
+            return payload
+        if not payload or payload[0] >= len(payload):
+            raise H2Error(PROTOCOL_ERROR, "Invalid padding")
+        return payload[1:len(payload) - payload[0]]
+
+    def _apply_settings(self, settings):
+        with self.cond:
+            for ident, value in settings:
+                if ident == SETTINGS_INITIAL_WINDOW_SIZE:
+                    if value > MAX_WINDOW:
+                        raise H2Error(FLOW_CONTROL_ERROR, "Initial window too large")
+                    delta = value - self.peer_initial_window
+                    self.peer_initial_window = value
+                    for stream in self.streams.values():
+                        stream.send_window += delta
+                elif ident == SETTINGS_MAX_FRAME_SIZE:
+                    if not MAX_FRAME_SIZE <= value <= 16777215:
+                        raise H2Error(PROTOCOL_ERROR, "Invalid max frame size")
+                    self.peer_max_frame = value
+                elif ident == SETTINGS_ENABLE_PUSH and value > 1:
+                    raise H2Error(PROTOCOL_ERROR, "Invalid ENABLE_PUSH")
+            self.cond.notify_all()
+
+    def _on_headers(self, flags, stream_id, payload):
+        if stream_id == 0:
+            raise H2Error(PROTOCOL_ERROR, "HEADERS on stream 0")
+        payload = self._strip_padding(flags, payload)
+        if flags & FLAG_PRIORITY:
+            if len(payload) < 5:
+                raise H2Error(FRAME_SIZE_ERROR, "HEADERS priority too short")
+            payload = payload[5:]
+        end_stream = bool(flags & FLAG_END_STREAM)
+        if flags & FLAG_END_HEADERS:
+            self._on_header_block(stream_id, end_stream, payload)
+        else:
+            self._continuing = (stream_id, end_stream, bytearray(payload))
+
+    def _on_header_block(self, stream_id, end_stream, block):
+        # The block must be decoded even for a refused stream: it updates
+        # the shared dynamic table.
+        try:
+            headers = self.decoder.decode(block)
+        except HPACKError as e:
+            raise H2Error(COMPRESSION_ERROR, str(e))
+        with self.cond:
+            stream = self.streams.get(stream_id)
+            count = len(self.streams)
+        if stream is not None:
+            # Trailers end the request; their fields are not forwarded.
+            if stream.remote_closed or not end_stream:
+                raise H2Error(PROTOCOL_ERROR, "HEADERS on a half-closed stream")
+            stream.remote_closed = True
+            self._dispatch(stream)
+            return
+        if stream_id % 2 == 0 or stream_id <= self.last_stream_id:
+            raise H2Error(PROTOCOL_ERROR, "Invalid new stream {}".format(stream_id))
+        self.last_stream_id = stream_id
+        if count >= MAX_CONCURRENT_STREAMS:
+            self.stats["refused"] += 1
+            raise StreamError(stream_id, REFUSED_STREAM, "Too many concurrent streams")
+        stream = Stream(stream_id, self.peer_initial_window)
+        stream.headers = headers
+        stream.remote_closed = end_stream
+        with self.cond:
+            self.streams[stream_id] = stream
+        if end_stream:
+            self._dispatch(stream)
+
+    def _on_data(self, flags, stream_id, payload):
+        if stream_id == 0:
+            raise H2Error(PROTOCOL_ERROR, "DATA on stream 0")
+        size = len(payload)
+        self.recv_window -= size
+        if self.recv_window < 0:
+            raise H2Error(FLOW_CONTROL_ERROR, "Connection window exceeded")
+        if size:
+            # The body is buffered at once: give the window straight back.
+            self.recv_window += size
+            self.send_frame(WINDOW_UPDATE, 0, 0, size.to_bytes(4, 'big'))
+        with self.cond:
+            stream = self.streams.get(stream_id)
+        if stream is None or stream.remote_closed:
+            if stream_id > self.last_stream_id:
+                raise H2Error(PROTOCOL_ERROR, "DATA on an idle stream")
+            raise StreamError(stream_id, STREAM_CLOSED, "DATA on a closed stream")
+        stream.body.extend(self._strip_padding(flags, payload))
+        if len(stream.body) > MAX_REQUEST_BODY:
+            raise StreamError(stream_id, CANCEL, "Request body too large")
+        if flags & FLAG_END_STREAM:
+            stream.remote_closed = True
+            self._dispatch(stream)
+        elif size:
+            self.send_frame(WINDOW_UPDATE, 0, stream_id, size.to_bytes(4, 'big'))
+
+    def _on_window_update(self, stream_id, payload):
+        if len(payload) != 4:
+            raise H2Error(FRAME_SIZE_ERROR, "WINDOW_UPDATE length")
+        increment = int.from_bytes(payload, 'big') & 0x7fffffff
+        if increment == 0:
+            if stream_id == 0:
+                raise H2Error(PROTOCOL_ERROR, "Zero WINDOW_UPDATE")
+            raise StreamError(stream_id, PROTOCOL_ERROR, "Zero WINDOW_UPDATE")
+        with self.cond:
+            if stream_id == 0:
+                self.send_window += increment
+                if self.send_window > MAX_WINDOW:
+                    raise H2Error(FLOW_CONTROL_ERROR, "Connection window overflow")
+            else:
+                stream = self.streams.get(stream_id)
+                if stream is not None:
+                    stream.send_window += increment
+                    if stream.send_window > MAX_WINDOW:
+                        raise StreamError(stream_id, FLOW_CONTROL_ERROR, "Stream window overflow")
+            self.cond.notify_all()
+
+    # -- responses --------------------------------------------------------
+
+    def _dispatch(self, stream):
+        self.stats["streams"] += 1
+        worker = threading.Thread(target=self._answer, args=(stream,), daemon=True)
+        self.workers = [w for w in self.workers if w.is_alive()]
+        self.workers.append(worker)
+        worker.start()
+
+    def _answer(self, stream):
+        try:
+            if stream.request is not None:
+                hostname, method, request = stream.request
+            else:
+                hostname, method, request = to_http1(stream.id, stream.headers, bytes(stream.body))
+            raw = self.respond(hostname, request)
+            headers, body = from_http1(raw, method)
+            if stream.reset:
+                return
+            self._send_headers(stream.id, headers, end_stream=not body)
+            if body:
+                self._send_body(stream, body)
+        except StreamError as e:
+            self.reset_stream(stream.id, e.code)
+        except OSError:
+            pass
+        finally:
+            with self.cond:
+                self.streams.pop(stream.id, None)
+                self.cond.notify_all()
+
+    def _send_body(self, stream, body):
+        """Send ``body`` as DATA frames within both flow control windows."""
+        pos = 0
+        while pos < len(body):
+            with self.cond:
+                while True:
+                    if stream.reset or self.closed:
+                        return
+                    size = min(len(body) - pos, self.send_window,
+                               stream.send_window, self.peer_max_frame)
+                    if size > 0:
+                        break
+                    if not self.cond.wait(self.idle_timeout):
+                        raise StreamError(stream.id, CANCEL, "Flow control window stalled")
+                self.send_window -= size
+                stream.send_window -= size
+            end = pos + size
+            self.send_frame(DATA, FLAG_END_STREAM if end == len(body) else 0,
+                            stream.id, body[pos:end])
+            pos = end
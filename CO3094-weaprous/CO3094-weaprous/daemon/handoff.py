@@ -0,0 +1,331 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.handoff
+~~~~~~~~~~~~~~~~~
+
+This module restarts a server (proxy, backend, tracker or peer) without
+refusing a single connection, by handing its listening sockets over to the
+new process.
+
+On ``SIGUSR2`` the running process starts a copy of itself, same interpreter
+and command line, that inherits the listening sockets as open file
+descriptors named in :data:`LISTEN_FDS_ENV`. The queue of pending
+connections belongs to the socket, so it is never closed while both
+processes run. Once the new process listens on every socket it writes to
+the pipe named in :data:`READY_FD_ENV`; the old process then stops
+accepting, lets the connections in progress finish for up to
+:data:`DRAIN_TIMEOUT` seconds and exits. A successor that dies or is not
+ready within :data:`READY_TIMEOUT` is stopped and the old process keeps
+serving.
+
+``SIGTERM`` runs the same drain without a successor.
+
+Only the sockets are handed over: state kept in memory, such as the peer
+list of the tracker or the chat history of a peer, starts empty in the new
+process.
+
+Usage::
+
+  >>> listener = listen_socket('0.0.0.0:8080', lambda: tcp_socket('0.0.0.0', 8080))
+  >>> ready()
+  >>> while True:
+  ...     accepted = accept(listener)
+  ...     if accepted is None:
+  ...         break
+  ...     spawn(handle_client, accepted)
+  >>> drain()
+
+  $ kill -USR2 <pid>
+"""
+
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+#: Environment variable listing the inherited listeners as ``name=fd,...``.
+LISTEN_FDS_ENV = 'WEAPROUS_LISTEN_FDS'
+
+#: Environment variable naming the pipe a successor reports readiness on.
+READY_FD_ENV = 'WEAPROUS_READY_FD'
+
+#: Seconds the old process waits for its connections before exiting.
+DRAIN_TIMEOUT = 30.0
+
+#: Seconds a successor may take to listen on every inherited socket.
+READY_TIMEOUT = 10.0
+
+#: Seconds an accept loop waits before checking whether it must stop.
+ACCEPT_POLL = 0.5
+
+#: Set once the process stops accepting; connections then finish and close.
+stopping = threading.Event()
+
+#: Drain deadline in seconds, set by :func:`install`.
+drain_timeout = DRAIN_TIMEOUT
+
+_lock = threading.Lock()
+_finished = threading.Condition(_lock)
+_listeners = {}
+_inherited = None
+_active = 0
+_waiting = set()
+_successor = None
+_restarting = False
+
+
+def _inherited_fds():
+    """Listeners passed by the previous process: name -> file descriptor."""
+    global _inherited
+    with _lock:
+        if _inherited is None:
+            _inherited = {}
+            for item in os.environ.pop(LISTEN_FDS_ENV, '').split(','):
+                name, sep, fd = item.rpartition('=')
+                if sep and fd.isdigit():
+                    _inherited[name] = int(fd)
+        return _inherited
+
+
+def tcp_socket(ip, port):
+    """
+    Create a TCP socket bound to ``ip:port``.
+
+    :rtype socket.socket: the bound, not yet listening, socket.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((ip, port))
+    return sock
+
+
+def listen_socket(name, bind, backlog=50):
+    """
+    Return the listening socket called ``name``: the one inherited from the
+    previous process, or a new one made by ``bind`` and put in listen mode.
+
+    :params name (str): stable name of the listener, e.g. ``ip:port`` or
+                        the path of a Unix socket.
+    :params bind (callable): returns a bound socket when none is inherited.
+    :params backlog (int): listen queue length of a new socket.
+
+    :rtype socket.socket: listening socket registered for handoff.
+    """
+    fd = _inherited_fds().pop(name, None)
+    if fd is not None:
+        sock = socket.socket(fileno=fd)
+        print("[Handoff] Inherited listener {} (fd {})".format(name, fd))
+    else:
+        sock = bind()
+        sock.listen(backlog)
+    # Accept loops wake up regularly to notice that they must stop.
+    sock.settimeout(ACCEPT_POLL)
+    with _lock:
+        _listeners[name] = sock
+    return sock
+
+
+def accept(listener):
+    """
+    Accept one connection on ``listener``. Once the process stops accepting
+    the listener is closed, its pending connections are left to the
+    successor, and None is returned.
+
+    :rtype tuple: (conn, addr), or None when the accept loop must end.
+    """
+    while not stopping.is_set():
+        try:
+            return listener.accept()
+        except socket.timeout:
+            continue
+    with _lock:
+        for name, sock in list(_listeners.items()):
+            if sock is listener:
+                del _listeners[name]
+    listener.close()
+    return None
+
+
+def ready():
+    """
+    Tell the previous process, if any, that every listener is up. Called by
+    a server once it accepts on all of its sockets.
+    """
+    fd = os.environ.pop(READY_FD_ENV, None)
+    if not fd or not fd.isdigit():
+        return
+    try:
+        os.write(int(fd), b'1')
+        os.close(int(fd))
+    except OSError as e:
+        print("[Handoff] Cannot report readiness: {}".format(e))
+
+
+def spawn(target, args):
+    """
+    Run a connection handler in a daemon thread counted by :func:`drain`.
+
+    :params target (callable): connection handler.
+    :params args (tuple): its arguments.
+    """
+    connection_opened()
+
+    def tracked():
+        try:
+            target(*args)
+        finally:
+            connection_closed()
+
+    threading.Thread(target=tracked, daemon=True).start()
+
+
+def connection_opened():
+    """Count one more connection in progress."""
+    global _active
+    with _lock:
+        _active += 1
+
+
+def connection_closed():
+    """Count one connection as finished."""
+    global _active
+    with _lock:
+        _active -= 1
+        _finished.notify_all()
+
+
+def idle(conn):
+    """
+    Mark a kept-alive connection as waiting for its next request; draining
+    closes it rather than waiting for its idle timeout.
+
+    :rtype bool: False when the process is already draining, the
+                 connection should then be closed.
+    """
+    with _lock:
+        if stopping.is_set():
+            return False
+        _waiting.add(conn)
+    return True
+
+
+def busy(conn):
+    """Mark a connection as no longer waiting, see :func:`idle`."""
+    with _lock:
+        _waiting.discard(conn)
+
+
+def drain(timeout=None):
+    """
+    Close the connections waiting for a next request and wait until the
+    other counted connections have finished, at most ``timeout`` seconds
+    (:data:`drain_timeout` by default).
+
+    :rtype int: connections still open at the deadline.
+    """
+    deadline = time.monotonic() + (drain_timeout if timeout is None else timeout)
+    with _finished:
+        for conn in _waiting:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        _waiting.clear()
+        if _active:
+            print("[Handoff] Draining {} connection(s)".format(_active))
+        while _active:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                print("[Handoff] {} connection(s) still open at the deadline".format(_active))
+                break
+            _finished.wait(left)
+        return _active
+
+
+def handed_off():
+    """Whether a successor took over the listeners of this process."""
+    return _successor is not None
+
+
+def restart():
+    """
+    Start a successor inheriting every listener and, once it is ready, stop
+    accepting in this process.
+
+    :rtype bool: True when the successor took over.
+    """
+    global _successor, _restarting
+    with _lock:
+        if _restarting or stopping.is_set():
+            return False
+        _restarting = True
+        fds = {name: sock.fileno() for name, sock in _listeners.items()}
+    try:
+        read_end, write_end = os.pipe()
+        env = dict(os.environ)
+        env[LISTEN_FDS_ENV] = ','.join('{}={}'.format(name, fd) for name, fd in fds.items())
+        env[READY_FD_ENV] = str(write_end)
+        try:
+            child = subprocess.Popen([sys.executable] + sys.orig_argv[1:], env=env,
+                                     pass_fds=list(fds.values()) + [write_end])
+        except OSError as e:
+            print("[Handoff] Cannot start a successor: {}".format(e))
+            os.close(read_end)
+            return False
+        finally:
+            os.close(write_end)
+        try:
+            readable, _, _ = select.select([read_end], [], [], READY_TIMEOUT)
+            is_ready = bool(readable) and os.read(read_end, 1) == b'1'
+        finally:
+            os.close(read_end)
+        if not is_ready:
+            print("[Handoff] Successor {} not ready, still serving".format(child.pid))
+            child.terminate()
+            return False
+        print("[Handoff] Successor {} took over {} listener(s)".format(child.pid, len(fds)))
+        _successor = child
+        stopping.set()
+        return True
+    finally:
+        with _lock:
+            _restarting = False
+
+
+def install(timeout=DRAIN_TIMEOUT):
+    """
+    Restart on SIGUSR2 and drain on SIGTERM. Only possible from the main
+    thread on platforms that have SIGUSR2.
+
+    :params timeout (float): drain deadline in seconds.
+
+    :rtype bool: True when the handlers are installed.
+    """
+    global drain_timeout
+    if not hasattr(signal, 'SIGUSR2'):
+        return False
+    try:
+        # Signal handlers run between bytecodes of the main thread, which
+        # is usually the one accepting: keep the restart out of it.
+        signal.signal(signal.SIGUSR2, lambda signum, frame: threading.Thread(
+            target=restart, daemon=True).start())
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    except ValueError:
+        return False
+    drain_timeout = timeout
+    return True
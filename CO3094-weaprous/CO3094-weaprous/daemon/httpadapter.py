@@ -18,12 +18,27 @@ This module provides a http adapter object to manage and persist
 http settings (headers, bodies). The adapter supports both
 raw URL paths and RESTful route definitions, and integrates with
 Request and Response objects to handle client-server communication.
+Every answered request is accounted in :mod:`daemon.metrics` and, when one
+is configured, written to the access log of :mod:`daemon.log`; its
+parsing, hook, response building and sending are spans of
+:mod:`daemon.trace` when tracing is on. Requests over the limits of
+:mod:`daemon.ratelimit` are refused before they are dispatched, and the
+request is read and the response sent within the deadlines of
+:mod:`daemon.timeouts`.
 """
 
+import math
+import socket
+import time
+
+from . import log, metrics, ratelimit, timeouts, trace
 from .request import Request
 from .response import Response
 from .dictionary import CaseInsensitiveDict
 
+#: Bytes asked of one ``recv`` while reading a request.
+RECV_SIZE = 4096
+
 class HttpAdapter:
     """
     A mutable :class:`HTTP adapter <HTTP adapter>` for managing client connections
@@ -79,6 +94,8 @@ class HttpAdapter:
         self.request = Request()
         #: Response
         self.response = Response()
+        #: Monotonic time the request started to arrive
+        self.arrived = None
 
     def handle_client(self, conn, addr, routes):
         """
@@ -97,22 +114,211 @@ class HttpAdapter:
         self.conn = conn        
         # Connection address.
         self.connaddr = addr
+        # The X-Deadline-Ms budget counts from here
+        self.arrived = time.monotonic()
         # Request handler
         req = self.request
         # Response handler
         resp = self.response
 
-        # Handle the request
-        msg = conn.recv(1024).decode()
+        # Handle the request, within the read deadlines
+        try:
+            msg = self.read_request(conn)
+        except timeouts.ClientTimeout as e:
+            self.timed_out(conn, resp, e.phase)
+            conn.close()
+            return
+        except timeouts.HeaderTooLarge:
+            log.sampled(log.WARNING, "[HttpAdapter] Request head of {} over {} bytes",
+                        self.client_ip(), timeouts.MAX_HEADER_BYTES)
+            self.answer_now(conn, resp.build_header_too_large())
+            conn.close()
+            return
+        except timeouts.RequestTooLarge:
+            log.sampled(log.WARNING, "[HttpAdapter] Request body of {} over {} bytes",
+                        self.client_ip(), timeouts.MAX_BODY_BYTES)
+            self.answer_now(conn, resp.build_payload_too_large())
+            conn.close()
+            return
+        if msg is None:
+            # Closed, or reaped, before a complete request
+            conn.close()
+            return
+        started = time.perf_counter()
+        received = len(msg)
+        msg = msg.decode()
         req.prepare(msg, routes)
+        # Adopt the trace of the proxy or of the calling peer, if any
+        parent = req.headers.get(trace.TRACE_HEADER) if req.headers else None
+        with trace.span('{} {}'.format(req.method, req.path), parent=parent):
+            trace.record('parse', started, time.perf_counter())
+            limits = ratelimit.limits
+            refused = None
+            if limits is not None:
+                refused = limits.admit(self.client_ip(), req.hook._route_path if req.hook else None)
+            if refused is not None:
+                response = self.refuse(req, resp, *refused)
+            else:
+                try:
+                    response = self.dispatch(req, resp)
+                finally:
+                    if limits is not None:
+                        limits.release()
+            self.record(req, received, response, started)
+            with trace.span('send'):
+                try:
+                    self.send_response(conn, response)
+                except timeouts.ClientTimeout as e:
+                    self.timed_out(conn, resp, e.phase)
+                except OSError as e:
+                    log.sampled(log.INFO, "[HttpAdapter] {} left before the response: {}",
+                                self.client_ip(), e)
+        conn.close()
+        return
+
+    def read_request(self, conn):
+        """
+        Read a request: the headers within :data:`timeouts.header_timeout
+        <daemon.timeouts.header_timeout>` seconds, then the ``Content-Length``
+        bytes of the body within :data:`timeouts.body_timeout
+        <daemon.timeouts.body_timeout>` seconds.
+
+        :param conn (socket): The client socket connection.
+
+        :rtype bytes: the request, None when the client closed the
+                      connection before sending all of it.
+        :raises ClientTimeout: when the client misses a deadline.
+        :raises HeaderTooLarge: when the head is over
+                                :data:`timeouts.MAX_HEADER_BYTES
+                                <daemon.timeouts.MAX_HEADER_BYTES>`.
+        :raises RequestTooLarge: when the body is over
+                                 :data:`timeouts.MAX_BODY_BYTES
+                                 <daemon.timeouts.MAX_BODY_BYTES>`.
+        """
+        data = bytearray()
+        deadline = time.monotonic() + timeouts.header_timeout
+        end = -1
+        while end < 0:
+            if len(data) > timeouts.MAX_HEADER_BYTES:
+                raise timeouts.HeaderTooLarge()
+            chunk = self.receive(conn, deadline, 'header')
+            if not chunk:
+                return None
+            # The blank line may straddle two reads
+            start = max(0, len(data) - 3)
+            data += chunk
+            end = data.find(b'\r\n\r\n', start)
+        length = 0
+        for line in bytes(data[:end]).split(b'\r\n')[1:]:
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'content-length':
+                try:
+                    length = int(value)
+                except ValueError:
+                    length = 0
+        # From here the body and write deadlines apply, not the reaper
+        timeouts.connections.hold(conn)
+        if length > timeouts.MAX_BODY_BYTES:
+            raise timeouts.RequestTooLarge()
+        total = end + 4 + max(0, length)
+        deadline = time.monotonic() + timeouts.body_timeout
+        while len(data) < total:
+            chunk = self.receive(conn, deadline, 'body')
+            if not chunk:
+                return None
+            data += chunk
+        return bytes(data)
+
+    def receive(self, conn, deadline, phase):
+        """
+        One ``recv`` on ``conn`` that waits at most until ``deadline``.
+
+        :rtype bytes: the bytes read, empty when the connection was closed.
+        :raises ClientTimeout: when the deadline passes.
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise timeouts.ClientTimeout(phase)
+        conn.settimeout(remaining)
+        try:
+            chunk = conn.recv(RECV_SIZE)
+        except socket.timeout:
+            raise timeouts.ClientTimeout(phase)
+        except OSError:
+            return b''
+        if phase == 'header':
+            timeouts.connections.seen(conn)
+        return chunk
+
+    def send_response(self, conn, response):
+        """
+        Send ``response`` within :data:`timeouts.write_timeout
+        <daemon.timeouts.write_timeout>` seconds.
+
+        :raises ClientTimeout: when the client does not read it in time.
+        """
+        deadline = time.monotonic() + timeouts.write_timeout
+        view = memoryview(response)
+        while view:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise timeouts.ClientTimeout('write')
+            conn.settimeout(remaining)
+            try:
+                sent = conn.send(view)
+            except socket.timeout:
+                raise timeouts.ClientTimeout('write')
+            view = view[sent:]
+
+    def timed_out(self, conn, resp, phase):
+        """
+        Account a client that missed the deadline of ``phase``, answering
+        ``408 Request Timeout`` if it missed a read deadline.
+        """
+        metrics.timeouts_total.inc((phase,))
+        log.sampled(log.INFO, "[HttpAdapter] {} missed the {} deadline", self.client_ip(), phase)
+        if phase != 'write':
+            self.answer_now(conn, resp.build_request_timeout())
+
+    def answer_now(self, conn, response):
+        """
+        Send a short error response if the socket takes it at once, for a
+        client that is not going to be read from any more.
+        """
+        try:
+            conn.setblocking(False)
+            conn.send(response)
+        except OSError:
+            pass
+
+    def dispatch(self, req, resp):
+        """
+        Produce the response to a prepared request: the route hook, the
+        login and cookie checks, or the static file.
+
+        :param req (Request): the prepared request.
+        :param resp (Response): the response builder.
+
+        :rtype bytes: complete HTTP response.
+        """
+
         response = None
+        # Shed work whose deadline, propagated by the proxy, already passed
+        if self.deadline_expired(req):
+            log.sampled(log.INFO, "[HttpAdapter] Deadline expired for {} {}", req.method, req.path)
+            return resp.build_deadline_exceeded()
         # Handle request hook
         if req.hook:
-            print("[HttpAdapter] hook in route-path METHOD {} PATH {}".format(req.hook._route_path,req.hook._route_methods))
-            result = req.hook(headers = req.headers,body = req.body) ###################### Fix here to handle hook
+            log.debug("[HttpAdapter] hook in route-path METHOD {} PATH {}", req.hook._route_path, req.hook._route_methods)
+            with trace.span('hook', route=req.hook._route_path):
+                result = req.hook(headers = req.headers,body = req.body) ###################### Fix here to handle hook
             #
             # TODO: handle for App hook here
             #
+            # A hook may name its Content-Type: ``return body, content_type``
+            content_type = None
+            if isinstance(result, tuple):
+                result, content_type = result
             if isinstance(result, dict):
                 import json
                 body = json.dumps(result).encode("utf-8")
@@ -127,7 +333,7 @@ class HttpAdapter:
             elif isinstance(result, str):
                 body = result.encode("utf-8")
                 resp.status_code = 200
-                resp.headers["Content-Type"] = "text/plain"
+                resp.headers["Content-Type"] = content_type or "text/plain"
                 resp._content = body
 
                 header = resp.build_response_header(req)
@@ -138,33 +344,34 @@ class HttpAdapter:
         
         # Check if this is POST /login request
         if req.method == "POST" and req.path == "/login":
-            print("[HttpAdapter] Handling POST /login - Authentication")
+            log.debug("[HttpAdapter] Handling POST /login - Authentication")
             
             # Validate credentials
             if req.body and isinstance(req.body, dict):
                 username = req.body.get('username', '')
                 password = req.body.get('password', '')
                 
-                print(f"[HttpAdapter] Login attempt - username: {username}")
+                log.debug("[HttpAdapter] Login attempt - username: {}", username)
                 
                 # Check credentials: username=admin, password=password
                 if username == 'admin' and password == 'password':
-                    print("[HttpAdapter] Login successful - Setting auth cookie")
+                    log.debug("[HttpAdapter] Login successful - Setting auth cookie")
                     
                     # Valid credentials - serve index page with auth cookie
                     resp.status_code = 200
                     resp.set_cookie('auth', 'true')
+                    resp.headers['Cache-Control'] = 'private, no-cache'
                     
                     # Change path to index to serve the page
                     req.path = '/index.html'
                     response = resp.build_response(req)
                 else:
-                    print("[HttpAdapter] Login failed - Invalid credentials")
+                    log.sampled(log.INFO, "[HttpAdapter] Login failed - Invalid credentials")
                     
                     # Invalid credentials - return 401
                     response = resp.build_unauthorized()
             else:
-                print("[HttpAdapter] Login failed - No body or invalid format")
+                log.sampled(log.INFO, "[HttpAdapter] Login failed - No body or invalid format")
                 # No body or invalid format
                 response = resp.build_unauthorized()
         
@@ -174,18 +381,20 @@ class HttpAdapter:
         
         # Check if this is GET request to protected resource
         elif req.method == "GET" and req.path in ["/", "/index.html"]:
-            print(f"[HttpAdapter] Handling GET {req.path}")
+            log.debug("[HttpAdapter] Handling GET {}", req.path)
             
             # Check for auth cookie
             if req.cookies and req.cookies.get('auth') == 'true':
-                print("[HttpAdapter] Auth cookie valid - Serving content")
+                log.debug("[HttpAdapter] Auth cookie valid - Serving content")
                 
-                # Cookie is valid - serve the requested page
+                # Cookie is valid - serve the requested page, to this
+                # client only
                 resp.status_code = 200
+                resp.headers['Cache-Control'] = 'private, no-cache'
                 response = resp.build_response(req)
                 
             else:
-                print("[HttpAdapter] Auth cookie missing/invalid - Unauthorized")
+                log.debug("[HttpAdapter] Auth cookie missing/invalid - Unauthorized")
                 
                 # No valid auth cookie - return 401
                 response = resp.build_unauthorized()
@@ -195,9 +404,93 @@ class HttpAdapter:
         
 
         #print(response)
-        conn.sendall(response)
-        conn.close()
-        return
+        return response
+
+    def record(self, req, received, response, started):
+        """
+        Account one answered request: count and latency per method and
+        route, status code and bytes in both directions, and its access log
+        record.
+
+        :param req (Request): the prepared request.
+        :param received (int): request bytes read.
+        :param response (bytes): response about to be sent.
+        :param started (float): :func:`time.perf_counter` once the request
+                                was read.
+        """
+        # Static files share one route label, their paths are unbounded.
+        route = req.hook._route_path if req.hook else 'static'
+        labels = (req.method or '-', route)
+        elapsed = time.perf_counter() - started
+        metrics.requests_total.inc(labels)
+        metrics.request_seconds.observe(elapsed, labels)
+        code = response[9:12].decode('latin-1') if response.startswith(b'HTTP/') else '-'
+        metrics.responses_total.inc((code,))
+        metrics.bytes_received.inc(amount=received)
+        metrics.bytes_sent.inc(amount=len(response))
+        log.access(client=self.connaddr[0] if isinstance(self.connaddr, tuple) else None,
+                   method=req.method, path=req.path, route=route, status=code,
+                   received=received, sent=len(response), duration_ms=round(elapsed * 1000, 3))
+
+    def client_ip(self):
+        """
+        Address of the client, used to tell clients apart; empty for a
+        Unix domain socket. Behind a proxy trusted by :mod:`daemon.ratelimit`
+        the client is the one the proxy put in ``X-Forwarded-For``.
+
+        :rtype str: the client IP address.
+        """
+        if isinstance(self.connaddr, tuple) and self.connaddr:
+            peer = self.connaddr[0]
+        else:
+            peer = str(self.connaddr or '')
+        limits = ratelimit.limits
+        if limits is None:
+            return peer
+        forwarded_for = (self.request.headers or {}).get('x-forwarded-for')
+        return limits.client_of(peer, forwarded_for)
+
+    def refuse(self, req, resp, code, retry_after):
+        """
+        Answer a request refused by :mod:`daemon.ratelimit`.
+
+        :param req (Request): the prepared request.
+        :param resp (Response): the response builder.
+        :param code (int): 429 when the client is over its rate, 503 when
+                           the backend is overloaded.
+        :param retry_after (float): seconds before the client may try again.
+
+        :rtype bytes: complete HTTP response.
+        """
+        retry_after = max(1, math.ceil(retry_after))
+        log.sampled(log.WARNING, "[HttpAdapter] {} {} from {} refused with {}",
+                    req.method, req.path, self.client_ip(), code)
+        if code == 429:
+            return resp.build_too_many_requests(retry_after)
+        return resp.build_service_unavailable(retry_after)
+
+    def deadline_expired(self, req):
+        """
+        Whether the request carries an ``X-Deadline-Ms`` budget that is
+        already spent, so that answering it is wasted work. The budget
+        counts from the arrival of the request, so the time spent receiving
+        and parsing it, or waiting for a thread, is taken off.
+
+        :param req (Request): the prepared request.
+
+        :rtype bool: True when the budget has run out.
+        """
+        budget = (req.headers or {}).get('x-deadline-ms')
+        if budget is None:
+            return False
+        try:
+            budget = int(budget) / 1000.0
+        except ValueError:
+            return False
+        if budget <= 0:
+            return True
+        arrived = self.arrived if self.arrived is not None else time.monotonic()
+        return time.monotonic() - arrived >= budget
 
     @property
     def extract_cookies(self, req, resp):
@@ -0,0 +1,278 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.log
+~~~~~~~~~~~~~~~~~
+
+This module provides the levelled, buffered logging of the daemon package.
+
+A call below the current :data:`level` returns after one comparison: the
+message is a ``str.format`` template whose arguments are only formatted
+when the record is written. Records that pass are appended to an in-memory
+queue and written in batches by a background thread, so a request never
+waits on the stdout lock. Warnings and errors wake the writer at once,
+other records wait at most :data:`FLUSH_INTERVAL` seconds. When the queue
+holds :data:`MAX_PENDING` records new ones are dropped and counted.
+
+:func:`sampled` rate-limits a message to :data:`sample_rate` records per
+second, for lines that a client can trigger at will (parse errors, refused
+requests); the number of suppressed records is reported once per second.
+
+:func:`access` writes one JSON object per answered request to the access
+log, when one is configured.
+
+The level and the access log come from :data:`LEVEL_ENV` and
+:data:`ACCESS_LOG_ENV`, or from :func:`configure`.
+
+Usage::
+
+  >>> from daemon import log
+  >>> log.configure(level='debug', access_log='-')
+  >>> log.debug("[Request] {} path {}", method, path)
+  >>> log.sampled(log.WARNING, "[Proxy] {} bad request: {}", addr, e)
+  >>> log.access(client=addr[0], method='GET', path='/', status=200)
+"""
+
+import atexit
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+#: Level names accepted by :func:`configure` and :data:`LEVEL_ENV`.
+LEVEL_NAMES = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+
+#: Environment variable holding the level name.
+LEVEL_ENV = 'WEAPROUS_LOG_LEVEL'
+
+#: Environment variable holding the access log path, ``-`` for stdout.
+ACCESS_LOG_ENV = 'WEAPROUS_ACCESS_LOG'
+
+#: Level when none is configured: per-request lines are debug records.
+DEFAULT_LEVEL = INFO
+
+#: Seconds the writer waits before writing the queued records.
+FLUSH_INTERVAL = 0.1
+
+#: Records queued at most; later ones are dropped until the writer catches up.
+MAX_PENDING = 10000
+
+#: Default records per second and message of :func:`sampled`.
+SAMPLE_RATE = 10
+
+_ACCESS = 0
+_LABELS = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+
+def _level(value):
+    if isinstance(value, int):
+        return value
+    try:
+        return LEVEL_NAMES[value.strip().lower()]
+    except KeyError:
+        raise ValueError("Unknown log level {!r}".format(value))
+
+
+#: Records below this level are dropped before any formatting.
+level = _level(os.environ.get(LEVEL_ENV) or DEFAULT_LEVEL)
+
+#: Records per second and message let through by :func:`sampled`.
+sample_rate = SAMPLE_RATE
+
+#: Records dropped because the queue was full.
+dropped = 0
+
+_pending = collections.deque()
+_wake = threading.Event()
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_writer = None
+_stream = None
+_access_stream = None
+_samples = {}
+
+
+def configure(level=None, stream=None, access_log=None, sample_rate=None):
+    """
+    Change the logging settings of the process.
+
+    :params level (str or int): ``debug``, ``info``, ``warning`` or ``error``.
+    :params stream (file): destination of the log lines, stdout by default.
+    :params access_log (str): path of the access log, ``-`` for stdout.
+    :params sample_rate (int): records per second let through by
+                               :func:`sampled` for each message.
+
+    :raises ValueError: on an unknown level name.
+    """
+    global _stream, _access_stream
+    module = sys.modules[__name__]
+    if level is not None:
+        module.level = _level(level)
+    if sample_rate is not None:
+        module.sample_rate = sample_rate
+    if stream is not None:
+        _stream = stream
+    if access_log is not None:
+        _access_stream = _open_access_log(access_log)
+
+
+def _open_access_log(path):
+    if path == '-':
+        return sys.stdout
+    return open(path, 'a', encoding='utf-8')
+
+
+def enabled(at):
+    """Whether a record at level ``at`` would be written."""
+    return at >= level
+
+
+def _emit(at, message, args):
+    global dropped
+    if len(_pending) >= MAX_PENDING:
+        dropped += 1
+        return
+    _pending.append((time.time(), at, message, args))
+    if _writer is None:
+        _start()
+    if at >= WARNING:
+        _wake.set()
+
+
+def debug(message, *args):
+    """Log a debug record, e.g. a per-request trace line."""
+    if DEBUG >= level:
+        _emit(DEBUG, message, args)
+
+
+def info(message, *args):
+    """Log an informational record."""
+    if INFO >= level:
+        _emit(INFO, message, args)
+
+
+def warning(message, *args):
+    """Log a warning record."""
+    if WARNING >= level:
+        _emit(WARNING, message, args)
+
+
+def error(message, *args):
+    """Log an error record."""
+    if ERROR >= level:
+        _emit(ERROR, message, args)
+
+
+def sampled(at, message, *args):
+    """
+    Log a record at level ``at``, at most :data:`sample_rate` times per
+    second for the same ``message`` template.
+
+    :params at (int): record level.
+    :params message (str): ``str.format`` template, also the sampling key.
+    """
+    if at < level:
+        return
+    now = time.monotonic()
+    window = _samples.get(message)
+    if window is None or now - window[0] >= 1.0:
+        if window is not None and window[2]:
+            _emit(at, "[Log] {} record(s) like {!r} suppressed", (window[2], message))
+        _samples[message] = [now, 1, 0]
+    elif window[1] < sample_rate:
+        window[1] += 1
+    else:
+        window[2] += 1
+        return
+    _emit(at, message, args)
+
+
+def access(**fields):
+    """
+    Write one access log record, a JSON object with a ``ts`` timestamp and
+    ``fields``. Does nothing when no access log is configured.
+    """
+    if _access_stream is not None:
+        _emit(_ACCESS, None, fields)
+
+
+def access_enabled():
+    """Whether :func:`access` records are written."""
+    return _access_stream is not None
+
+
+def _start():
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name='log-writer', daemon=True)
+            _writer.start()
+
+
+def _run():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        flush()
+
+
+def _format(record):
+    created, at, message, args = record
+    stamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(created))
+    stamp += '.{:03d}'.format(int(created * 1000) % 1000)
+    if at == _ACCESS:
+        return json.dumps(dict(ts=stamp, **args), default=str)
+    try:
+        text = message.format(*args) if args else message
+    except (IndexError, KeyError, ValueError) as e:
+        text = "{!r} {!r} (format error: {})".format(message, args, e)
+    return '{} {} {}'.format(stamp, _LABELS.get(at, at), text)
+
+
+def flush():
+    """Write every queued record now."""
+    global dropped
+    with _write_lock:
+        lines = []
+        access_lines = []
+        while _pending:
+            record = _pending.popleft()
+            (access_lines if record[1] == _ACCESS else lines).append(_format(record))
+        if dropped:
+            lines.append('{} WARNING [Log] {} record(s) dropped, queue full'.format(
+                time.strftime('%Y-%m-%dT%H:%M:%S'), dropped))
+            dropped = 0
+        stream = _stream or sys.stdout
+        try:
+            if lines:
+                stream.write('\n'.join(lines) + '\n')
+                stream.flush()
+            if access_lines and _access_stream is not None:
+                _access_stream.write('\n'.join(access_lines) + '\n')
+                _access_stream.flush()
+        except (OSError, ValueError):
+            # Closed or broken stream at exit: the records are lost.
+            pass
+
+
+if os.environ.get(ACCESS_LOG_ENV):
+    _access_stream = _open_access_log(os.environ[ACCESS_LOG_ENV])
+
+atexit.register(flush)
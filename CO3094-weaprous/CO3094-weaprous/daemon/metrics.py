@@ -0,0 +1,361 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.metrics
+~~~~~~~~~~~~~~~~~
+
+This module provides a small metrics registry with counters, gauges and
+histograms, rendered in the Prometheus text exposition format.
+
+Updates are cheap: every thread adds into its own shard of the registry, a
+plain dict reached through :class:`threading.local`, so the request path
+takes no lock. A scrape sums the shards under the registry lock. The shards
+of threads that have ended are folded into a retired total, which keeps
+their counts while the backends start one thread per connection.
+
+Values that another object already keeps, such as the thread count, are
+read from a callable at scrape time.
+
+Usage::
+
+  >>> requests = REGISTRY.counter('weaprous_requests_total', 'Requests.', ('method',))
+  >>> requests.inc(('GET',))
+  >>> latency = REGISTRY.histogram('weaprous_request_seconds', 'Latency.')
+  >>> latency.observe(0.012)
+  >>> print(REGISTRY.render())
+"""
+
+import threading
+
+#: Content type of the text exposition format.
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+#: Default histogram bucket bounds in seconds.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#: Live thread shards kept before the ended ones are folded on registration.
+MAX_SHARDS = 64
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = ['{}="{}"'.format(n, _escape(v)) for n, v in zip(names, values)]
+    if extra:
+        pairs.append('{}="{}"'.format(*extra))
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base of the metric types: a name, a help text and label names.
+
+    :attrs name (str): metric name.
+    :attrs help (str): one line description.
+    :attrs labelnames (tuple): names of the labels, values are given as a
+                               tuple in the same order on every update.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.function = None
+
+    def set_function(self, function):
+        """
+        Read the metric from ``function`` at scrape time, for values that
+        another object already keeps.
+
+        :params function (callable): returns a number, or a dict of label
+                                     tuple -> number.
+        """
+        self.function = function
+
+    def current(self):
+        """Values of the callable, as a dict of label tuple -> number."""
+        value = self.function()
+        return value if isinstance(value, dict) else {(): value}
+
+    def samples(self, values):
+        """Exposition lines of this metric from the merged ``values``."""
+        return ['{}{} {}'.format(self.name, _labels(self.labelnames, labels), _number(value))
+                for labels, value in sorted(values.items())]
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        """Add ``amount`` to the series of ``labels``."""
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, or a callable read at scrape time
+    (see :meth:`set_function`).
+    """
+
+    kind = 'gauge'
+
+    def inc(self, labels=(), amount=1):
+        """Add ``amount`` to the series of ``labels``."""
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        """Subtract ``amount`` from the series of ``labels``."""
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    """Observations counted in cumulative buckets, with their sum."""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        """Record one observation in the series of ``labels``."""
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        series = shard.get(key)
+        if series is None:
+            # One slot per bucket, then +Inf, then the sum.
+            series = shard[key] = [0] * (len(self.buckets) + 2)
+        index = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            index += 1
+        series[index] += 1
+        series[-1] += value
+
+    def samples(self, values):
+        lines = []
+        for labels, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name, _labels(self.labelnames, labels, ('le', _number(bound))),
+                    cumulative))
+            suffix = _labels(self.labelnames, labels)
+            lines.append('{}_sum{} {}'.format(self.name, suffix, _number(series[-1])))
+            lines.append('{}_count{} {}'.format(self.name, suffix, cumulative))
+        return lines
+
+
+def quantile(buckets, series, q):
+    """
+    Estimate the ``q`` quantile of a histogram series by linear
+    interpolation inside the bucket that holds it.
+
+    :params buckets (tuple): bucket upper bounds.
+    :params series (list): per-bucket counts, +Inf, then the sum.
+    :params q (float): quantile between 0 and 1.
+
+    :rtype float: estimated value, or None without observations; the largest
+                  finite bound when the quantile falls in the +Inf bucket.
+    """
+    total = sum(series[:-1])
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    lower = 0.0
+    for bound, count in zip(buckets, series):
+        if count and seen + count >= rank:
+            return lower + (bound - lower) * (rank - seen) / count
+        seen += count
+        lower = bound
+    return buckets[-1]
+
+
+def _merge(into, shard):
+    for key, value in list(shard.items()):
+        if isinstance(value, list):
+            total = into.get(key)
+            if total is None:
+                into[key] = list(value)
+            else:
+                for i, part in enumerate(value):
+                    total[i] += part
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+class Registry:
+    """
+    A set of metrics with per-thread storage.
+
+    :attrs metrics (dict): name -> :class:`Metric`, in registration order.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+
+    def _register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError("Metric {} already registered differently".format(metric.name))
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        """Register (or return the registered) :class:`Counter`."""
+        return self._register(Counter(self, name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        """Register (or return the registered) :class:`Gauge`."""
+        return self._register(Gauge(self, name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        """Register (or return the registered) :class:`Histogram`."""
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def shard(self):
+        """The calling thread's dict of (name, labels) -> value."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self.lock:
+                if len(self._shards) >= MAX_SHARDS:
+                    self._fold()
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _fold(self):
+        # Called with the lock held. An ended thread never writes its shard
+        # again, so it can be merged for good.
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                _merge(self._retired, shard)
+        self._shards = alive
+
+    def collect(self):
+        """
+        Merge every shard.
+
+        :rtype tuple: (metrics, values) where values maps (name, labels) to
+                      a number, or to the bucket list of a histogram.
+        """
+        with self.lock:
+            self._fold()
+            values = {}
+            _merge(values, self._retired)
+            for _, shard in self._shards:
+                _merge(values, shard)
+            metrics = list(self.metrics.values())
+        return metrics, values
+
+    def render(self):
+        """
+        The registry in the text exposition format.
+
+        :rtype str: ``# HELP``, ``# TYPE`` and sample lines of every metric.
+        """
+        metrics, values = self.collect()
+        grouped = {}
+        for (name, labels), value in values.items():
+            grouped.setdefault(name, {})[labels] = value
+        lines = []
+        for metric in metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.help))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+            if metric.function is not None:
+                lines.extend(metric.samples(metric.current()))
+            else:
+                lines.extend(metric.samples(grouped.get(metric.name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+#: Registry of the process, used by the backend instrumentation.
+REGISTRY = Registry()
+
+#: Requests answered, by method and route.
+requests_total = REGISTRY.counter(
+    'weaprous_requests_total', 'Requests answered by the backend.', ('method', 'route'))
+
+#: Request latency, from receiving the request to sending the response.
+request_seconds = REGISTRY.histogram(
+    'weaprous_request_duration_seconds', 'Time to answer a request.', ('method', 'route'))
+
+#: Responses by status code.
+responses_total = REGISTRY.counter(
+    'weaprous_responses_total', 'Responses sent, by status code.', ('code',))
+
+#: Request bytes received.
+bytes_received = REGISTRY.counter(
+    'weaprous_received_bytes_total', 'Request bytes received.')
+
+#: Response bytes sent.
+bytes_sent = REGISTRY.counter(
+    'weaprous_sent_bytes_total', 'Response bytes sent.')
+
+#: Requests being answered.
+in_flight = REGISTRY.gauge(
+    'weaprous_requests_in_flight', 'Requests being answered.')
+
+#: Threads of the process.
+threads = REGISTRY.gauge('weaprous_threads', 'Live threads of the process.')
+threads.set_function(threading.active_count)
+
+#: Requests refused by :mod:`daemon.ratelimit`, by reason (``client``,
+#: ``route`` or ``overload``), and connections refused by
+#: :mod:`daemon.timeouts` (``connections``).
+rejected_total = REGISTRY.counter(
+    'weaprous_rejected_requests_total', 'Requests refused by the rate limits.', ('reason',))
+
+#: Connections shut down by the reaper of :mod:`daemon.timeouts` after
+#: waiting idle for their request head.
+reaped_total = REGISTRY.counter(
+    'weaprous_reaped_connections_total', 'Idle connections shut down by the reaper.')
+
+#: Clients that missed a deadline of :mod:`daemon.timeouts`, by phase
+#: (``header``, ``body`` or ``write``).
+timeouts_total = REGISTRY.counter(
+    'weaprous_client_timeouts_total', 'Clients that missed a read or write deadline.', ('phase',))
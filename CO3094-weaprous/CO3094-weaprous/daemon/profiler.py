@@ -0,0 +1,266 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.profiler
+~~~~~~~~~~~~~~~~~
+
+This module profiles a running server without restarting it.
+
+:func:`sample_stacks` reads the stack of every thread with
+:func:`sys._current_frames` every :data:`INTERVAL` seconds for a given
+duration and counts the stacks in the collapsed format of flame graph
+tools (``thread;module:function:line;... count``):
+
+  $ flamegraph.pl profile.txt > profile.svg
+
+The sampled threads are not interrupted, the cost is the thread that asked
+for the profile taking the interpreter lock once per interval. With ``allocations`` the
+:mod:`tracemalloc` module also records the allocations made during the
+profile and the top lines by allocated size are reported; tracing
+allocations slows the process down noticeably while it runs.
+
+A profile is started by an admin route (see
+:meth:`WeApRous.enable_profiler <daemon.weaprous.WeApRous.enable_profiler>`
+and the ``/profile`` route of :mod:`daemon.admin`), or by :data:`SIGNAL`
+once :func:`install` has run, which writes the result to
+``<dir>/profile-<program>-<pid>-<time>.txt``. One profile runs at a time.
+
+Usage::
+
+  >>> result = profile(seconds=5, allocations=10)
+  >>> print(result.text())
+
+  $ kill -USR1 <pid>
+"""
+
+import collections
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+#: Seconds between two stack samples.
+INTERVAL = 0.005
+
+#: Default and largest profile duration in seconds.
+DEFAULT_SECONDS = 10.0
+MAX_SECONDS = 120.0
+
+#: Deepest stack kept, the outermost frames are cut beyond it.
+MAX_DEPTH = 64
+
+#: Signal starting a profile of :data:`DEFAULT_SECONDS`.
+SIGNAL = getattr(signal, 'SIGUSR1', None)
+
+#: Environment variable naming the directory of signal-triggered profiles.
+PROFILE_DIR_ENV = 'WEAPROUS_PROFILE_DIR'
+
+#: Innermost frames of a thread waiting for work, left out with ``idle=False``.
+IDLE_FRAMES = {
+    ('socket.py', 'accept'),
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('handoff.py', 'accept'),
+    ('log.py', '_run'),
+    ('trace.py', '_run'),
+}
+
+_running = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one runs."""
+
+
+class Profile:
+    """
+    Result of :func:`profile`.
+
+    :attrs stacks (Counter): collapsed stack -> samples.
+    :attrs samples (int): sampling rounds taken.
+    :attrs seconds (float): measured duration.
+    :attrs allocations (list): (location, size in bytes, count) of the top
+                               allocating lines, empty when not requested.
+    """
+
+    def __init__(self, stacks, samples, seconds, allocations=None):
+        self.stacks = stacks
+        self.samples = samples
+        self.seconds = seconds
+        self.allocations = allocations or []
+
+    def collapsed(self):
+        """The stacks in the collapsed format, most sampled first."""
+        return ''.join('{} {}\n'.format(stack, count)
+                       for stack, count in self.stacks.most_common())
+
+    def text(self):
+        """The collapsed stacks, then the allocation report as comments."""
+        lines = [self.collapsed()]
+        if self.allocations:
+            lines.append('# tracemalloc top {} allocations during {:.1f}s\n'.format(
+                len(self.allocations), self.seconds))
+            for location, size, count in self.allocations:
+                lines.append('# {:>10} B {:>8} blocks {}\n'.format(size, count, location))
+        return ''.join(lines)
+
+    def to_dict(self):
+        """The profile as a JSON-serialisable dict."""
+        return {
+            "seconds": self.seconds,
+            "samples": self.samples,
+            "stacks": dict(self.stacks.most_common()),
+            "allocations": [{"location": location, "size": size, "count": count}
+                            for location, size, count in self.allocations],
+        }
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return '{}:{}:{}'.format(module, code.co_name, frame.f_lineno)
+
+
+def _collapse(thread_name, frame):
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ';'.join(reversed(labels))
+
+
+def _is_idle(frame):
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def sample_stacks(seconds, interval=INTERVAL, idle=True):
+    """
+    Count the stacks of every thread but the calling one for ``seconds``.
+
+    :params seconds (float): sampling duration.
+    :params interval (float): seconds between two samples.
+    :params idle (bool): keep the threads waiting for work (see
+                         :data:`IDLE_FRAMES`).
+
+    :rtype tuple: (Counter of collapsed stacks, samples taken).
+    """
+    stacks = collections.Counter()
+    me = threading.get_ident()
+    deadline = time.monotonic() + seconds
+    samples = 0
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me or (not idle and _is_idle(frame)):
+                continue
+            stacks[_collapse(names.get(ident, str(ident)), frame)] += 1
+        samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+
+def _top_allocations(before, after, top):
+    # Leave out the allocations of the profiler itself.
+    own = (tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__))
+    stats = after.filter_traces(own).compare_to(before.filter_traces(own), 'lineno')[:top]
+    return [('{}:{}'.format(stat.traceback[0].filename, stat.traceback[0].lineno),
+             stat.size_diff, stat.count_diff) for stat in stats]
+
+
+def profile(seconds=DEFAULT_SECONDS, allocations=0, interval=INTERVAL, idle=True):
+    """
+    Sample the stacks of the process, and optionally its allocations, for
+    ``seconds``. Blocks the calling thread for that long.
+
+    :params seconds (float): duration, at most :data:`MAX_SECONDS`.
+    :params allocations (int): number of top allocating lines to report,
+                               0 leaves :mod:`tracemalloc` off.
+    :params interval (float): seconds between two stack samples.
+    :params idle (bool): keep the threads waiting for work.
+
+    :rtype Profile: the result.
+    :raises ProfilerBusy: when another profile is running.
+    """
+    seconds = max(0.0, min(float(seconds), MAX_SECONDS))
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        started_tracing = False
+        before = None
+        if allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            before = tracemalloc.take_snapshot()
+        started = time.monotonic()
+        stacks, samples = sample_stacks(seconds, interval, idle)
+        top = []
+        if allocations:
+            top = _top_allocations(before, tracemalloc.take_snapshot(), allocations)
+            if started_tracing:
+                tracemalloc.stop()
+        return Profile(stacks, samples, time.monotonic() - started, top)
+    finally:
+        _running.release()
+
+
+def profile_path(directory=None):
+    """Path of a signal-triggered profile of this process."""
+    directory = directory or os.environ.get(PROFILE_DIR_ENV) or tempfile.gettempdir()
+    program = os.path.splitext(os.path.basename(sys.argv[0] or ''))[0] or 'python'
+    return os.path.join(directory, 'profile-{}-{}-{}.txt'.format(
+        program, os.getpid(), time.strftime('%Y%m%d-%H%M%S')))
+
+
+def profile_to_file(seconds=DEFAULT_SECONDS, allocations=0, directory=None):
+    """
+    Run :func:`profile` and write its text to :func:`profile_path`.
+
+    :rtype str: path written, or None when another profile was running.
+    """
+    try:
+        result = profile(seconds, allocations)
+    except ProfilerBusy as e:
+        print("[Profiler] {}".format(e))
+        return None
+    path = profile_path(directory)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(result.text())
+    print("[Profiler] {} samples over {:.1f}s written to {}".format(
+        result.samples, result.seconds, path))
+    return path
+
+
+def install(seconds=DEFAULT_SECONDS, allocations=0, directory=None):
+    """
+    Profile for ``seconds`` on :data:`SIGNAL`. Only possible from the main
+    thread on platforms that have the signal.
+
+    :rtype bool: True when the handler is installed.
+    """
+    if SIGNAL is None:
+        return False
+    try:
+        signal.signal(SIGNAL, lambda signum, frame: threading.Thread(
+            target=profile_to_file, args=(seconds, allocations, directory),
+            daemon=True).start())
+    except ValueError:
+        return False
+    return True
@@ -25,13 +25,38 @@ Requirement:
 - response: customized :class: `Response <Response>` utilities.
 - httpadapter: :class: `HttpAdapter <HttpAdapter >` adapter for HTTP request processing.
 - dictionary: :class: `CaseInsensitiveDict <CaseInsensitiveDict>` for managing headers and cookies.
+- balancer: :class: `UpstreamTracker <UpstreamTracker>` for in-flight and latency accounting.
+- cache: :class: `ResponseCache <ResponseCache>` shared cache of upstream responses.
+- coalesce: :class: `SingleFlight <SingleFlight>` collapsing of identical upstream GETs.
+- routing: :class: `RoutingTable <RoutingTable>` compiled routes, reloadable via :class: `LiveRoutes <LiveRoutes>`.
+- framing: :class: `MessageReader <MessageReader>` delimiting of requests on persistent connections.
+- tunnel: full-duplex relay of ``Connection: Upgrade`` exchanges.
+- h2: :class: `H2Connection <H2Connection>` HTTP/2 cleartext (h2c) clients.
+- handoff: listening socket handoff and draining for restarts without downtime.
+- admin: per-upstream latency histograms and the ``/stats`` admin listener.
+- log: levelled, buffered logging and the access log.
+- trace: request spans, propagated to the upstreams in the ``traceparent`` header.
+- transport: listeners and upstream connections, TCP or :class: `MemoryTransport <MemoryTransport>`.
 
 """
+import functools
 import socket
 import threading
+import time
 from .response import *
 from .httpadapter import HttpAdapter
 from .dictionary import CaseInsensitiveDict
+from .balancer import UpstreamBusy, UpstreamTracker
+from .cache import header_dict, parse_cache_control
+from .coalesce import SingleFlight
+from .routing import UNIX_PREFIX, LiveRoutes, RoutingTable, as_routing_table, compile_routes
+from .framing import (FramingError, MessageReader, head_fields,
+                      reframe_response, wants_keep_alive)
+from .tunnel import TUNNEL_IDLE_TIMEOUT, TunnelStats, is_upgrade, relay
+from .tls import HANDSHAKE_TIMEOUT, TLSContexts
+from . import admin, handoff, log, trace
+from .h2 import H2Connection, is_h2c_upgrade
+from .transport import TCP
 
 #: A dictionary mapping hostnames to backend IP and port tuples.
 #: Used to determine routing targets for incoming requests.
@@ -41,34 +66,339 @@ PROXY_PASS = {
     "app2.local": ('192.168.56.103', 9002),
 }
 
+#: Default seconds a coalesced request waits for the in-flight fetch.
+COALESCE_MAX_WAIT = 5.0
 
-def forward_request(host, port, request):
+#: Default number of requests allowed to share one in-flight fetch.
+COALESCE_MAX_WAITERS = 100
+
+#: Seconds an idle client connection is kept open between two requests.
+KEEPALIVE_TIMEOUT = 15.0
+
+#: Requests served on one client connection before it is closed.
+KEEPALIVE_REQUESTS = 100
+
+#: Seconds allowed to connect the upstream of an upgrade tunnel.
+TUNNEL_CONNECT_TIMEOUT = 5.0
+
+#: Default seconds allowed to connect an upstream (``proxy_connect_timeout``).
+CONNECT_TIMEOUT = 5.0
+
+#: Default seconds allowed to hand the request to an upstream
+#: (``proxy_send_timeout``).
+SEND_TIMEOUT = 30.0
+
+#: Default seconds an upstream may stay silent between two reads of its
+#: response (``proxy_read_timeout``).
+READ_TIMEOUT = 60.0
+
+#: Request header carrying the milliseconds left of the request deadline.
+DEADLINE_HEADER = 'X-Deadline-Ms'
+
+#: TLS contexts of the running proxy, set when a TLS listener starts.
+tls_contexts = None
+
+#: Transport of the client listener and of the upstream connections, set
+#: by :func:`run_proxy` (see :mod:`daemon.transport`).
+proxy_transport = TCP
+
+#: Open, finished and idle-closed upgrade tunnels per upstream.
+tunnel_stats = TunnelStats()
+
+#: Response to a request that cannot be delimited.
+BAD_REQUEST = (
+    "HTTP/1.1 400 Bad Request\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 15\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "400 Bad Request"
+).encode('utf-8')
+
+#: Response returned to the client when the backend cannot be reached.
+FORWARD_ERROR = (
+    "HTTP/1.1 404 Not Found\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 13\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "404 Not Found"
+).encode('utf-8')
+
+#: Response returned to the client when every upstream of the route is at
+#: its ``max_conns`` and no queue slot could be obtained.
+SERVICE_UNAVAILABLE = (
+    "HTTP/1.1 503 Service Unavailable\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 23\r\n"
+    "Retry-After: 1\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "503 Service Unavailable"
+).encode('utf-8')
+
+#: Response returned to the client when the backend or the request
+#: deadline times out.
+GATEWAY_TIMEOUT = (
+    "HTTP/1.1 504 Gateway Timeout\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 19\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "504 Gateway Timeout"
+).encode('utf-8')
+
+
+def _bounded(timeout, deadline):
+    """
+    Shortest of ``timeout`` and the time left before ``deadline``.
+
+    :raises socket.timeout: if the deadline has already passed.
+    """
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise socket.timeout("request deadline exceeded")
+    return min(timeout, remaining)
+
+
+def upstream_name(host, port):
+    """
+    Name of an upstream address, as used by the routing table and tracker.
+
+    :params host (str): IP address, or socket path when ``port`` is None.
+    :params port (int): port number, None for a Unix domain socket.
+
+    :rtype str: ``"host:port"`` or ``"unix:/path"``.
+    """
+    if port is None:
+        return UNIX_PREFIX + host
+    return "{}:{}".format(host, port)
+
+
+def upstream_socket(host, port):
+    """
+    Create an unconnected socket for an upstream address on
+    :data:`proxy_transport`.
+
+    :params host (str): IP address, or socket path when ``port`` is None.
+    :params port (int): port number, None for a Unix domain socket.
+
+    :rtype tuple: (socket, address to pass to ``connect``).
+    """
+    return proxy_transport.socket(host, port)
+
+
+def forward_request(host, port, request, timeouts=None, deadline=None, timings=None):
     """
     Forwards an HTTP request to a backend server and retrieves the response.
 
-    :params host (str): IP address of the backend server.
+    Every step is bounded: the connect by the connect timeout, the send by
+    the send timeout and each read by the read timeout, all of them cut
+    short by the request ``deadline`` when one is given.
+
+    With a ``timings`` dict the exchange is measured into it: ``connect``,
+    ``ttfb`` (request sent to first response byte) and ``total`` seconds,
+    ``sent`` and ``received`` bytes, and ``error`` (``connect``,
+    ``timeout`` or ``io``) when it failed.
+
+    :params host (str): IP address of the backend server, or the path of its
+                        Unix domain socket when ``port`` is None.
     :params port (int): port number of the backend server.
     :params request (str): incoming HTTP request.
+    :params timeouts (tuple): (connect, send, read) timeouts in seconds,
+                              defaults to :data:`CONNECT_TIMEOUT`,
+                              :data:`SEND_TIMEOUT` and :data:`READ_TIMEOUT`.
+    :params deadline (float): optional :func:`time.monotonic` instant the
+                              whole exchange must end by.
+    :params timings (dict): optional dict receiving the measurements.
 
     :rtype bytes: Raw HTTP response from the backend server. If the connection
-                  fails, returns a 404 Not Found response.
+                  fails, returns a 404 Not Found response; if a timeout or
+                  the deadline expires, returns a 504 Gateway Timeout.
     """
 
-    backend = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    connect_timeout, send_timeout, read_timeout = timeouts or (
+        CONNECT_TIMEOUT, SEND_TIMEOUT, READ_TIMEOUT)
+    backend, address = upstream_socket(host, port)
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    connected = None
 
     try:
-        backend.connect((host, port))
-        backend.sendall(request.encode())
+        backend.settimeout(_bounded(connect_timeout, deadline))
+        backend.connect(address)
+        connected = time.perf_counter()
+        timings['connect'] = connected - started
+        payload = request.encode('utf-8', 'surrogateescape')
+        backend.settimeout(_bounded(send_timeout, deadline))
+        backend.sendall(payload)
+        timings['sent'] = len(payload)
+        sent = time.perf_counter()
         response = b""
         while True:
+            backend.settimeout(_bounded(read_timeout, deadline))
             chunk = backend.recv(4096)
             if not chunk:
                 break
+            if not response:
+                timings['ttfb'] = time.perf_counter() - sent
             response += chunk
+        timings['received'] = len(response)
         return response
+    except socket.timeout as e:
+        log.sampled(log.WARNING, "[Proxy] Upstream {} timed out: {}", upstream_name(host, port), e)
+        timings['error'] = 'timeout'
+        return GATEWAY_TIMEOUT
     except socket.error as e:
-      print("Socket error: {}".format(e))
-      return (
+      log.sampled(log.WARNING, "[Proxy] Upstream {} error: {}", upstream_name(host, port), e)
+      timings['error'] = 'connect' if connected is None else 'io'
+      return FORWARD_ERROR
+    finally:
+        timings['total'] = time.perf_counter() - started
+        backend.close()
+
+
+def upstream_timeouts(options):
+    """
+    Connect, send and read timeouts of a route.
+
+    :params options (dict): route options parsed from ``proxy.conf``.
+
+    :rtype tuple: (connect, send, read) timeouts in seconds.
+    """
+    return (options.get('connect_timeout', CONNECT_TIMEOUT),
+            options.get('send_timeout', SEND_TIMEOUT),
+            options.get('read_timeout', READ_TIMEOUT))
+
+
+def request_deadline(options, started=None, incoming=None):
+    """
+    Deadline of a request received at ``started``: the route's
+    ``proxy_request_deadline``, shortened by the :data:`DEADLINE_HEADER`
+    budget the client (or a proxy in front of us) already sent.
+
+    :params options (dict): route options parsed from ``proxy.conf``.
+    :params started (float): :func:`time.monotonic` arrival of the request.
+    :params incoming (str): value of the request's deadline header, if any.
+
+    :rtype float: :func:`time.monotonic` instant, or None without deadline.
+    """
+    budgets = []
+    if options.get('request_deadline') is not None:
+        budgets.append(options['request_deadline'])
+    if incoming is not None:
+        try:
+            budgets.append(max(0, int(incoming)) / 1000.0)
+        except ValueError:
+            pass
+    if not budgets:
+        return None
+    return (time.monotonic() if started is None else started) + min(budgets)
+
+
+############### HANDLE ROUTING POLICY #################
+
+#: In-flight counts and latency estimates of every upstream ("host:port").
+upstream_tracker = UpstreamTracker()
+
+def resolve_routing_policy(hostname, routes, path='/'):
+    """
+    Handles an routing policy to return the matching proxy_pass.
+    It determines the target backend to forward the request to.
+
+    The selected upstream is acquired in :data:`upstream_tracker`; the caller
+    must release it with the same ``"host:port"`` once the exchange is over.
+
+    Supported ``dist_policy`` values are ``round-robin`` (default),
+    ``least-conn`` and ``p2c-ewma`` (power of two random choices weighted by
+    peak-EWMA latency times in-flight requests). The route is the longest
+    ``location`` prefix of ``path`` in the matched host; unknown hosts go to
+    the default server, or to ``127.0.0.1:9000`` when none is configured.
+    An upstream at its ``max_conns`` is replaced by another one of the
+    route with a free slot, or the request waits in its queue.
+
+    :params hostname (str): value of the Host header of the request.
+    :params routes: :class:`RoutingTable <RoutingTable>` or
+                    :class:`LiveRoutes <LiveRoutes>`.
+    :params path (str): request target used for location matching.
+
+    :rtype tuple: (proxy_host, proxy_port) with an integer port, or
+                  (socket path, None) for a Unix domain socket upstream.
+    :raises UpstreamBusy: when every upstream is full and the queue is
+                          full or timed out.
+    """
+
+    route = as_routing_table(routes).lookup(hostname, path)
+    selected, (proxy_host, proxy_port) = route.select()
+    log.debug("[Policy] {} selected {} for {}", route.policy.name, selected, hostname)
+    return proxy_host, proxy_port
+
+def proxy_exchange(hostname, request, routes, deadline=None):
+    """
+    Resolves the upstream of ``hostname`` and performs one request/response
+    exchange with it, keeping the upstream load accounting up to date.
+
+    The route's timeouts bound the exchange. With a ``deadline`` the time
+    left is sent to the upstream in the :data:`DEADLINE_HEADER` header, and
+    a request whose deadline already passed is answered 504 without
+    reaching the upstream.
+
+    :params hostname (str): value of the Host header of the request.
+    :params request (str): raw HTTP request to forward.
+    :params routes (dict): dictionary mapping hostnames and location.
+    :params deadline (float): optional :func:`time.monotonic` deadline.
+
+    :rtype bytes: raw HTTP response for the client.
+    """
+
+    target = _request_target(request)
+    routes = as_routing_table(routes)
+    route = routes.lookup(hostname, target)
+    timeouts = upstream_timeouts(route.options)
+
+    # Resolve the matching destination in routes
+    try:
+        resolved_host, resolved_port = resolve_routing_policy(hostname, routes, target)
+    except UpstreamBusy as e:
+        log.sampled(log.WARNING, "[Proxy] {} {} rejected: {}", hostname, target, e)
+        admin.observe_exchange(route.hostname, e.upstream, {"error": "busy"})
+        return SERVICE_UNAVAILABLE
+    upstream = upstream_name(resolved_host, resolved_port)
+
+    if resolved_host:
+        log.debug("[Proxy] Host name {} is forwarded to {}", hostname, upstream)
+        started = time.monotonic()
+        latency = None
+        failed = False
+        timings = {}
+        try:
+            if deadline is not None:
+                remaining = deadline - started
+                if remaining <= 0:
+                    log.sampled(log.INFO, "[Proxy] Deadline of {} {} expired before forwarding", hostname, target)
+                    timings["error"] = "deadline"
+                    return GATEWAY_TIMEOUT
+                request = _set_request_header(request, DEADLINE_HEADER, int(remaining * 1000))
+            with trace.span('upstream', upstream=upstream) as span:
+                # The backend spans become children of this one
+                traceparent = span.traceparent()
+                if traceparent is not None:
+                    request = _set_request_header(request, trace.TRACE_HEADER, traceparent)
+                response = forward_request(resolved_host, resolved_port, request,
+                                           timeouts, deadline, timings)
+            # A timeout is a (lower bound) latency sample too, it keeps
+            # the EWMA of a hung upstream high.
+            if response is not FORWARD_ERROR:
+                latency = time.monotonic() - started
+            else:
+                failed = True
+        finally:
+            upstream_tracker.release(upstream, latency, failed)
+            admin.observe_exchange(route.hostname, upstream, timings)
+    else:
+        response = (
             "HTTP/1.1 404 Not Found\r\n"
             "Content-Type: text/plain\r\n"
             "Content-Length: 13\r\n"
@@ -76,69 +406,337 @@ def forward_request(host, port, request):
             "\r\n"
             "404 Not Found"
         ).encode('utf-8')
+    return response
 
 
-############### HANDLE ROUTING POLICY #################
-round_robin_counters = {}
-# Bộ đếm connection đang active trên mỗi backend (hostname -> {backend: count})
-conn_counters = {}
+def route_options(hostname, routes, path='/'):
+    """
+    Returns the per-host (or per-location) options parsed from ``proxy.conf``.
+
+    :params hostname (str): value of the Host header of the request.
+    :params routes: :class:`RoutingTable <RoutingTable>` or
+                    :class:`LiveRoutes <LiveRoutes>`.
+    :params path (str): request target used for location matching.
 
-# Mutex để bảo vệ truy cập đồng thời
-lock = threading.Lock()
-def resolve_routing_policy(hostname, routes):
+    :rtype mappingproxy: route options, empty when the route has none.
     """
-    Handles an routing policy to return the matching proxy_pass.
-    It determines the target backend to forward the request to.
+    return as_routing_table(routes).lookup(hostname, path).options
+
+
+def _request_target(request):
+    """Request target of a raw request, ``/`` when it cannot be parsed."""
+    request_line = request.split('\r\n', 1)[0].split(' ')
+    return request_line[1] if len(request_line) > 2 else '/'
+
+
+def forwarded_for(previous, addr):
+    """
+    Value of the ``X-Forwarded-For`` header sent upstream: the hops the
+    request already went through, then the client of this proxy, so that
+    the backends can tell the clients apart.
+
+    :params previous (str): ``X-Forwarded-For`` of the incoming request, if any.
+    :params addr (tuple): client address (IP, port).
+
+    :rtype str: the header value.
+    """
+    client = addr[0] if isinstance(addr, tuple) and addr else 'unknown'
+    return '{}, {}'.format(previous, client) if previous else client
+
+
+def _header_value(request, name):
+    """Value of one header of a raw request string, None when absent."""
+    for line in request.split('\r\n\r\n', 1)[0].split('\r\n')[1:]:
+        field, sep, value = line.partition(':')
+        if sep and field.strip().lower() == name.lower():
+            return value.strip()
+    return None
+
+
+def _has_body(request):
+    """Whether a raw request announces a non empty body."""
+    for line in request.split('\r\n\r\n', 1)[0].split('\r\n')[1:]:
+        name, _, value = line.partition(':')
+        name = name.strip().lower()
+        if name == 'transfer-encoding':
+            return True
+        if name == 'content-length' and value.strip() not in ('', '0'):
+            return True
+    return False
+
+
+def _set_request_header(request, name, value):
+    """Replace (or add) one header of a raw request string."""
+    head, sep, body = request.partition('\r\n\r\n')
+    lines = [line for line in head.split('\r\n')
+             if not line.lower().startswith(name.lower() + ':')]
+    lines.insert(1, '{}: {}'.format(name, value))
+    return '\r\n'.join(lines) + '\r\n\r\n' + body
+
+
+def _add_response_header(response, name, value):
+    """Insert one header right after the status line of a raw response."""
+    status_line, sep, rest = response.partition(b'\r\n')
+    if not sep:
+        return response
+    return status_line + '\r\n{}: {}\r\n'.format(name, value).encode('utf-8') + rest
+
+
+def _etag_matches(if_none_match, etag):
+    """Weak comparison of an ``If-None-Match`` list against ``etag``."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    weak = etag[2:] if etag.startswith('W/') else etag
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith('W/') else tag) == weak:
+            return True
+    return False
+
+
+#: Request headers that make two GETs on the same target non identical.
+COALESCE_KEY_HEADERS = (
+    'authorization', 'cookie', 'accept', 'accept-encoding', 'accept-language',
+    'range', 'if-none-match', 'if-modified-since',
+)
+
+#: Shared single-flight registry of all coalescing hosts.
+upstream_flights = SingleFlight()
+
+
+def coalesced_exchange(hostname, request, routes, options, deadline=None):
+    """
+    Performs :func:`proxy_exchange` once for all identical concurrent GET
+    requests of ``hostname`` and hands the same response to every waiter.
 
-    :params host (str): IP address of the request target server.
-    :params port (int): port number of the request target server.
+    :params hostname (str): value of the Host header of the request.
+    :params request (str): raw HTTP GET request.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params options (dict): host options with ``coalesce_max_wait`` and
+                            ``coalesce_max_waiters``.
+    :params deadline (float): optional deadline of the request, the shared
+                              fetch runs under the deadline of the request
+                              that started it.
+
+    :rtype bytes: raw HTTP response for the client.
+    """
+
+    head = request.split('\r\n\r\n', 1)[0].split('\r\n')
+    fields = {}
+    for line in head[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            fields[name.strip().lower()] = value.strip()
+    key = (hostname, head[0]) + tuple(fields.get(name, '') for name in COALESCE_KEY_HEADERS)
+    response, shared = upstream_flights.do(
+        key,
+        lambda: proxy_exchange(hostname, request, routes, deadline),
+        max_wait=options.get('coalesce_max_wait', COALESCE_MAX_WAIT),
+        max_waiters=options.get('coalesce_max_waiters', COALESCE_MAX_WAITERS),
+    )
+    if shared:
+        log.debug("[Proxy] Coalesced {} {}", hostname, head[0])
+    return response
+
+
+def cached_exchange(hostname, request, routes, cache, exchange=proxy_exchange):
+    """
+    Serves a GET request through the shared response cache.
+
+    Fresh entries are answered directly (``X-Cache: HIT``). Stale entries
+    carrying a validator are revalidated with a conditional request and
+    refreshed on ``304 Not Modified`` (``X-Cache: REVALIDATED``). Every other
+    case goes to the upstream and the answer is stored when cacheable
+    (``X-Cache: MISS``). Requests with ``Authorization`` or
+    ``Cache-Control: no-store`` skip the cache (``X-Cache: BYPASS``), and
+    the ``Cookie`` of a request is part of its key, so that a response is
+    never served to a client other than the one it was stored for.
+
+    :params hostname (str): value of the Host header of the request.
+    :params request (str): raw HTTP GET request.
+    :params routes (dict): dictionary mapping hostnames and location.
+    :params cache (ResponseCache): the shared response cache.
+    :params exchange (callable): performs the upstream exchange, called as
+                                 ``exchange(hostname, request, routes)``.
+
+    :rtype bytes: raw HTTP response for the client.
     """
 
-    print(hostname)
-    proxy_map, policy = routes.get(hostname,('127.0.0.1:9000','round-robin'))
-    print (proxy_map)
-    print (policy)
-
-    proxy_host = ''
-    proxy_port = '9000'
-    if isinstance(proxy_map, list):
-        if len(proxy_map) == 0:
-            print("[Proxy] Emtpy resolved routing of hostname {}".format(hostname))
-            print ("Empty proxy_map result")
-            # TODO: implement the error handling for non mapped host
-            #       the policy is design by team, but it can be 
-            #       basic default host in your self-defined system
-            # Use a dummy host to raise an invalid connection
-            proxy_host = '127.0.0.1'
-            proxy_port = '9000'
-        elif len(proxy_map) == 1:
-            proxy_host, proxy_port = proxy_map[0].split(":", 2)
-        elif len(proxy_map) > 1: # apply the policy handling 
-            if policy == 'round-robin':
-                idx = round_robin_counters.get(hostname, 0)
-                selected = proxy_map[idx % len(proxy_map)]
-                round_robin_counters[hostname] = (idx + 1) % len(proxy_map)
-                proxy_host, proxy_port = selected.split(":", 1)
-                print(f"[Policy] Round-robin selected {selected} for {hostname}")
-            if policy == 'least-conn':
-                conn_counters.setdefault(hostname, {backend: 0 for backend in proxy_map})
-                # Chọn backend có ít connection nhất
-                selected = min(conn_counters[hostname], key=lambda b: conn_counters[hostname][b])
-                conn_counters[hostname][selected] += 1
-                proxy_host, proxy_port = selected.split(":", 1)
-                print(f"[Policy] Least-connection selected {selected} for {hostname}")
-        else:
-            # Out-of-handle mapped host
-            proxy_host = '127.0.0.1'
-            proxy_port = '9000'
+    head = request.split('\r\n\r\n', 1)[0].split('\r\n')
+    request_line = head[0].split(' ')
+    target = request_line[1] if len(request_line) > 1 else '/'
+    req_headers = header_dict(
+        [(name.strip(), value.strip()) for name, value in
+         (line.split(':', 1) for line in head[1:] if ':' in line)])
+    directives = parse_cache_control(req_headers.get('cache-control'))
+
+    if 'no-store' in directives or 'authorization' in req_headers:
+        response = exchange(hostname, request, routes)
+        return _add_response_header(response, 'X-Cache', 'BYPASS')
+
+    key = (hostname, target)
+    if 'cookie' in req_headers:
+        key += (req_headers['cookie'],)
+    client_etag = req_headers.get('if-none-match')
+    entry = cache.lookup(key, req_headers)
+    must_revalidate = 'no-cache' in directives or directives.get('max-age') == '0'
+
+    if entry is not None and entry.is_fresh() and not must_revalidate:
+        cache.record('hit')
+        log.debug("[Cache] HIT {}{}", hostname, target)
+        return entry.to_bytes('HIT', _etag_matches(client_etag, entry.etag))
+
+    if entry is not None and entry.has_validator():
+        conditional = request
+        if entry.etag:
+            conditional = _set_request_header(conditional, 'If-None-Match', entry.etag)
+        if entry.last_modified:
+            conditional = _set_request_header(conditional, 'If-Modified-Since', entry.last_modified)
+        response = exchange(hostname, conditional, routes)
+        if cache.refresh(entry, response):
+            log.debug("[Cache] REVALIDATED {}{}", hostname, target)
+            return entry.to_bytes('REVALIDATED', _etag_matches(client_etag, entry.etag))
     else:
-        print("[Proxy] resolve route of hostname {} is a singulair to".format(hostname))
-        proxy_host, proxy_port = proxy_map.split(":", 2)
+        response = exchange(hostname, request, routes)
 
-    return proxy_host, proxy_port
+    cache.record('miss')
+    if response is not FORWARD_ERROR:
+        cache.store(key, req_headers, response)
+    return _add_response_header(response, 'X-Cache', 'MISS')
+
+
+def serve_request(hostname, request, routes, cache=None, received=None):
+    """
+    Produces the response to one request: through the cache and the
+    coalescing of its route when they apply, straight to the upstream
+    otherwise.
+
+    :params hostname (str): value of the Host header of the request.
+    :params request (str): raw HTTP request.
+    :params routes (RoutingTable): routing table of the exchange.
+    :params cache (ResponseCache): optional shared response cache.
+    :params received (float): :func:`time.monotonic` instant the request
+                              arrived, the start of its deadline budget.
+
+    :rtype bytes: raw HTTP response for the client.
+    """
+
+    # The upstream connection carries a single exchange.
+    request = _set_request_header(request, 'Connection', 'close')
+
+    options = route_options(hostname, routes, _request_target(request))
+    deadline = request_deadline(options, received, _header_value(request, DEADLINE_HEADER))
+    exchange = functools.partial(proxy_exchange, deadline=deadline)
+    if request.startswith('GET '):
+        if options.get('coalesce') and not _has_body(request):
+            exchange = functools.partial(coalesced_exchange, options=options,
+                                         deadline=deadline)
+
+    if cache is not None and request.startswith('GET '):
+        return cached_exchange(hostname, request, routes, cache, exchange)
+    return exchange(hostname, request, routes)
+
+
+def tunnel_exchange(conn, reader, hostname, request, routes):
+    """
+    Forwards an upgrade request (WebSocket, h2c, ...) to its upstream and
+    turns the client connection into a full-duplex byte tunnel to it.
 
-def handle_client(ip, port, conn, addr, routes):
+    The tunnel holds an in-flight slot on the upstream for its whole life
+    but records no latency, long-lived tunnels would distort the EWMA.
+
+    :params conn (socket.socket): client connection socket.
+    :params reader (MessageReader): client reader, its buffered bytes
+                                    already belong to the tunnel.
+    :params hostname (str): value of the Host header of the request.
+    :params request (bytes): raw upgrade request.
+    :params routes (RoutingTable): routing table of the exchange.
+    """
+
+    route = routes.lookup(hostname, _request_target(request.decode('iso-8859-1')))
+    try:
+        upstream, address = route.select()
+    except UpstreamBusy as e:
+        log.sampled(log.WARNING, "[Proxy] Upgrade for {} rejected: {}", hostname, e)
+        conn.sendall(SERVICE_UNAVAILABLE)
+        return
+    log.debug("[Proxy] Upgrade tunnel for {} to {}", hostname, upstream)
+    tunnel_stats.opened(upstream)
+    relayed, idle, failed = 0, False, False
+    backend = None
+    try:
+        backend, target = upstream_socket(*address)
+        try:
+            backend.settimeout(TUNNEL_CONNECT_TIMEOUT)
+            backend.connect(target)
+        except OSError as e:
+            log.sampled(log.WARNING, "[Proxy] Tunnel to {} failed: {}", upstream, e)
+            failed = True
+            conn.sendall(FORWARD_ERROR)
+            return
+        pending, reader.buffer = reader.buffer, b''
+        backend.sendall(request + pending)
+        relayed, idle = relay(conn, backend, TUNNEL_IDLE_TIMEOUT)
+        if idle:
+            log.debug("[Proxy] Tunnel to {} closed after {}s idle", upstream, TUNNEL_IDLE_TIMEOUT)
+    finally:
+        tunnel_stats.closed(upstream, relayed, idle)
+        upstream_tracker.release(upstream, failed=failed)
+        if backend is not None:
+            backend.close()
+
+
+#: Answer to an accepted ``Upgrade: h2c`` request.
+SWITCHING_TO_H2C = (
+    b"HTTP/1.1 101 Switching Protocols\r\n"
+    b"Connection: Upgrade\r\n"
+    b"Upgrade: h2c\r\n"
+    b"\r\n"
+)
+
+
+def _drop_request_headers(request, names):
+    """Remove headers (lower-case ``names``) from a raw request string."""
+    head, sep, body = request.partition('\r\n\r\n')
+    lines = head.split('\r\n')
+    lines = lines[:1] + [line for line in lines[1:]
+                         if line.split(':', 1)[0].strip().lower() not in names]
+    return '\r\n'.join(lines) + '\r\n\r\n' + body
+
+
+def h2c_exchange(conn, addr, routes, cache, initial, upgrade=None):
+    """
+    Serves an HTTP/2 cleartext client on ``conn`` until it leaves. Every
+    stream becomes an HTTP/1.1 request answered by :func:`serve_request`,
+    so the cache, coalescing and deadlines apply per stream.
+
+    :params conn (socket.socket): client connection socket.
+    :params addr (tuple): client address (IP, port).
+    :params routes: :class:`LiveRoutes <LiveRoutes>` or routing table.
+    :params cache (ResponseCache): optional shared response cache.
+    :params initial (bytes): bytes already read from the client.
+    :params upgrade (tuple): (hostname, method, request, HTTP2-Settings) of
+                             the HTTP/1.1 request that asked for h2c.
+    """
+
+    def respond(hostname, request):
+        request = _set_request_header(request, 'X-Forwarded-Proto', 'http')
+        request = _set_request_header(request, 'X-Forwarded-For', forwarded_for(
+            _header_value(request, 'X-Forwarded-For'), addr))
+        table = as_routing_table(routes)
+        with trace.span('proxy h2c {}'.format(_request_target(request)),
+                        parent=_header_value(request, trace.TRACE_HEADER), host=hostname):
+            return serve_request(hostname, request, table, cache, time.monotonic())
+
+    log.debug("[Proxy] {} switched to h2c", addr)
+    connection = H2Connection(conn, respond)
+    connection.serve(initial, upgrade)
+    log.debug("[Proxy] {} h2c closed: {}", addr, connection.stats)
+
+
+def handle_client(ip, port, conn, addr, routes, cache=None, scheme='http'):
     """
     Handles an individual client connection by parsing the request,
     determining the target backend, and forwarding the request.
@@ -149,50 +747,166 @@ def handle_client(ip, port, conn, addr, routes):
 
     The handler sends the backend response back to the client or
     returns 404 if the hostname is unreachable or is not recognized.
+    GET requests go through ``cache`` when one is configured. The deadline
+    budget of a request starts once its head has been received.
+
+    The client connection is kept open between requests when the client
+    asks for it, up to :data:`KEEPALIVE_REQUESTS` requests and with an idle
+    timeout of :data:`KEEPALIVE_TIMEOUT` seconds, and until the process
+    starts draining. Requests are delimited by
+    ``Content-Length`` or chunked encoding, so pipelined requests are
+    answered in order.
+
+    An upgrade request switches the connection to a byte tunnel with the
+    chosen upstream (see :func:`tunnel_exchange`). On plaintext connections
+    the proxy speaks HTTP/2 itself, with prior knowledge or after an
+    ``Upgrade: h2c`` request (see :func:`h2c_exchange`).
+
+    The upstreams always receive plaintext; ``X-Forwarded-Proto`` tells them
+    whether the client connection was TLS, and ``X-Forwarded-For`` who the
+    client is.
 
     :params ip (str): IP address of the proxy server.
     :params port (int): port number of the proxy server.
     :params conn (socket.socket): client connection socket.
     :params addr (tuple): client address (IP, port).
     :params routes (dict): dictionary mapping hostnames and location.
+    :params cache (ResponseCache): optional shared response cache.
+    :params scheme (str): ``http``, or ``https`` on a TLS listener.
     """
 
-    request = conn.recv(1024).decode()
+    reader = MessageReader(conn)
+    conn.settimeout(KEEPALIVE_TIMEOUT)
+    served = 0
+    try:
+        while served < KEEPALIVE_REQUESTS:
+            waiting = served and not reader.buffer
+            if waiting and not handoff.idle(conn):
+                break
+            try:
+                head = reader.read_head()
+                if head is None:
+                    break
+                received = time.monotonic()
+                start_line, fields = head_fields(head)
+                if start_line == 'PRI * HTTP/2.0' and scheme == 'http' and not served:
+                    h2c_exchange(conn, addr, routes, cache, head + reader.buffer)
+                    break
+                body = reader.read_body(fields)
+            except socket.timeout:
+                break
+            except FramingError as e:
+                log.sampled(log.WARNING, "[Proxy] {} bad request: {}", addr, e)
+                conn.sendall(BAD_REQUEST)
+                break
+            finally:
+                if waiting:
+                    handoff.busy(conn)
+            served += 1
+
+            request = (head + body).decode('utf-8', 'surrogateescape')
+            request = _set_request_header(request, 'X-Forwarded-Proto', scheme)
+            request = _set_request_header(request, 'X-Forwarded-For', forwarded_for(
+                fields.get('x-forwarded-for'), addr))
+            method = start_line.split(' ', 1)[0]
+
+            # Extract hostname
+            hostname = fields.get('host', '')
+
+            log.debug("[Proxy] {} at Host: {}", addr, hostname)
+
+            # Keep one table for the whole exchange, a reload must not
+            # change it under our feet.
+            table = as_routing_table(routes)
+
+            if is_upgrade(fields) and is_h2c_upgrade(fields) and scheme == 'http':
+                conn.sendall(SWITCHING_TO_H2C)
+                request = _drop_request_headers(
+                    request, ('connection', 'upgrade', 'http2-settings'))
+                h2c_exchange(conn, addr, routes, cache, reader.buffer,
+                             (hostname, method, request, fields['http2-settings']))
+                break
 
-    # Extract hostname
-    for line in request.splitlines():
-        if line.lower().startswith('host:'):
-            hostname = line.split(':', 1)[1].strip()
+            if is_upgrade(fields):
+                tunnel_exchange(conn, reader, hostname,
+                                request.encode('utf-8', 'surrogateescape'), table)
+                break
+
+            keep_alive = (wants_keep_alive(start_line, fields) and served < KEEPALIVE_REQUESTS
+                          and not handoff.stopping.is_set())
+            with trace.span('proxy {} {}'.format(method, _request_target(request)),
+                            parent=fields.get(trace.TRACE_HEADER), host=hostname):
+                response = serve_request(hostname, request, table, cache, received)
+                response = reframe_response(
+                    response, method, keep_alive,
+                    "timeout={}, max={}".format(int(KEEPALIVE_TIMEOUT), KEEPALIVE_REQUESTS - served))
+                if keep_alive:
+                    # A response cut short by the upstream closes the connection
+                    keep_alive = wants_keep_alive(*head_fields(response.partition(b'\r\n\r\n')[0]))
+                with trace.span('send'):
+                    conn.sendall(response)
+            if log.access_enabled():
+                log.access(client=addr[0], host=hostname, method=method,
+                           path=_request_target(request), status=response[9:12].decode('latin-1'),
+                           sent=len(response), duration_ms=round((time.monotonic() - received) * 1000, 3))
+            if not keep_alive:
+                break
+    except socket.error as e:
+        log.sampled(log.INFO, "[Proxy] {} connection error: {}", addr, e)
+    finally:
+        conn.close()
 
-    print("[Proxy] {} at Host: {}".format(addr, hostname))
+def handle_tls_client(ip, port, conn, addr, routes, cache, contexts):
+    """
+    Completes the TLS handshake of an accepted connection, then serves it
+    like a plaintext one with :func:`handle_client`.
+
+    :params conn (ssl.SSLSocket): wrapped client connection, handshake pending.
+    :params contexts (TLSContexts): certificates and handshake counters.
+    """
 
-    # Resolve the matching destination in routes and need conver port
-    # to integer value
-    resolved_host, resolved_port = resolve_routing_policy(hostname, routes)
     try:
-        resolved_port = int(resolved_port)
-    except ValueError:
-        print("Not a valid integer")
+        conn.settimeout(HANDSHAKE_TIMEOUT)
+        conn.do_handshake()
+    except (OSError, ValueError) as e:
+        contexts.failed()
+        log.sampled(log.INFO, "[Proxy] {} TLS handshake failed: {}", addr, e)
+        conn.close()
+        return
+    contexts.record(conn)
+    handle_client(ip, port, conn, addr, routes, cache, scheme='https')
 
-    if resolved_host:
-        print("[Proxy] Host name {} is forwarded to {}:{}".format(hostname,resolved_host, resolved_port))
-        response = forward_request(resolved_host, resolved_port, request)        
-    else:
-        response = (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode('utf-8')
-    conn.sendall(response)
-    conn.close()
-    if hostname in conn_counters and resolved_host in conn_counters[hostname]:
-        conn_counters[hostname][resolved_host] = max(0, conn_counters[hostname][resolved_host] - 1)
-        print(f"[Policy] Connection closed: {resolved_host} (-1)")
 
-def run_proxy(ip, port, routes):
+def serve_tls(ip, tls_port, routes, cache, contexts, listener):
+    """
+    Accepts TLS connections on ``ip:tls_port``, one thread per client.
+
+    :params routes: :class:`LiveRoutes <LiveRoutes>` or routing table.
+    :params contexts (TLSContexts): certificates and handshake counters.
+    :params listener (socket.socket): listening socket of ``ip:tls_port``.
+    """
+
+    try:
+        print("[Proxy] Listening for TLS on IP {} port {}".format(ip, tls_port))
+        while True:
+            accepted = handoff.accept(listener)
+            if accepted is None:
+                break
+            conn, addr = accepted
+            try:
+                conn = contexts.wrap(conn)
+            except (OSError, ValueError) as e:
+                log.sampled(log.WARNING, "[Proxy] {} TLS unavailable: {}", addr, e)
+                conn.close()
+                continue
+            handoff.spawn(handle_tls_client,
+                          (ip, tls_port, conn, addr, routes, cache, contexts))
+    except socket.error as e:
+      print("Socket error: {}".format(e))
+
+
+def run_proxy(ip, port, routes, cache=None, tls_port=None, admin_address=None,
+              transport=None):
     """
     Starts the proxy server and listens for incoming connections. 
 
@@ -203,39 +917,121 @@ def run_proxy(ip, port, routes):
 
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes (dict): dictionary mapping hostnames and location, or a
+                           :class:`LiveRoutes <LiveRoutes>` reloaded on
+                           SIGHUP and when its file changes.
+    :params cache (ResponseCache): optional shared response cache.
+    :params tls_port (int): optional port of a TLS listener using the
+                            ``ssl_certificate`` of each host.
+    :params admin_address (tuple): optional (ip, port) of the ``/stats``
+                                   and ``/metrics`` listener, see
+                                   :mod:`daemon.admin`.
+    :params transport: optional :mod:`transport <daemon.transport>` of the
+                       client listener and the upstream connections, TCP by
+                       default; the TLS and admin listeners stay on TCP.
+
+    SIGUSR2 hands the listeners to a new proxy process and SIGTERM stops
+    accepting; either way the connections in progress are drained before
+    the process exits (see :mod:`daemon.handoff`).
 
     """
 
-    proxy = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    global proxy_transport
+    if transport is not None:
+        proxy_transport = transport
+    if isinstance(routes, LiveRoutes):
+        if routes.install_sighup():
+            print("[Proxy] SIGHUP reloads the routing table")
+        routes.start_watcher()
+    else:
+        if not isinstance(routes, RoutingTable):
+            routes = compile_routes(routes, upstream_tracker)
+        routes.install(upstream_tracker)
+    if handoff.install():
+        print("[Proxy] SIGUSR2 hands the listeners to a new process, SIGTERM drains")
 
     try:
-        proxy.bind((ip, port))
-        proxy.listen(50)
+        tls_thread = None
+        if tls_port is not None:
+            listener = handoff.listen_socket('{}:{}'.format(ip, tls_port),
+                                             lambda: handoff.tcp_socket(ip, tls_port))
+            tls_thread = threading.Thread(
+                target=serve_tls,
+                args=(ip, tls_port, routes, cache, proxy_tls_contexts(routes), listener),
+                daemon=True,
+            )
+            tls_thread.start()
+
+        if admin_address is not None:
+            admin.start_admin(admin_address, admin.install_sources(
+                upstream_tracker, tunnel_stats, lambda: tls_contexts, cache))
+
+        proxy = proxy_transport.listen(ip, port)
         print("[Proxy] Listening on IP {} port {}".format(ip,port))
+        handoff.ready()
         while True:
-            conn, addr = proxy.accept()
+            accepted = handoff.accept(proxy)
+            if accepted is None:
+                break
+            conn, addr = accepted
             #
             #  TODO: implement the step of the client incomping connection
             #        using multi-thread programming with the
             #        provided handle_client routine
             #
-            proxy_thread = threading.Thread(
-                target=handle_client,
-                args=(ip, port, conn, addr, routes),
-                daemon=True  # Daemon thread để tự kết thúc khi main thread dừng
-            )
-            proxy_thread.start()
+            handoff.spawn(handle_client, (ip, port, conn, addr, routes, cache))
+        if tls_thread is not None:
+            tls_thread.join()
+        handoff.drain()
     except socket.error as e:
       print("Socket error: {}".format(e))
 
-def create_proxy(ip, port, routes):
+def proxy_tls_contexts(routes):
+    """
+    The TLS contexts of a proxy, following reloads of ``routes``.
+
+    :params routes: :class:`LiveRoutes <LiveRoutes>` or routing table.
+
+    :rtype TLSContexts: contexts whose certificates come from the routes.
+    """
+    global tls_contexts
+    tls_contexts = TLSContexts(lambda: as_routing_table(routes))
+    return tls_contexts
+
+
+def create_proxy(ip, port, routes, cache=None, engine='thread', tls_port=None,
+                 admin_address=None, transport=None):
     """
     Entry point for launching the proxy server.
 
+    The ``thread`` engine serves each client in its own thread and supports
+    the response cache and request coalescing. The ``asyncio`` engine
+    (:mod:`daemon.aioproxy`) serves all clients from one event loop and
+    streams both directions, for large numbers of slow clients.
+
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes (dict): dictionary mapping hostnames and location, or a
+                           :class:`LiveRoutes <LiveRoutes>` reloaded on
+                           SIGHUP and when its file changes.
+    :params cache (ResponseCache): optional shared response cache.
+    :params engine (str): ``thread`` (default) or ``asyncio``.
+    :params tls_port (int): optional port of a TLS listener, see
+                            :mod:`daemon.tls`.
+    :params admin_address (tuple): optional (ip, port) of the admin
+                                   listener, see :mod:`daemon.admin`.
+    :params transport: optional :mod:`transport <daemon.transport>`, TCP by
+                       default; only the ``thread`` engine accepts another.
+
+    :raises ValueError: for the ``asyncio`` engine on another transport.
     """
 
-    run_proxy(ip, port, routes)
+    if engine == 'asyncio':
+        if transport is not None and transport is not TCP:
+            raise ValueError("The asyncio engine only runs on TCP")
+        from .aioproxy import run_proxy as run_async_proxy
+        if cache is not None:
+            print("[Proxy] Response cache is not used by the asyncio engine")
+        run_async_proxy(ip, port, routes, tls_port, admin_address)
+    else:
+        run_proxy(ip, port, routes, cache, tls_port, admin_address, transport)
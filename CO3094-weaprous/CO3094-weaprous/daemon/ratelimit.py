@@ -0,0 +1,287 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.ratelimit
+~~~~~~~~~~~~~~~~~
+
+This module protects a backend from clients that ask more than it can serve,
+such as a page polling ``/get-messages`` in a tight loop.
+
+:class:`TokenBuckets` gives every client IP address a bucket of ``burst``
+tokens refilled at ``rate`` tokens per second; a request takes one token
+and is answered ``429 Too Many Requests`` with a ``Retry-After`` header when
+the bucket is empty. Routes can have a bucket of their own per client on top
+of it. A bucket is only the pair (tokens, time of the last request) in one
+ordered dict: a bucket idle long enough to be full again is dropped, since a
+new one is the same, and the least recently used buckets are evicted beyond
+``max_keys``, so the memory does not grow with the number of clients.
+
+:class:`Admission` answers ``503 Service Unavailable`` whatever the client
+once too many requests are answered at the same time, or too many accepted
+connections wait for their turn.
+
+Both are off unless :func:`configure` runs, usually through
+:meth:`WeApRous.enable_rate_limit <daemon.weaprous.WeApRous.enable_rate_limit>`.
+Clients are told apart by the address of the connection or, when it
+comes from one of the ``trusted_proxies``, by the last address of its
+``X-Forwarded-For`` header, which the proxy appends.
+
+Usage::
+
+  >>> configure(rate=10, burst=20, routes={'/get-messages': (2, 5)},
+  ...           max_in_flight=64, max_queue=256, trusted_proxies=['127.0.0.1'])
+  >>> client = limits.client_of('127.0.0.1', '10.0.0.7')
+  >>> refused = limits.admit(client, '/get-messages')
+  >>> if refused is None:
+  ...     try:
+  ...         answer()
+  ...     finally:
+  ...         limits.release()
+"""
+
+import collections
+import threading
+import time
+
+from . import metrics
+
+#: Buckets kept before the least recently used are evicted.
+MAX_KEYS = 10000
+
+#: ``Retry-After`` seconds of a request refused by :class:`Admission`.
+OVERLOAD_RETRY_AFTER = 1
+
+#: The limits in force, None when off.
+limits = None
+
+
+class TokenBuckets:
+    """
+    Token buckets keyed by client, kept in one expiring ordered dict.
+
+    :attrs rate (float): tokens added per second.
+    :attrs burst (float): tokens of a full bucket.
+    :attrs max_keys (int): buckets kept at most.
+    """
+
+    def __init__(self, rate, burst=None, max_keys=MAX_KEYS):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        if self.burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.max_keys = max_keys
+        # Seconds an idle bucket needs to be full again
+        self.ttl = self.burst / self.rate
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """
+        Take a token from the bucket of ``key``.
+
+        :params key: the client, any hashable value.
+        :params now (float): :func:`time.monotonic` time of the request.
+
+        :rtype float: 0 when the request may go on, otherwise the seconds
+                      until the bucket has a token again.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            if bucket is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            self._expire(now)
+        return wait
+
+    def refund(self, key):
+        """Give back the token of a request refused by another limit."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._buckets[key] = (min(self.burst, bucket[0] + 1), bucket[1])
+
+    def _expire(self, now):
+        # The least recently used buckets come first
+        buckets = self._buckets
+        while buckets:
+            key, (tokens, stamp) = next(iter(buckets.items()))
+            if len(buckets) <= self.max_keys and now - stamp < self.ttl:
+                break
+            del buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class Admission:
+    """
+    Counts the connections of a backend and the requests it is answering.
+
+    :attrs max_in_flight (int): requests answered at the same time at most,
+                                None for no limit.
+    :attrs max_queue (int): connections waiting for their request to be
+                            answered at most, None for no limit.
+    """
+
+    def __init__(self, max_in_flight=None, max_queue=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.connections = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def opened(self):
+        """A connection was accepted."""
+        with self._lock:
+            self.connections += 1
+
+    def closed(self):
+        """A connection was served."""
+        with self._lock:
+            self.connections -= 1
+
+    def enter(self):
+        """
+        Count a request in flight unless a limit is reached.
+
+        :rtype bool: True when admitted; :meth:`leave` must follow.
+        """
+        with self._lock:
+            waiting = self.connections - self.in_flight - 1
+            if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+                return False
+            if self.max_queue is not None and waiting > self.max_queue:
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        """An admitted request was answered."""
+        with self._lock:
+            self.in_flight -= 1
+
+
+class Limits:
+    """
+    The rate limits and admission control of a backend.
+
+    :attrs clients (TokenBuckets): per client IP, None for no limit.
+    :attrs routes (dict): route path -> :class:`TokenBuckets` per client IP.
+    :attrs admission (Admission): the concurrency limits.
+    :attrs trusted_proxies (frozenset): addresses whose ``X-Forwarded-For``
+                                        names the client.
+    """
+
+    def __init__(self, rate=None, burst=None, routes=None, max_in_flight=None,
+                 max_queue=None, max_keys=MAX_KEYS, trusted_proxies=None):
+        self.clients = TokenBuckets(rate, burst, max_keys) if rate else None
+        self.routes = {path: TokenBuckets(route_rate, route_burst, max_keys)
+                       for path, (route_rate, route_burst) in (routes or {}).items()}
+        self.admission = Admission(max_in_flight, max_queue)
+        self.trusted_proxies = frozenset(trusted_proxies or ())
+
+    def client_of(self, peer, forwarded_for=None):
+        """
+        The client a request is counted against.
+
+        :params peer (str): address of the connection, empty for a Unix
+                            domain socket, whose peers are local and trusted.
+        :params forwarded_for (str): ``X-Forwarded-For`` of the request, if any.
+
+        :rtype str: the last hop of ``forwarded_for`` when ``peer`` is a
+                    trusted proxy, otherwise ``peer``. Earlier hops are
+                    ignored, the client may have sent them.
+        """
+        if forwarded_for and (not peer or peer in self.trusted_proxies):
+            client = forwarded_for.rsplit(',', 1)[-1].strip()
+            if client:
+                return client
+        return peer
+
+    def admit(self, client, route):
+        """
+        Admit a request of ``client`` to ``route``.
+
+        :params client (str): client IP address.
+        :params route (str): registered route path, or None for a static file.
+
+        :rtype tuple: None when admitted, in which case :meth:`release`
+                      must follow, otherwise (status code, Retry-After seconds).
+        """
+        now = time.monotonic()
+        # The tokens taken are given back when a later limit refuses, so
+        # that a refused request costs nothing.
+        taken = []
+        refused = None
+        for reason, buckets in (('route', self.routes.get(route)), ('client', self.clients)):
+            if buckets is None:
+                continue
+            wait = buckets.take(client, now)
+            if wait:
+                refused = reason, 429, wait
+                break
+            taken.append(buckets)
+        if refused is None and not self.admission.enter():
+            refused = 'overload', 503, OVERLOAD_RETRY_AFTER
+        if refused is None:
+            return None
+        for buckets in taken:
+            buckets.refund(client)
+        metrics.rejected_total.inc((refused[0],))
+        return refused[1:]
+
+    def release(self):
+        """An admitted request was answered."""
+        self.admission.leave()
+
+    def snapshot(self):
+        """Buckets kept and requests counted, for the stats pages."""
+        admission = self.admission
+        return {
+            "clients": len(self.clients) if self.clients is not None else 0,
+            "routes": {path: len(buckets) for path, buckets in self.routes.items()},
+            "connections": admission.connections,
+            "in_flight": admission.in_flight,
+        }
+
+
+def configure(rate=None, burst=None, routes=None, max_in_flight=None, max_queue=None,
+              max_keys=MAX_KEYS, trusted_proxies=None):
+    """
+    Turn the limits on for every backend of the process.
+
+    :params rate (float): requests per second of a client IP, None for no limit.
+    :params burst (float): requests a client IP may send at once, ``rate`` by default.
+    :params routes (dict): route path -> (rate, burst) per client IP.
+    :params max_in_flight (int): requests answered at the same time.
+    :params max_queue (int): accepted connections waiting for their turn.
+    :params max_keys (int): buckets kept per limit.
+    :params trusted_proxies (list): addresses of the proxies in front of the
+                                    backend, trusted to name the client.
+
+    :rtype Limits: the limits in force.
+    """
+    global limits
+    limits = Limits(rate, burst, routes, max_in_flight, max_queue, max_keys, trusted_proxies)
+    return limits
@@ -18,6 +18,7 @@ This module provides a Request object to manage and persist
 request settings (cookies, auth, proxies).
 """
 from .dictionary import CaseInsensitiveDict
+from . import log
 
 ############ add import###########
 from urllib.parse import urlencode
@@ -102,7 +103,7 @@ class Request():
 
         # Prepare the request line from the request header
         self.method, self.path, self.version = self.extract_request_line(request)
-        print("[Request] {} path {} version {}".format(self.method, self.path, self.version))
+        log.debug("[Request] {} path {} version {}", self.method, self.path, self.version)
 
         #
         # @bksysnet Preapring the webapp hook with WeApRous instance
@@ -215,7 +216,7 @@ class Request():
             try:
                 return jsonlib.loads(raw_body)
             except jsonlib.JSONDecodeError as e:
-                print(f"[Request] JSON parse error: {e}")
+                log.sampled(log.WARNING, "[Request] JSON parse error: {}", e)
                 return raw_body
         
         elif 'application/x-www-form-urlencoded' in content_type:
@@ -18,15 +18,23 @@ This module provides a :class: `Response <Response>` object to manage and persis
 response settings (cookies, auth, proxies), and to construct HTTP responses
 based on incoming requests. 
 
-The current version supports MIME type detection, content loading and header formatting
+The current version supports MIME type detection, content loading and header formatting.
+Static files are sent with ``Cache-Control: max-age`` and ``ETag`` /
+``Last-Modified`` validators, and a conditional request for an unchanged
+file is answered ``304 Not Modified``.
 """
 import datetime
+import email.utils
 import os
 import mimetypes
 from .dictionary import CaseInsensitiveDict
+from . import log, trace
 
 BASE_DIR = ""
 
+#: Seconds a static file may be served from a cache without revalidation.
+STATIC_MAX_AGE = 60
+
 class Response():   
     """The :class:`Response <Response>` object, which contains a
     server's response to an HTTP request.
@@ -151,7 +159,7 @@ class Response():
 
         # Processing mime_type based on main_type and sub_type
         main_type, sub_type = mime_type.split('/', 1)
-        print("[Response] processing MIME main_type={} sub_type={}".format(main_type,sub_type))
+        log.debug("[Response] processing MIME main_type={} sub_type={}", main_type, sub_type)
         if main_type == 'text':
             self.headers['Content-Type']='text/{}'.format(sub_type)
             if sub_type == 'plain' or sub_type == 'css':
@@ -197,7 +205,7 @@ class Response():
 
         filepath = os.path.join(base_dir, path.lstrip('/'))
 
-        print("[Response] serving the object at location {}".format(filepath))
+        log.debug("[Response] serving the object at location {}", filepath)
             #
             #  TODO: implement the step of fetch the object file
             #        store in the return value of content
@@ -217,9 +225,47 @@ class Response():
                     obj_file.close()
             else:
                 return 0, b""
+            self.set_validators(os.stat(filepath))
         return len(content), content
 
+    def set_validators(self, info):
+        """
+        Sets the ``ETag`` and ``Last-Modified`` headers of a static file.
+
+        :params info (os.stat_result): status of the file served.
+        """
+        self.headers['ETag'] = '"{:x}-{:x}"'.format(info.st_mtime_ns, info.st_size)
+        self.headers['Last-Modified'] = email.utils.formatdate(info.st_mtime, usegmt=True)
+
+    def is_not_modified(self, request):
+        """
+        Whether a conditional request already holds the file being served,
+        from its ``If-None-Match`` or, without it, ``If-Modified-Since``.
+
+        :params request (class:`Request <Request>`): incoming request object.
+
+        :rtype bool: True when ``304 Not Modified`` can be answered.
+        """
+        reqhdr = request.headers or {}
+        etag = self.headers.get('ETag')
+        if etag is None or request.method not in ('GET', 'HEAD'):
+            return False
+        if_none_match = reqhdr.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags or 'W/' + etag in tags
+        since = reqhdr.get('if-modified-since')
+        if since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(since)
+            modified = email.utils.parsedate_to_datetime(self.headers['Last-Modified'])
+        except (TypeError, ValueError, IndexError):
+            return False
+        return modified <= since
+
 
+    @trace.traced('build_response_header')
     def build_response_header(self, request):
         """
         Constructs the HTTP response headers based on the class:`Request <Request>
@@ -238,6 +284,7 @@ class Response():
         # Map status codes to reason phrases
         status_messages = {
             200: "OK",
+            304: "Not Modified",
             401: "Unauthorized",
             404: "Not Found",
             500: "Internal Server Error"
@@ -255,7 +302,7 @@ class Response():
                 "Accept": "{}".format(reqhdr.get("Accept", "application/json")),
                 "Accept-Language": "{}".format(reqhdr.get("Accept-Language", "en-US,en;q=0.9")),
                 "Authorization": "{}".format(reqhdr.get("Authorization", "Basic <credentials>")),
-                "Cache-Control": "no-cache",
+                "Cache-Control": "{}".format(rsphdr.get('Cache-Control', 'no-cache')),
                 "Content-Type": "{}".format(self.headers['Content-Type']),
                 "Content-Length": "{}".format(len(self._content)),
 #                "Cookie": "{}".format(reqhdr.get("Cookie", "sessionid=xyz789")), #dummy cooki
@@ -270,6 +317,15 @@ class Response():
                 "Warning": "199 Miscellaneous warning",
                 "User-Agent": "{}".format(reqhdr.get("User-Agent", "Chrome/123.0.0.0")),
             }
+        # Validators of a static file; only responses that must not be
+        # cached keep the HTTP/1.0 Pragma.
+        for name in ('ETag', 'Last-Modified'):
+            if name in rsphdr:
+                headers[name] = rsphdr[name]
+        if 'Cache-Control' in rsphdr:
+            del headers['Pragma']
+        if self.status_code == 304:
+            del headers['Content-Length']
         if hasattr(self, '_set_cookies') and self._set_cookies:
             for cookie_name, cookie_value in self._set_cookies.items():
                 headers["Set-Cookie"] = "{}={}; Path=/; HttpOnly".format(cookie_name, cookie_value)
@@ -328,13 +384,113 @@ class Response():
         return (
             "HTTP/1.1 401 Unauthorized\r\n"
             "Content-Type: text/html\r\n"
-            "Content-Length: 13\r\n"
+            "Content-Length: 16\r\n"
             "Cache-Control: no-cache\r\n"
             "Connection: close\r\n"
             "\r\n"
             "401 Unauthorized"
         ).encode('utf-8')
 
+    def build_deadline_exceeded(self):
+        """
+        Constructs a 504 Gateway Timeout HTTP response.
+        Used when the deadline propagated by the proxy has already passed.
+        """
+
+        return (
+            "HTTP/1.1 504 Gateway Timeout\r\n"
+            "Content-Type: text/plain\r\n"
+            "Content-Length: 19\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+            "504 Gateway Timeout"
+        ).encode('utf-8')
+
+    def build_request_timeout(self):
+        """
+        Constructs a 408 Request Timeout HTTP response.
+        Used when the client is too slow to send its request (see :mod:`daemon.timeouts`).
+        """
+
+        return (
+            "HTTP/1.1 408 Request Timeout\r\n"
+            "Content-Type: text/plain\r\n"
+            "Content-Length: 19\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+            "408 Request Timeout"
+        ).encode('utf-8')
+
+    def build_payload_too_large(self):
+        """
+        Constructs a 413 Payload Too Large HTTP response.
+        Used when the request body is over the limit of :mod:`daemon.timeouts`.
+        """
+
+        return (
+            "HTTP/1.1 413 Payload Too Large\r\n"
+            "Content-Type: text/plain\r\n"
+            "Content-Length: 21\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+            "413 Payload Too Large"
+        ).encode('utf-8')
+
+    def build_header_too_large(self):
+        """
+        Constructs a 431 Request Header Fields Too Large HTTP response.
+        Used when the request head is over the limit of :mod:`daemon.timeouts`.
+        """
+
+        return (
+            "HTTP/1.1 431 Request Header Fields Too Large\r\n"
+            "Content-Type: text/plain\r\n"
+            "Content-Length: 35\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+            "431 Request Header Fields Too Large"
+        ).encode('utf-8')
+
+    def build_too_many_requests(self, retry_after):
+        """
+        Constructs a 429 Too Many Requests HTTP response.
+        Used when the client used up its rate limit (see :mod:`daemon.ratelimit`).
+
+        :param retry_after (int): seconds before the client may try again.
+        """
+
+        return (
+            "HTTP/1.1 429 Too Many Requests\r\n"
+            "Content-Type: text/plain\r\n"
+            "Content-Length: 21\r\n"
+            "Retry-After: {}\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+            "429 Too Many Requests"
+        ).format(retry_after).encode('utf-8')
+
+    def build_service_unavailable(self, retry_after):
+        """
+        Constructs a 503 Service Unavailable HTTP response.
+        Used when the backend is too busy to admit the request.
+
+        :param retry_after (int): seconds before the client may try again.
+        """
+
+        return (
+            "HTTP/1.1 503 Service Unavailable\r\n"
+            "Content-Type: text/plain\r\n"
+            "Content-Length: 23\r\n"
+            "Retry-After: {}\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+            "503 Service Unavailable"
+        ).format(retry_after).encode('utf-8')
+
+    @trace.traced('build_response')
     def build_response(self, request):
         """
         Builds a full HTTP response including headers and content based on the request.
@@ -347,7 +503,7 @@ class Response():
         path = request.path
 
         mime_type = self.get_mime_type(path)
-        print("[Response] {} path {} mime_type {}".format(request.method, request.path, mime_type))
+        log.debug("[Response] {} path {} mime_type {}", request.method, request.path, mime_type)
 
         base_dir = ""
 
@@ -361,7 +517,7 @@ class Response():
             try:
                 base_dir = self.prepare_content_type(mime_type)
             except ValueError as e:
-                print(f"[Response] Error Content Type: {e}")
+                log.sampled(log.WARNING, "[Response] Error Content Type: {}", e)
                 return self.build_notfound()
         #######################################################
         #
@@ -370,7 +526,11 @@ class Response():
         else:
             return self.build_notfound()
 
+        self.headers.setdefault('Cache-Control', 'max-age={}'.format(STATIC_MAX_AGE))
         c_len, self._content = self.build_content(path, base_dir)
+        if self.is_not_modified(request):
+            self.status_code = 304
+            self._content = b""
         self._header = self.build_response_header(request)
 
         return self._header + self._content
\ No newline at end of file
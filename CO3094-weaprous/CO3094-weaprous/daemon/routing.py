@@ -0,0 +1,483 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.routing
+~~~~~~~~~~~~~~~~~
+
+This module compiles the routes dict produced by ``parse_virtual_hosts`` into
+an immutable :class:`RoutingTable <RoutingTable>`. Upstreams are resolved
+once to ``(host, int port)`` tuples and every host and location gets its
+policy object, so the proxy does no string handling on the request path.
+Hosts are matched exactly, by ``*.domain`` wildcard or fall to the default
+server; locations inside a host are matched by longest path prefix.
+
+:class:`LiveRoutes <LiveRoutes>` holds the table currently in use and swaps it
+atomically when the configuration is reloaded (on SIGHUP or when the file
+changes). A request reads the table once and keeps it until it is done, so a
+reload never disturbs connections in flight. A configuration that fails to
+parse or compile is reported and the running table stays in place.
+
+Usage::
+
+  >>> live = LiveRoutes(lambda: parse_virtual_hosts("config/proxy.conf"),
+  >>>                   tracker, watch="config/proxy.conf")
+  >>> route = live.current.lookup("app1.local", "/get-messages")
+  >>> name, (host, port) = route.select()
+"""
+
+import os
+import signal
+import threading
+from types import MappingProxyType
+
+from .balancer import DEFAULT_QUEUE_TIMEOUT, POLICIES, UpstreamBusy
+
+#: Upstream used when a host is unknown or maps to no proxy_pass.
+DEFAULT_UPSTREAM = '127.0.0.1:9000'
+
+#: Policy used when a host does not set ``dist_policy``.
+DEFAULT_POLICY = 'round-robin'
+
+#: Prefix of an upstream reached through a Unix domain socket.
+UNIX_PREFIX = 'unix:'
+
+#: Seconds between two checks of the watched configuration file.
+WATCH_INTERVAL = 1.0
+
+def parse_upstream(upstream):
+    """
+    Resolve a ``"host:port"`` or ``"unix:/path.sock"`` proxy_pass value.
+
+    :params upstream (str): upstream as written in proxy.conf.
+
+    :rtype tuple: (name, (host, port)) with the normalised ``"host:port"``
+                  name and an integer port; for a Unix domain socket
+                  (name, (path, None)).
+    :raises ValueError: if the value has no valid port or socket path.
+    """
+    upstream = upstream.strip()
+    if upstream.startswith(UNIX_PREFIX):
+        path = upstream[len(UNIX_PREFIX):]
+        if not path:
+            raise ValueError("Invalid proxy_pass {!r}: empty socket path".format(upstream))
+        return UNIX_PREFIX + path, (path, None)
+    host, sep, port = upstream.rpartition(':')
+    if not sep or not host:
+        raise ValueError("Invalid proxy_pass {!r}: expected host:port".format(upstream))
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError("Invalid proxy_pass {!r}: port is not an integer".format(upstream))
+    if not 0 < port < 65536:
+        raise ValueError("Invalid proxy_pass {!r}: port out of range".format(upstream))
+    return "{}:{}".format(host, port), (host, port)
+
+
+class Route:
+    """
+    Compiled routing entry of one host or location.
+
+    :attrs hostname (str): host name of the block the route comes from.
+    :attrs location (str): location prefix, empty for the host itself.
+    :attrs upstreams (tuple): normalised ``"host:port"`` or
+                              ``"unix:/path"`` names.
+    :attrs addresses (dict): name -> (host, int port), or (path, None) for
+                             a Unix domain socket.
+    :attrs policy: policy object with a ``select()`` method.
+    :attrs options (mappingproxy): read-only per-host options.
+    :attrs limits (dict): name -> (max_conns, queue, queue_timeout) of the
+                          upstreams declared with a ``max_conns``.
+    :attrs tracker (UpstreamTracker): load state and admission limits.
+    """
+
+    __slots__ = ("hostname", "location", "upstreams", "addresses", "policy", "options",
+                 "limits", "tracker")
+
+    def __init__(self, hostname, upstreams, policy_name, options, tracker, location=''):
+        if isinstance(upstreams, str):
+            upstreams = [upstreams]
+        if not upstreams:
+            upstreams = [DEFAULT_UPSTREAM]
+        policy_cls = POLICIES.get(policy_name or DEFAULT_POLICY)
+        if policy_cls is None:
+            raise ValueError("Unknown dist_policy {!r} for host {!r}".format(policy_name, hostname))
+        addresses = {}
+        names = []
+        for upstream in upstreams:
+            name, address = parse_upstream(upstream)
+            addresses[name] = address
+            names.append(name)
+        self.hostname = hostname
+        self.location = location
+        self.upstreams = tuple(names)
+        self.addresses = addresses
+        self.policy = policy_cls(self.upstreams, tracker)
+        self.options = MappingProxyType(dict(options or {}))
+        self.limits = _compile_limits(self.options.get('upstream_limits'), self.upstreams)
+        self.tracker = tracker
+
+    def select(self, wait=True):
+        """
+        Pick an upstream with the route policy. The upstream is acquired in
+        the tracker and must be released by the caller.
+
+        When the chosen upstream is at its ``max_conns`` the request goes to
+        another upstream of the route with a free slot, the cheapest first;
+        when all are full it waits in the queue of the chosen one.
+
+        :params wait (bool): whether the request may queue for a slot.
+
+        :rtype tuple: (name, (host, port)).
+        :raises UpstreamBusy: when no slot could be obtained.
+        """
+        name = self.policy.select()
+        limiter = self.tracker.limiter
+        if not limiter.try_admit(name):
+            name = self._admit_elsewhere(name, wait)
+        self.tracker.selected(self.hostname, self.policy.name, name)
+        return name, self.addresses[name]
+
+    def _admit_elsewhere(self, name, wait):
+        """The upstream that admits a request ``name`` had no slot for."""
+        limiter = self.tracker.limiter
+        for other in sorted(self.upstreams, key=self.tracker.cost):
+            if other != name and limiter.try_admit(other):
+                limiter.fallback(name)
+                self.tracker.cancel(name)
+                self.tracker.acquire(other)
+                return other
+        try:
+            if not wait:
+                raise UpstreamBusy(name, "at max_conns")
+            limiter.wait(name)
+        except UpstreamBusy:
+            self.tracker.cancel(name)
+            raise
+        return name
+
+
+def _compile_limits(limits, names):
+    """
+    Normalise the ``upstream_limits`` option of a route.
+
+    :params limits (dict): proxy_pass -> {"max_conns", "queue",
+                           "queue_timeout"} as parsed from proxy.conf.
+    :params names (tuple): normalised upstream names of the route.
+
+    :rtype dict: name -> (max_conns, queue, queue_timeout) for the names of
+                 the route that have a ``max_conns``.
+    :raises ValueError: on a non positive ``max_conns``.
+    """
+    compiled = {}
+    for upstream, params in (limits or {}).items():
+        name, _ = parse_upstream(upstream)
+        if name not in names or params.get('max_conns') is None:
+            continue
+        max_conns = int(params['max_conns'])
+        if max_conns < 1:
+            raise ValueError("Invalid max_conns={} for {}".format(max_conns, name))
+        compiled[name] = (max_conns, int(params.get('queue', 0)),
+                          float(params.get('queue_timeout', DEFAULT_QUEUE_TIMEOUT)))
+    return compiled
+
+
+class VirtualHost:
+    """
+    Routes of one host block: the host route and its location prefixes.
+
+    Locations are matched by longest prefix: the distinct prefix lengths are
+    kept in decreasing order and each one costs a single dict lookup.
+
+    :attrs root (Route): route used when no location matches.
+    :attrs locations (dict): prefix -> Route.
+    :attrs lengths (tuple): distinct prefix lengths, longest first.
+    """
+
+    __slots__ = ("root", "locations", "lengths")
+
+    def __init__(self, root, locations):
+        self.root = root
+        self.locations = locations
+        self.lengths = tuple(sorted({len(prefix) for prefix in locations}, reverse=True))
+
+    def match(self, path):
+        """
+        Return the route of the longest location prefix of ``path``.
+
+        :rtype Route: compiled route.
+        """
+        for length in self.lengths:
+            # A path shorter than ``length`` can only equal a shorter prefix,
+            # which is then its longest match anyway.
+            route = self.locations.get(path[:length])
+            if route is not None:
+                return route
+        return self.root
+
+
+def _compile_host(hostname, value, tracker):
+    """Compile one routes dict entry into a :class:`VirtualHost`."""
+    proxy_map, policy = value[0], value[1]
+    options = dict(value[2]) if len(value) > 2 else {}
+    locations = options.pop('locations', {})
+    options.pop('default_server', None)
+    root = Route(hostname, proxy_map, policy, options, tracker)
+    compiled = {}
+    for prefix, (location_map, location_policy, location_options) in locations.items():
+        if not prefix.startswith('/'):
+            raise ValueError("Invalid location {!r} for host {!r}: must start with /".format(prefix, hostname))
+        merged = dict(options)
+        merged.update(location_options or {})
+        merged.pop('default_server', None)
+        compiled[prefix] = Route(hostname, location_map or proxy_map, location_policy or policy,
+                                 merged, tracker, location=prefix)
+    return VirtualHost(root, compiled)
+
+
+def _split_port(hostname):
+    """Drop a trailing ``:port`` from a Host header value."""
+    name, sep, port = hostname.rpartition(':')
+    # A bare IPv6 address has colons but no port.
+    if sep and port.isdigit() and (name.endswith(']') or ':' not in name):
+        return name
+    return hostname
+
+
+class RoutingTable:
+    """
+    Immutable mapping of hostnames to compiled :class:`VirtualHost` objects.
+
+    Host matching tries, in order: the exact Host value, the value without
+    its port, the wildcard names (``*.example.local``) from the longest
+    suffix to the shortest, then the default server.
+
+    :attrs routes (mappingproxy): exact lower-case hostname -> VirtualHost.
+    :attrs wildcards (mappingproxy): suffix (``.example.local``) -> VirtualHost.
+    :attrs default (VirtualHost): host of unmatched names.
+    :attrs limits (mappingproxy): upstream -> (max_conns, queue,
+                                  queue_timeout) of the limited upstreams,
+                                  installed by :meth:`install`.
+    """
+
+    __slots__ = ("routes", "wildcards", "default", "limits")
+
+    def __init__(self, routes, default, wildcards=None, limits=None):
+        self.routes = MappingProxyType(routes)
+        self.wildcards = MappingProxyType(wildcards or {})
+        self.default = default
+        self.limits = MappingProxyType(limits or {})
+
+    def install(self, tracker):
+        """
+        Put the ``max_conns`` limits of the table in force, when the table
+        becomes the one in use.
+
+        :params tracker (UpstreamTracker): tracker whose limiter admits the
+                                           requests of the table.
+        """
+        tracker.limiter.configure(self.limits)
+
+    def find_host(self, hostname):
+        """
+        Return the virtual host answering ``hostname``.
+
+        :rtype VirtualHost: matched or default host.
+        """
+        host = hostname.lower()
+        vhost = self.routes.get(host)
+        if vhost is not None:
+            return vhost
+        name = _split_port(host)
+        vhost = self.routes.get(name)
+        if vhost is not None:
+            return vhost
+        if self.wildcards:
+            dot = name.find('.')
+            while dot != -1:
+                vhost = self.wildcards.get(name[dot:])
+                if vhost is not None:
+                    return vhost
+                dot = name.find('.', dot + 1)
+        return self.default
+
+    def lookup(self, hostname, path='/'):
+        """
+        Return the route of ``hostname`` and request ``path``.
+
+        :rtype Route: compiled route.
+        """
+        return self.find_host(hostname).match(path)
+
+
+def compile_routes(routes, tracker):
+    """
+    Compile a routes dict into a :class:`RoutingTable <RoutingTable>`.
+
+    :params routes (dict): hostname -> (proxy_pass or list, dist_policy
+                           [, options]) as returned by parse_virtual_hosts.
+    :params tracker (UpstreamTracker): load state shared by the policies.
+
+    Compiling has no side effect: the ``max_conns`` limits of the routes
+    are collected in :attr:`RoutingTable.limits` and only put in force by
+    :meth:`RoutingTable.install`.
+
+    :rtype RoutingTable: the compiled table.
+    :raises ValueError: on an invalid upstream, location or unknown policy,
+                        when several hosts claim to be the default or when
+                        one upstream is given two different limits.
+    """
+    exact = {}
+    wildcards = {}
+    limits = {}
+    default = None
+    for hostname, value in routes.items():
+        vhost = _compile_host(hostname, value, tracker)
+        for route in (vhost.root,) + tuple(vhost.locations.values()):
+            for name, limit in route.limits.items():
+                if limits.setdefault(name, limit) != limit:
+                    raise ValueError("Conflicting limits for upstream {}: {} and {}".format(
+                        name, limits[name], limit))
+        name = hostname.lower()
+        is_default = name == '_' or (len(value) > 2 and value[2].get('default_server'))
+        if is_default:
+            if default is not None:
+                raise ValueError("Several default servers: {!r} and {!r}".format(
+                    default.root.hostname, hostname))
+            default = vhost
+        if name.startswith('*.'):
+            wildcards[name[1:]] = vhost
+        elif name != '_':
+            exact[name] = vhost
+    if default is None:
+        default = VirtualHost(Route('', DEFAULT_UPSTREAM, DEFAULT_POLICY, {}, tracker), {})
+    return RoutingTable(exact, default, wildcards, limits)
+
+
+class LiveRoutes:
+    """
+    Holder of the routing table in use, reloadable at runtime.
+
+    :attrs current (RoutingTable): the table new requests should use.
+    :attrs generation (int): number of successful loads.
+    :attrs stopping (threading.Event): set to end the watcher thread.
+    """
+
+    def __init__(self, loader, tracker, watch=None):
+        """
+        Load, compile and install the first table.
+
+        :param loader (callable): returns a fresh routes dict.
+        :param tracker (UpstreamTracker): load state shared by the policies.
+        :param watch (str): optional configuration file polled for changes.
+        :raises ValueError: if the initial configuration is invalid.
+        """
+        self.loader = loader
+        self.tracker = tracker
+        self.watch = watch
+        self.generation = 0
+        self.stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._mtime = self._stat()
+        self.current = compile_routes(loader(), tracker)
+        self.current.install(tracker)
+        self.generation = 1
+
+    def _stat(self):
+        if not self.watch:
+            return None
+        try:
+            return os.stat(self.watch).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        """
+        Load, compile and swap in a new table, putting its limits in force.
+        On error the running table and its limits are kept and the error is
+        reported.
+
+        :rtype bool: True when the new table is in use.
+        """
+        with self._lock:
+            try:
+                table = compile_routes(self.loader(), self.tracker)
+            except Exception as e:
+                print("[Proxy] Config reload failed, keeping current routes: {}".format(e))
+                return False
+            table.install(self.tracker)
+            self.current = table
+            self.generation += 1
+            print("[Proxy] Routes reloaded (generation {}, {} hosts)".format(
+                self.generation, len(table.routes)))
+            return True
+
+    def install_sighup(self):
+        """
+        Reload on SIGHUP. Only possible from the main thread on platforms
+        that have SIGHUP.
+
+        :rtype bool: True when the handler is installed.
+        """
+        if not hasattr(signal, 'SIGHUP'):
+            return False
+        try:
+            signal.signal(signal.SIGHUP, lambda signum, frame: self._reload_async())
+        except ValueError:
+            return False
+        return True
+
+    def _reload_async(self):
+        # Signal handlers run between bytecodes of the main thread, keep the
+        # file parsing out of it.
+        threading.Thread(target=self.reload, daemon=True).start()
+
+    def start_watcher(self, interval=WATCH_INTERVAL):
+        """
+        Poll the watched file and reload when its modification time changes.
+
+        :rtype threading.Thread: the watcher thread, or None without a file.
+        """
+        if not self.watch:
+            return None
+        watcher = threading.Thread(target=self._watch_loop, args=(interval,), daemon=True)
+        watcher.start()
+        return watcher
+
+    def stop_watcher(self):
+        """End the watcher thread after its current check."""
+        self.stopping.set()
+
+    def _watch_loop(self, interval):
+        while not self.stopping.wait(interval):
+            mtime = self._stat()
+            if mtime is not None and mtime != self._mtime:
+                self._mtime = mtime
+                self.reload()
+
+
+def as_routing_table(routes):
+    """
+    Return the table to use for one request.
+
+    :params routes: :class:`LiveRoutes` or :class:`RoutingTable`.
+
+    :rtype RoutingTable: the table.
+    :raises TypeError: for a plain routes dict, which must be compiled once
+                       with :func:`compile_routes` rather than per request.
+    """
+    if isinstance(routes, LiveRoutes):
+        return routes.current
+    if isinstance(routes, RoutingTable):
+        return routes
+    raise TypeError("routes must be compiled with compile_routes, got {}".format(
+        type(routes).__name__))
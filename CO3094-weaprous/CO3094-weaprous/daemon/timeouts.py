@@ -0,0 +1,242 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.timeouts
+~~~~~~~~~~~~~~~~~
+
+This module protects a backend from slow and idle clients, which would
+otherwise hold one of its threads each for as long as they like.
+
+Every phase of a connection has a deadline: the request headers must arrive
+within :data:`header_timeout` seconds of the connection, the body within
+:data:`body_timeout` seconds of the headers, and the response must be sent
+within :data:`write_timeout` seconds. The handler thread waits at most
+until the deadline on every ``recv`` and ``send``, so a client trickling
+one byte at a time gains nothing, and raises :class:`ClientTimeout` when it
+passes. A head over :data:`MAX_HEADER_BYTES` is refused with
+:class:`HeaderTooLarge`, and a body over :data:`MAX_BODY_BYTES` with
+:class:`RequestTooLarge` before it is read.
+
+:data:`connections` counts the open connections, refusing new ones beyond
+``max_connections`` with ``503 Service Unavailable``, and remembers when
+each one still waiting for its request head last received a byte. The
+reaper thread started by :func:`start_reaper` shuts down those that
+received nothing for :data:`idle_timeout` seconds; their handler wakes up
+with an empty read. Once the head is in, the body and write deadlines
+alone apply. Reaped connections are counted in
+``weaprous_reaped_connections_total``.
+
+Usage::
+
+  >>> configure(header=5, idle=2, max_connections=256)
+  >>> start_reaper()
+  >>> if connections.open(conn):
+  ...     spawn(handle_client, (conn, addr))
+"""
+
+import socket
+import threading
+import time
+
+from . import metrics
+
+#: Default seconds from the connection to the end of the request headers.
+HEADER_TIMEOUT = 10.0
+
+#: Default seconds from the end of the headers to the end of the body.
+BODY_TIMEOUT = 30.0
+
+#: Default seconds to send the response.
+WRITE_TIMEOUT = 30.0
+
+#: Default seconds a connection may wait on the client without moving a byte.
+IDLE_TIMEOUT = 10.0
+
+#: Default open connections at most.
+MAX_CONNECTIONS = 1024
+
+#: Seconds between two rounds of the reaper.
+REAP_INTERVAL = 1.0
+
+#: Largest request head read, answered ``431`` beyond it.
+MAX_HEADER_BYTES = 65536
+
+#: Largest request body accepted, answered ``413`` beyond it.
+MAX_BODY_BYTES = 1024 * 1024
+
+#: Deadlines in force, see :func:`configure`.
+header_timeout = HEADER_TIMEOUT
+body_timeout = BODY_TIMEOUT
+write_timeout = WRITE_TIMEOUT
+idle_timeout = IDLE_TIMEOUT
+
+#: Response sent to a connection beyond ``max_connections``.
+TOO_MANY_CONNECTIONS = (
+    "HTTP/1.1 503 Service Unavailable\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 23\r\n"
+    "Retry-After: 1\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "503 Service Unavailable"
+).encode('utf-8')
+
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+class ClientTimeout(Exception):
+    """
+    Raised when a client misses the deadline of a phase.
+
+    :attrs phase (str): ``header``, ``body`` or ``write``.
+    """
+
+    def __init__(self, phase):
+        super().__init__("client missed the {} deadline".format(phase))
+        self.phase = phase
+
+
+class RequestTooLarge(Exception):
+    """Raised when a request declares a body over :data:`MAX_BODY_BYTES`."""
+
+
+class HeaderTooLarge(Exception):
+    """Raised when a request head grows over :data:`MAX_HEADER_BYTES`."""
+
+
+class Connections:
+    """
+    The open connections of a backend and, for those waiting for their
+    request head, the time they last received a byte.
+
+    :attrs max_connections (int): open connections at most.
+    """
+
+    def __init__(self, max_connections=MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        # Connection -> monotonic time of its last read while waiting for
+        # the request head, None once the head is in
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def open(self, conn):
+        """
+        Count an accepted connection.
+
+        :rtype bool: False when ``max_connections`` are already open.
+        """
+        with self._lock:
+            if len(self._seen) >= self.max_connections:
+                return False
+            self._seen[conn] = time.monotonic()
+            return True
+
+    def close(self, conn):
+        """Forget a connection that was served."""
+        with self._lock:
+            self._seen.pop(conn, None)
+
+    def seen(self, conn):
+        """The connection received part of its request head."""
+        with self._lock:
+            if conn in self._seen:
+                self._seen[conn] = time.monotonic()
+
+    def hold(self, conn):
+        """The request head is in, the connection cannot be reaped any more."""
+        with self._lock:
+            if conn in self._seen:
+                self._seen[conn] = None
+
+    def reap(self, timeout=None, now=None):
+        """
+        Shut down the connections waiting for their request head that
+        received nothing for ``timeout`` seconds (:data:`idle_timeout` by
+        default).
+
+        :rtype int: connections reaped.
+        """
+        timeout = idle_timeout if timeout is None else timeout
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [conn for conn, stamp in self._seen.items()
+                    if stamp is not None and now - stamp > timeout]
+            for conn in idle:
+                self._seen[conn] = None
+        for conn in idle:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if idle:
+            metrics.reaped_total.inc(amount=len(idle))
+        return len(idle)
+
+    def __len__(self):
+        return len(self._seen)
+
+
+#: Open connections of the process.
+connections = Connections()
+
+
+def _reap_forever(interval):
+    while True:
+        time.sleep(interval)
+        connections.reap()
+
+
+def start_reaper(interval=REAP_INTERVAL):
+    """Start the reaper thread of :data:`connections`, once per process."""
+    global _reaper
+    with _reaper_lock:
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap_forever, args=(interval,),
+                                       name='reaper', daemon=True)
+            _reaper.start()
+
+
+def refuse(conn):
+    """Answer a connection beyond ``max_connections`` and close it."""
+    metrics.rejected_total.inc(('connections',))
+    try:
+        conn.setblocking(False)
+        conn.send(TOO_MANY_CONNECTIONS)
+    except OSError:
+        pass
+    conn.close()
+
+
+def configure(header=None, body=None, write=None, idle=None, max_connections=None):
+    """
+    Change the deadlines and the connection limit; None keeps a value.
+
+    :params header (float): seconds to receive the request headers.
+    :params body (float): seconds to receive the request body.
+    :params write (float): seconds to send the response.
+    :params idle (float): seconds a connection may wait for its request head
+                          without receiving a byte.
+    :params max_connections (int): open connections at most.
+    """
+    global header_timeout, body_timeout, write_timeout, idle_timeout
+    if header is not None:
+        header_timeout = header
+    if body is not None:
+        body_timeout = body
+    if write is not None:
+        write_timeout = write
+    if idle is not None:
+        idle_timeout = idle
+    if max_connections is not None:
+        connections.max_connections = max_connections
@@ -0,0 +1,227 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.tls
+~~~~~~~~~~~~~~~~~
+
+This module terminates TLS in front of the proxy with the stdlib :mod:`ssl`
+module. Every host block of ``proxy.conf`` may name its own certificate::
+
+    host "app1.local" {
+        ssl_certificate     config/certs/app1.local.crt;
+        ssl_certificate_key config/certs/app1.local.key;
+        proxy_pass http://127.0.0.1:9001;
+    }
+
+The certificate is chosen during the handshake from the SNI server name with
+the same host matching as the routing table (exact name, ``*.domain``
+wildcard, default server). Clients sending no SNI, or naming a host without
+a certificate, get the certificate of the default server, or of the first
+host that has one.
+
+Repeat clients resume their session instead of doing a full handshake: each
+certificate keeps one :class:`ssl.SSLContext` for the life of the process,
+so its session cache and session ticket keys stay valid. A context is only
+rebuilt when its certificate or key file changes on disk. ALPN offers
+``http/1.1``; the backends behind the proxy stay plaintext.
+
+For local testing a self-signed certificate can be made with::
+
+  $ openssl req -x509 -newkey rsa:2048 -nodes -days 30 -subj /CN=app1.local \
+        -addext subjectAltName=DNS:app1.local \
+        -keyout config/certs/app1.local.key -out config/certs/app1.local.crt
+
+or with :func:`make_self_signed`.
+
+Usage::
+
+  >>> contexts = TLSContexts(lambda: table)
+  >>> conn = contexts.wrap(conn)
+  >>> conn.do_handshake()
+  >>> contexts.record(conn)
+"""
+
+import os
+import ssl
+import subprocess
+import threading
+
+from . import log
+
+#: Seconds a client may take to complete the TLS handshake.
+HANDSHAKE_TIMEOUT = 10.0
+
+#: Protocols offered with ALPN, in order of preference.
+ALPN_PROTOCOLS = ('http/1.1',)
+
+#: TLS 1.3 session tickets sent after each full handshake.
+SESSION_TICKETS = 2
+
+
+def make_self_signed(hostname, certfile, keyfile, days=30):
+    """
+    Write a self-signed certificate and its key for ``hostname`` with the
+    ``openssl`` command line tool.
+
+    :param hostname (str): subject and DNS subjectAltName of the certificate.
+    :param certfile (str): path of the PEM certificate to write.
+    :param keyfile (str): path of the PEM private key to write.
+    :param days (int): validity of the certificate.
+    :raises subprocess.CalledProcessError: if openssl fails.
+    """
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+         '-days', str(days), '-subj', '/CN={}'.format(hostname),
+         '-addext', 'subjectAltName=DNS:{}'.format(hostname),
+         '-keyout', keyfile, '-out', certfile],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _certificate_of(vhost):
+    """(certfile, keyfile) of a virtual host, or None without certificate."""
+    options = vhost.root.options
+    certfile = options.get('ssl_certificate')
+    if not certfile:
+        return None
+    return certfile, options.get('ssl_certificate_key') or certfile
+
+
+class TLSContexts:
+    """
+    Server side TLS contexts of the proxy, one per certificate.
+
+    :attrs table (callable): returns the routing table in use.
+    :attrs stats (dict): handshake counters: ``handshakes``, ``resumed``,
+                         ``failed``, and ``alpn`` / ``versions`` /
+                         ``server_names`` dicts of counts.
+    """
+
+    def __init__(self, table):
+        """
+        :param table (callable): returns the current
+                                 :class:`RoutingTable <RoutingTable>`.
+        """
+        self.table = table
+        self.lock = threading.Lock()
+        self._contexts = {}
+        self.stats = {
+            "handshakes": 0, "resumed": 0, "failed": 0,
+            "alpn": {}, "versions": {}, "server_names": {},
+        }
+
+    def context_for(self, certfile, keyfile):
+        """
+        Return the context serving ``certfile``, built on first use and
+        rebuilt only when one of the files changed.
+
+        :rtype ssl.SSLContext: server context with ALPN and SNI set up.
+        :raises OSError, ssl.SSLError: if the files cannot be loaded.
+        """
+        stamp = (os.stat(certfile).st_mtime_ns, os.stat(keyfile).st_mtime_ns)
+        key = (certfile, keyfile)
+        with self.lock:
+            cached = self._contexts.get(key)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.minimum_version = ssl.TLSVersion.TLSv1_2
+        context.load_cert_chain(certfile, keyfile)
+        context.set_alpn_protocols(list(ALPN_PROTOCOLS))
+        context.num_tickets = SESSION_TICKETS
+        context.sni_callback = self._select
+        with self.lock:
+            self._contexts[key] = (stamp, context)
+        return context
+
+    def default_certificate(self, table=None):
+        """
+        Certificate served without (matching) SNI: the default server's, or
+        the first host with one.
+
+        :rtype tuple: (certfile, keyfile).
+        :raises ValueError: if no host has a certificate.
+        """
+        table = table or self.table()
+        found = _certificate_of(table.default)
+        if found:
+            return found
+        for vhost in list(table.routes.values()) + list(table.wildcards.values()):
+            found = _certificate_of(vhost)
+            if found:
+                return found
+        raise ValueError("No host of proxy.conf has an ssl_certificate")
+
+    def default_context(self):
+        """Context a new TLS connection starts its handshake with."""
+        return self.context_for(*self.default_certificate())
+
+    def _select(self, sslobj, server_name, initial):
+        """SNI callback: switch to the context of the named host."""
+        try:
+            found = _certificate_of(self.table().find_host(server_name or ''))
+            if found:
+                context = self.context_for(*found)
+                if context is not initial:
+                    sslobj.context = context
+        except (OSError, ssl.SSLError, ValueError) as e:
+            log.sampled(log.WARNING, "[TLS] No certificate for {}: {}", server_name, e)
+            return ssl.ALERT_DESCRIPTION_INTERNAL_ERROR
+        with self.lock:
+            names = self.stats["server_names"]
+            names[server_name] = names.get(server_name, 0) + 1
+        return None
+
+    def wrap(self, sock):
+        """
+        Wrap an accepted connection; the handshake is left to the caller's
+        thread (``do_handshake``) so a slow client never blocks accept.
+
+        :rtype ssl.SSLSocket: server side TLS socket.
+        """
+        return self.default_context().wrap_socket(
+            sock, server_side=True, do_handshake_on_connect=False)
+
+    def record(self, conn):
+        """
+        Count a completed handshake.
+
+        :param conn (ssl.SSLSocket or ssl.SSLObject): handshaken connection.
+        """
+        alpn = conn.selected_alpn_protocol() or 'none'
+        version = conn.version()
+        with self.lock:
+            self.stats["handshakes"] += 1
+            if conn.session_reused:
+                self.stats["resumed"] += 1
+            self.stats["alpn"][alpn] = self.stats["alpn"].get(alpn, 0) + 1
+            self.stats["versions"][version] = self.stats["versions"].get(version, 0) + 1
+
+    def failed(self):
+        """Count a handshake that did not complete."""
+        with self.lock:
+            self.stats["failed"] += 1
+
+    def snapshot(self):
+        """
+        Return a copy of the handshake counters and the OpenSSL session
+        cache statistics of every context.
+
+        :rtype dict: counters plus ``"sessions"``: certfile -> stats.
+        """
+        with self.lock:
+            result = {name: dict(value) if isinstance(value, dict) else value
+                      for name, value in self.stats.items()}
+            contexts = [(key[0], entry[1]) for key, entry in self._contexts.items()]
+        result["sessions"] = {certfile: context.session_stats()
+                              for certfile, context in contexts}
+        return result
@@ -0,0 +1,351 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.trace
+~~~~~~~~~~~~~~~~~
+
+This module records request spans across the proxy, the backends, the
+tracker and the peers, so one slow request can be followed from process to
+process.
+
+A trace is identified by a 128-bit trace id, each timed step by a 64-bit
+span id. They travel between processes in the W3C :data:`TRACE_HEADER`
+header (``00-<trace id>-<span id>-<flags>``): the proxy adds it to the
+requests it forwards, a backend adopts it as the parent of its own spans,
+and a peer adds it to its tracker calls.
+
+The current span is kept in a :mod:`contextvars` variable, so nested
+``with span(...)`` blocks form a tree in the threaded servers as well as in
+the asyncio proxy.
+
+Every process writes its spans to ``<dir>/trace-<program>-<pid>.json`` in
+the Chrome trace event format (complete ``X`` events, timestamps in
+microseconds of the wall clock), which ``chrome://tracing`` or Perfetto
+open directly; the ids are kept in the ``args`` of every event to join the
+files of several processes. Events are buffered and written by a
+background thread every :data:`FLUSH_INTERVAL` seconds and at exit.
+
+Tracing is off unless :data:`TRACE_DIR_ENV` or :func:`configure` names a
+directory; :func:`span` then returns a shared no-op object and the
+propagation header is neither added nor changed.
+
+Usage::
+
+  >>> from daemon import trace
+  >>> trace.configure('/tmp/traces')
+  >>> with trace.span('backend GET', parent=headers.get(trace.TRACE_HEADER)):
+  ...     with trace.span('hook', route='/login'):
+  ...         pass
+"""
+
+import atexit
+import collections
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+#: Propagation header, in the W3C trace context format.
+TRACE_HEADER = 'traceparent'
+
+#: Environment variable naming the directory of the trace files.
+TRACE_DIR_ENV = 'WEAPROUS_TRACE_DIR'
+
+#: Environment variable holding the fraction of new traces recorded.
+TRACE_SAMPLE_ENV = 'WEAPROUS_TRACE_SAMPLE'
+
+#: Seconds between two writes of the buffered events.
+FLUSH_INTERVAL = 1.0
+
+#: Events buffered at most; later ones are dropped until the next write.
+MAX_PENDING = 100000
+
+#: Directory of the trace files, None when tracing is off.
+trace_dir = os.environ.get(TRACE_DIR_ENV) or None
+
+#: Fraction of the traces started here that are recorded.
+sample_ratio = float(os.environ.get(TRACE_SAMPLE_ENV) or 1.0)
+
+_current = contextvars.ContextVar('weaprous_span', default=None)
+_random = random.Random()
+# Wall clock time at perf_counter() == 0, in microseconds: spans are timed
+# with the monotonic counter and placed on the shared wall clock.
+_epoch_us = time.time() * 1e6 - time.perf_counter() * 1e6
+_pending = collections.deque()
+_lock = threading.Lock()
+_writer = None
+_file = None
+_path = None
+_name = None
+
+
+def configure(directory=None, sample=None):
+    """
+    Turn tracing on for this process.
+
+    :params directory (str): directory of the trace file, created if needed.
+    :params sample (float): fraction of new traces recorded, 1 by default.
+    """
+    global trace_dir, sample_ratio
+    if directory is not None:
+        trace_dir = directory
+    if sample is not None:
+        sample_ratio = sample
+
+
+def enabled():
+    """Whether spans are recorded in this process."""
+    return trace_dir is not None
+
+
+def parse_traceparent(value):
+    """
+    Split a :data:`TRACE_HEADER` value.
+
+    :rtype tuple: (trace_id, span_id, sampled), or None when malformed.
+    """
+    if not value:
+        return None
+    parts = value.strip().split('-')
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if parts[1] == '0' * 32 or parts[2] == '0' * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class Span:
+    """
+    One timed step of a trace, made current while its ``with`` block runs.
+
+    :attrs name (str): step name, e.g. ``parse`` or ``send_http_request``.
+    :attrs trace_id (str): 32 hex digits shared by the whole trace.
+    :attrs span_id (str): 16 hex digits of this span.
+    :attrs parent_id (str): span id of the parent, None for a root.
+    :attrs sampled (bool): whether the trace is written.
+    :attrs args (dict): attributes written with the event.
+    """
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'sampled',
+                 'args', 'start', '_token')
+
+    def __init__(self, name, trace_id, parent_id, sampled, args):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = '{:016x}'.format(_random.getrandbits(64) or 1)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.args = args
+        self.start = None
+        self._token = None
+
+    def traceparent(self):
+        """The :data:`TRACE_HEADER` value making this span the parent."""
+        return '00-{}-{}-{}'.format(self.trace_id, self.span_id,
+                                    '01' if self.sampled else '00')
+
+    def set(self, key, value):
+        """Attach one attribute to the span."""
+        self.args[key] = value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        if self.sampled:
+            _record(self, self.start, time.perf_counter())
+        return False
+
+
+class _NoSpan:
+    """Stand-in returned while tracing is off."""
+
+    __slots__ = ()
+
+    def traceparent(self):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def current():
+    """The innermost open span of this thread or task, or None."""
+    return _current.get()
+
+
+def span(name, parent=None, **args):
+    """
+    Open a span, child of ``parent`` or of the current span, or the root of
+    a new trace.
+
+    :params name (str): step name.
+    :params parent (str): :data:`TRACE_HEADER` value received from another
+                          process; it takes precedence over the current span.
+    :params args: attributes of the span.
+
+    :rtype Span: context manager, a no-op one when tracing is off.
+    """
+    if trace_dir is None:
+        return _NO_SPAN
+    context = parse_traceparent(parent) if parent else None
+    if context is not None:
+        trace_id, parent_id, sampled = context
+    else:
+        outer = _current.get()
+        if outer is not None:
+            trace_id, parent_id, sampled = outer.trace_id, outer.span_id, outer.sampled
+        else:
+            trace_id = '{:032x}'.format(_random.getrandbits(128) or 1)
+            parent_id = None
+            sampled = sample_ratio >= 1.0 or _random.random() < sample_ratio
+    return Span(name, trace_id, parent_id, sampled, args)
+
+
+def traced(name):
+    """
+    Decorator running the function inside a span called ``name``; a direct
+    call while tracing is off.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if trace_dir is None:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record(name, start, end, **args):
+    """
+    Record an already timed step as a child of the current span, e.g. the
+    parsing that revealed the parent of that span.
+
+    :params start (float): :func:`time.perf_counter` at the start.
+    :params end (float): :func:`time.perf_counter` at the end.
+    """
+    outer = _current.get()
+    if trace_dir is None or outer is None or not outer.sampled:
+        return
+    child = Span(name, outer.trace_id, outer.span_id, True, args)
+    _record(child, start, end)
+
+
+def traceparent():
+    """The :data:`TRACE_HEADER` value of the current span, or None."""
+    outer = _current.get()
+    return outer.traceparent() if outer is not None else None
+
+
+def _record(item, start, end):
+    if len(_pending) >= MAX_PENDING:
+        return
+    args = dict(item.args, trace_id=item.trace_id, span_id=item.span_id)
+    if item.parent_id:
+        args['parent_id'] = item.parent_id
+    _pending.append({
+        "name": item.name,
+        "cat": _program(),
+        "ph": "X",
+        "ts": round(_epoch_us + start * 1e6, 1),
+        "dur": round((end - start) * 1e6, 1),
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": args,
+    })
+    if _writer is None:
+        _start()
+
+
+def _program():
+    global _name
+    if _name is None:
+        _name = os.path.splitext(os.path.basename(sys.argv[0] or ''))[0] or 'python'
+    return _name
+
+
+def trace_path():
+    """Path of the trace file of this process, None when tracing is off."""
+    if trace_dir is None:
+        return None
+    return os.path.join(trace_dir, 'trace-{}-{}.json'.format(_program(), os.getpid()))
+
+
+def _start():
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name='trace-writer', daemon=True)
+            _writer.start()
+
+
+def _run():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+def flush():
+    """
+    Append the buffered events to the trace file. The file is a JSON array
+    left open, as the trace event format allows, so it stays valid for the
+    viewers while the process runs.
+    """
+    global _file, _path
+    with _lock:
+        if not _pending:
+            return
+        try:
+            path = trace_path()
+            if _file is None or path != _path:
+                os.makedirs(trace_dir, exist_ok=True)
+                _file = open(path, 'w', encoding='utf-8')
+                _path = path
+                _file.write('[' + json.dumps({
+                    "name": "process_name", "ph": "M", "pid": os.getpid(),
+                    "args": {"name": '{} {}'.format(_program(), os.getpid())},
+                }))
+            while _pending:
+                _file.write(',\n' + json.dumps(_pending.popleft(), default=str))
+            _file.flush()
+        except (OSError, ValueError) as e:
+            _pending.clear()
+            print("[Trace] cannot write {}: {}".format(trace_path(), e))
+
+
+atexit.register(flush)
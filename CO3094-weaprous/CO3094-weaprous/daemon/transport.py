@@ -0,0 +1,433 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.transport
+~~~~~~~~~~~~~~~~~
+
+This module provides the transports the servers listen and connect on.
+
+A transport makes listeners (``listen``) and connections (``socket`` then
+``connect``, or ``connect`` at once) that follow the subset of the
+:class:`socket.socket` interface the daemons use: ``accept``, ``recv``,
+``send``, ``sendall``, ``settimeout``, ``shutdown``, ``close``, with
+:class:`socket.timeout` and :class:`OSError` subclasses as errors.
+
+- :data:`TCP` (:class:`TCPTransport`) is the default: real sockets, the
+  listeners registered for handoff (see :mod:`daemon.handoff`).
+- :class:`MemoryTransport` connects the listeners and connections of one
+  process through in-memory pipes, with an optional one-way ``latency``,
+  ``bandwidth`` and segment ``loss``. A lost segment is delivered again
+  after ``rto`` seconds, like a TCP retransmission, so the stream stays
+  intact and loss shows as latency. With a ``seed`` the losses repeat
+  from run to run.
+
+The backend (:func:`create_backend <daemon.backend.create_backend>`), the
+``thread`` engine of the proxy (:func:`create_proxy
+<daemon.proxy.create_proxy>`) and the P2P links of ``peer.py`` take a
+transport. In-memory connections have no file descriptor: upgrade tunnels,
+TLS and the ``asyncio`` engine need TCP.
+
+Usage::
+
+  >>> net = MemoryTransport(latency=0.002, bandwidth=10e6, loss=0.01, seed=1)
+  >>> threading.Thread(target=create_backend,
+  ...                  args=('10.0.0.1', 9001, app.routes, None, net)).start()
+  >>> threading.Thread(target=create_proxy, args=('10.0.0.1', 8080, routes),
+  ...                  kwargs={'transport': net}).start()
+  >>> conn = net.connect('10.0.0.1', 8080, timeout=5)
+"""
+
+import collections
+import itertools
+import random
+import socket
+import threading
+import time
+
+from . import handoff
+
+#: Bytes of one segment of an in-memory pipe, the unit of loss.
+SEGMENT_SIZE = 16384
+
+#: Default seconds before a lost segment is delivered again.
+RETRANSMIT_TIMEOUT = 0.2
+
+#: Default pending connections of an in-memory listener.
+BACKLOG = 50
+
+
+class TCPTransport:
+    """Real TCP and Unix domain sockets."""
+
+    name = 'tcp'
+
+    def listen(self, ip, port, backlog=BACKLOG):
+        """
+        Listening socket on ``ip:port``, inherited on a restart when the
+        previous process handed it over.
+
+        :rtype socket.socket: listening socket.
+        """
+        return handoff.listen_socket('{}:{}'.format(ip, port),
+                                     lambda: handoff.tcp_socket(ip, port), backlog)
+
+    def socket(self, host, port):
+        """
+        Unconnected socket for ``host:port``, or for the Unix domain socket
+        ``host`` when ``port`` is None.
+
+        :rtype tuple: (socket, address to pass to ``connect``).
+        """
+        if port is None:
+            return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM), host
+        return socket.socket(socket.AF_INET, socket.SOCK_STREAM), (host, port)
+
+    def connect(self, host, port, timeout=None):
+        """
+        Connection to ``host:port``.
+
+        :raises OSError: when the connection fails.
+        """
+        sock, address = self.socket(host, port)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+
+#: The default transport.
+TCP = TCPTransport()
+
+
+class _Pipe:
+    """One direction of an in-memory connection."""
+
+    def __init__(self, network):
+        self.network = network
+        self.ready = threading.Condition()
+        self.segments = collections.deque()
+        self.closed = False
+        self.reader_gone = False
+        self.free_at = 0.0
+        self.last_delivery = 0.0
+
+    def write(self, data):
+        with self.ready:
+            if self.reader_gone:
+                raise BrokenPipeError("connection reset by peer")
+            if self.closed:
+                raise BrokenPipeError("connection shut down for writing")
+            now = time.monotonic()
+            for start in range(0, len(data), SEGMENT_SIZE):
+                segment = data[start:start + SEGMENT_SIZE]
+                delivery = self.network.schedule(self, now, len(segment))
+                # In order, like a TCP stream: a late segment holds the others.
+                self.last_delivery = max(self.last_delivery, delivery)
+                self.segments.append([self.last_delivery, segment])
+            self.ready.notify_all()
+
+    def read(self, size, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.ready:
+            while True:
+                now = time.monotonic()
+                if self.segments and self.segments[0][0] <= now:
+                    break
+                if self.reader_gone or (self.closed and not self.segments):
+                    return b''
+                wait = self.segments[0][0] - now if self.segments else None
+                if deadline is not None:
+                    left = deadline - now
+                    if left <= 0:
+                        raise socket.timeout("timed out")
+                    wait = left if wait is None else min(wait, left)
+                self.ready.wait(wait)
+            chunks = []
+            while size > 0 and self.segments and self.segments[0][0] <= now:
+                entry = self.segments[0]
+                chunk = entry[1][:size]
+                if len(chunk) == len(entry[1]):
+                    self.segments.popleft()
+                else:
+                    entry[1] = entry[1][size:]
+                chunks.append(chunk)
+                size -= len(chunk)
+            return b''.join(chunks)
+
+    def close_writer(self):
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+
+    def close_reader(self):
+        with self.ready:
+            self.reader_gone = True
+            self.segments.clear()
+            self.ready.notify_all()
+
+
+class MemoryConnection:
+    """
+    One end of an in-memory connection, see :class:`MemoryTransport`.
+
+    :attrs local (tuple): (ip, port) of this end.
+    :attrs remote (tuple): (ip, port) of the other end, None until connected.
+    """
+
+    def __init__(self, network, local=None):
+        self.network = network
+        self.local = local
+        self.remote = None
+        self.timeout = None
+        self.incoming = None
+        self.outgoing = None
+
+    def _attach(self, remote, incoming, outgoing):
+        self.remote = remote
+        self.incoming = incoming
+        self.outgoing = outgoing
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def gettimeout(self):
+        return self.timeout
+
+    def setblocking(self, flag):
+        self.timeout = None if flag else 0.0
+
+    def setsockopt(self, *args):
+        pass
+
+    def fileno(self):
+        return -1
+
+    def getsockname(self):
+        return self.local
+
+    def getpeername(self):
+        if self.remote is None:
+            raise OSError("not connected")
+        return self.remote
+
+    def connect(self, address):
+        """
+        Connect to the listener at ``address``. Takes one round trip.
+
+        :raises ConnectionRefusedError: when nothing listens there or its
+                                        backlog is full.
+        :raises socket.timeout: when the round trip exceeds the timeout.
+        """
+        self.network.open(self, address)
+
+    def recv(self, size):
+        if self.incoming is None:
+            raise OSError("not connected")
+        return self.incoming.read(size, self.timeout)
+
+    def send(self, data):
+        self.sendall(data)
+        return len(data)
+
+    def sendall(self, data):
+        if self.outgoing is None:
+            raise OSError("not connected")
+        self.outgoing.write(bytes(data))
+
+    def shutdown(self, how):
+        if self.outgoing is None:
+            return
+        if how in (socket.SHUT_WR, socket.SHUT_RDWR):
+            self.outgoing.close_writer()
+        if how in (socket.SHUT_RD, socket.SHUT_RDWR):
+            self.incoming.close_reader()
+
+    def close(self):
+        if self.outgoing is not None:
+            self.outgoing.close_writer()
+            self.incoming.close_reader()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryListener:
+    """Listener of a :class:`MemoryTransport` at one address."""
+
+    def __init__(self, network, address, backlog):
+        self.network = network
+        self.address = address
+        self.backlog = backlog
+        self.pending = collections.deque()
+        self.ready = threading.Condition()
+        # Accept loops wake up regularly to notice that they must stop.
+        self.timeout = handoff.ACCEPT_POLL
+        self.closed = False
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def getsockname(self):
+        return self.address
+
+    def fileno(self):
+        return -1
+
+    def offer(self, conn):
+        with self.ready:
+            if self.closed or len(self.pending) >= self.backlog:
+                return False
+            self.pending.append(conn)
+            self.ready.notify()
+            return True
+
+    def accept(self):
+        """
+        Next pending connection.
+
+        :rtype tuple: (connection, client address).
+        :raises socket.timeout: when none arrives within the timeout.
+        """
+        with self.ready:
+            if not self.ready.wait_for(lambda: self.pending or self.closed, self.timeout):
+                raise socket.timeout("timed out")
+            if self.closed:
+                raise OSError("listener closed")
+            conn = self.pending.popleft()
+        return conn, conn.remote
+
+    def close(self):
+        with self.ready:
+            self.closed = True
+            pending, self.pending = list(self.pending), collections.deque()
+            self.ready.notify_all()
+        self.network.unregister(self)
+        for conn in pending:
+            conn.close()
+
+
+class MemoryTransport:
+    """
+    In-process network of listeners and connections.
+
+    :attrs latency (float): one-way delay of every segment in seconds.
+    :attrs bandwidth (float): bytes per second of each direction of a
+                              connection, None for unlimited.
+    :attrs loss (float): probability that a segment is lost and delivered
+                         again after ``rto`` seconds.
+    :attrs rto (float): retransmission delay of a lost segment.
+    :attrs stats (dict): connections, refused connections, segments, lost
+                         segments and bytes.
+    """
+
+    name = 'memory'
+
+    def __init__(self, latency=0.0, bandwidth=None, loss=0.0,
+                 rto=RETRANSMIT_TIMEOUT, seed=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.loss = loss
+        self.rto = rto
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.listeners = {}
+        self.ports = itertools.count(40000)
+        self.stats = collections.Counter()
+
+    def listen(self, ip, port, backlog=BACKLOG):
+        """
+        Listener at ``(ip, port)``.
+
+        :raises OSError: when the address is in use.
+        """
+        address = (ip, port)
+        with self.lock:
+            if address in self.listeners:
+                raise OSError("address {}:{} already in use".format(ip, port))
+            listener = self.listeners[address] = MemoryListener(self, address, backlog)
+        return listener
+
+    def unregister(self, listener):
+        with self.lock:
+            if self.listeners.get(listener.address) is listener:
+                del self.listeners[listener.address]
+
+    def socket(self, host, port):
+        """
+        Unconnected connection for ``host:port``.
+
+        :rtype tuple: (connection, address to pass to ``connect``).
+        """
+        return MemoryConnection(self), (host, port)
+
+    def connect(self, host, port, timeout=None):
+        """
+        Connection to the listener at ``(host, port)``.
+
+        :raises ConnectionRefusedError: when nothing listens there or its
+                                        backlog is full.
+        :raises socket.timeout: when the round trip exceeds ``timeout``.
+        """
+        conn, address = self.socket(host, port)
+        conn.settimeout(timeout)
+        conn.connect(address)
+        return conn
+
+    def open(self, conn, address):
+        """Connect ``conn`` to ``address``, see :meth:`MemoryConnection.connect`."""
+        with self.lock:
+            listener = self.listeners.get(tuple(address))
+            local = ('127.0.0.1', next(self.ports))
+        handshake = 2 * self.latency
+        if conn.timeout is not None and handshake > conn.timeout:
+            time.sleep(conn.timeout)
+            raise socket.timeout("timed out")
+        if handshake:
+            time.sleep(handshake)
+        if listener is None:
+            self._count('refused')
+            raise ConnectionRefusedError("connection refused by {}".format(address))
+        upstream, downstream = _Pipe(self), _Pipe(self)
+        server = MemoryConnection(self, listener.address)
+        server._attach(local, upstream, downstream)
+        if not listener.offer(server):
+            self._count('refused')
+            raise ConnectionRefusedError("connection refused by {}".format(address))
+        conn.local = local
+        conn._attach(listener.address, downstream, upstream)
+        self._count('connections')
+
+    def schedule(self, pipe, now, size):
+        """Delivery time of a segment of ``size`` bytes written at ``now``."""
+        start = max(now, pipe.free_at)
+        if self.bandwidth:
+            start += size / float(self.bandwidth)
+        pipe.free_at = start
+        delivery = start + self.latency
+        with self.lock:
+            self.stats['segments'] += 1
+            self.stats['bytes'] += size
+            if self.loss and self.rng.random() < self.loss:
+                self.stats['lost'] += 1
+                delivery += self.rto
+        return delivery
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
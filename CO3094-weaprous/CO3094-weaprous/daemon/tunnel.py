@@ -0,0 +1,160 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.tunnel
+~~~~~~~~~~~~~~~~~
+
+This module carries ``Connection: Upgrade`` exchanges (WebSocket and other
+upgraded protocols) through the proxy. Once the upgrade request is sent, the
+proxy stops interpreting bytes and relays both directions of a full-duplex
+byte tunnel until each side has closed or the tunnel stays idle for too long.
+
+:class:`TunnelStats <TunnelStats>` keeps per-upstream counters of open and
+finished tunnels, idle timeouts and relayed bytes.
+
+Usage::
+
+  >>> if is_upgrade(fields):
+  >>>     relay(client_sock, upstream_sock, idle_timeout=300)
+"""
+
+import selectors
+import socket
+import threading
+
+#: Seconds a tunnel may stay without traffic before it is closed.
+TUNNEL_IDLE_TIMEOUT = 300.0
+
+#: Size of one relayed read.
+RELAY_SIZE = 65536
+
+
+def is_upgrade(fields):
+    """
+    Whether a request asks for a protocol upgrade.
+
+    :params fields (dict): lower-case request headers.
+    """
+    if 'upgrade' not in fields:
+        return False
+    tokens = {t.strip().lower() for t in fields.get('connection', '').split(',')}
+    return 'upgrade' in tokens
+
+
+class TunnelStats:
+    """
+    Lock-protected tunnel counters per upstream.
+
+    :attrs active (dict): upstream -> open tunnels.
+    :attrs total (dict): upstream -> tunnels ever opened.
+    :attrs idle_closed (dict): upstream -> tunnels closed by idle timeout.
+    :attrs bytes (dict): upstream -> bytes relayed in both directions.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}
+        self.total = {}
+        self.idle_closed = {}
+        self.bytes = {}
+
+    def opened(self, upstream):
+        """Count a new tunnel to ``upstream``."""
+        with self.lock:
+            self.active[upstream] = self.active.get(upstream, 0) + 1
+            self.total[upstream] = self.total.get(upstream, 0) + 1
+
+    def closed(self, upstream, relayed, idle):
+        """
+        Count the end of a tunnel to ``upstream``.
+
+        :param relayed (int): bytes relayed in both directions.
+        :param idle (bool): whether the idle timeout ended the tunnel.
+        """
+        with self.lock:
+            self.active[upstream] = max(0, self.active.get(upstream, 0) - 1)
+            self.bytes[upstream] = self.bytes.get(upstream, 0) + relayed
+            if idle:
+                self.idle_closed[upstream] = self.idle_closed.get(upstream, 0) + 1
+
+    def snapshot(self):
+        """
+        Return a copy of the counters.
+
+        :rtype dict: upstream -> {"active", "total", "idle_closed", "bytes"}.
+        """
+        with self.lock:
+            return {
+                name: {
+                    "active": self.active.get(name, 0),
+                    "total": self.total.get(name, 0),
+                    "idle_closed": self.idle_closed.get(name, 0),
+                    "bytes": self.bytes.get(name, 0),
+                }
+                for name in self.total
+            }
+
+
+def relay(client, upstream, idle_timeout=TUNNEL_IDLE_TIMEOUT):
+    """
+    Relay bytes between two connected sockets until both directions have
+    ended or nothing moved for ``idle_timeout`` seconds. A side reaching end
+    of stream is half-closed on the other side, so protocols relying on
+    half-close keep working. A side that stops reading ends the tunnel as
+    idle once a write to it has waited ``idle_timeout`` seconds.
+
+    :param client (socket.socket): client side of the tunnel.
+    :param upstream (socket.socket): upstream side of the tunnel.
+    :param idle_timeout (float): seconds without traffic before closing.
+
+    :rtype tuple: (relayed bytes, True when the idle timeout fired).
+    """
+    peers = {client: upstream, upstream: client}
+    relayed = 0
+    for sock in peers:
+        # Bounds the writes; reads only happen once the selector saw data.
+        sock.settimeout(idle_timeout)
+    with selectors.DefaultSelector() as selector:
+        for sock in peers:
+            selector.register(sock, selectors.EVENT_READ)
+        open_sides = 2
+        while open_sides:
+            # A TLS socket may hold decrypted bytes the selector cannot see.
+            buffered = [sock for sock in selector.get_map().values()
+                        if getattr(sock.fileobj, 'pending', None) and sock.fileobj.pending()]
+            events = [(key, None) for key in buffered] or selector.select(idle_timeout)
+            if not events:
+                return relayed, True
+            for key, _ in events:
+                source = key.fileobj
+                target = peers[source]
+                try:
+                    data = source.recv(RELAY_SIZE)
+                except (ConnectionError, OSError):
+                    data = b''
+                if data:
+                    try:
+                        target.sendall(data)
+                    except socket.timeout:
+                        return relayed, True
+                    except OSError:
+                        return relayed, False
+                    relayed += len(data)
+                    continue
+                selector.unregister(source)
+                open_sides -= 1
+                try:
+                    target.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+    return relayed, False
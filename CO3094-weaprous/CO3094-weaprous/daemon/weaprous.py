@@ -40,6 +40,9 @@ class WeApRous:
       >>> def hello(headers, body):
       >>>     return {'message': 'Hello, world!'}
 
+      >>> app.enable_metrics('/metrics')
+      >>> app.enable_profiler('/profile')
+      >>> app.enable_rate_limit(rate=20, routes={'/hello': (2, 5)}, max_in_flight=64)
       >>> app.run()
     """
 
@@ -52,17 +55,25 @@ class WeApRous:
         self.routes = {}
         self.ip = None
         self.port = None
+        self.unix_socket = None
+        self.transport = None
         return
 
-    def prepare_address(self, ip, port):
+    def prepare_address(self, ip, port, unix_socket=None, transport=None):
         """
         Configure the IP address and port for the backend server.
 
         :param ip (str): The IP address to bind the server.
         :param port (str): The port number to listen on.
+        :param unix_socket (str): Optional Unix domain socket path to listen on
+                                  instead, for a proxy on the same machine.
+        :param transport: Optional :mod:`transport <daemon.transport>` to
+                          listen on, TCP by default.
         """
         self.ip = ip
         self.port = port
+        self.unix_socket = unix_socket
+        self.transport = transport
 
     def route(self, path, methods=['GET']):
         """
@@ -71,6 +82,9 @@ class WeApRous:
         :param path (str): The URL path to route.
         :param methods (list): A list of HTTP methods (e.g., ['GET', 'POST']) to bind.
 
+        The handler returns a dict, sent as JSON, a str, sent as
+        ``text/plain``, or a ``(str, content_type)`` pair.
+
         :rtype: function - A decorator that registers the handler function.
         """
         def decorator(func):
@@ -84,6 +98,82 @@ class WeApRous:
             return func
         return decorator
 
+    def enable_metrics(self, path='/metrics'):
+        """
+        Serve the metrics of :mod:`daemon.metrics` in the Prometheus text
+        format on ``GET path``. Off unless called.
+
+        :param path (str): route of the metrics.
+        """
+        from . import metrics
+
+        @self.route(path, methods=['GET'])
+        def render_metrics(headers, body):
+            return metrics.REGISTRY.render(), metrics.CONTENT_TYPE
+
+    def enable_profiler(self, path='/profile', signal=True):
+        """
+        Profile the process on request (see :mod:`daemon.profiler`). Off
+        unless called.
+
+        ``GET path`` samples the stacks for the default duration;
+        ``POST path`` with a JSON body ``{"seconds": 5, "allocations": 10,
+        "format": "json"}`` chooses the duration, the number of top
+        allocating lines to report and a JSON answer instead of the
+        collapsed stacks. The request blocks while the profile runs.
+
+        :param path (str): route of the profiler.
+        :param signal (bool): also profile on SIGUSR1, writing the result to
+                              a file; must be called from the main thread.
+        """
+        from . import profiler
+
+        @self.route(path, methods=['GET', 'POST'])
+        def run_profiler(headers, body):
+            options = body if isinstance(body, dict) else {}
+            try:
+                result = profiler.profile(
+                    float(options.get('seconds', profiler.DEFAULT_SECONDS)),
+                    int(options.get('allocations', 0)))
+            except (ValueError, TypeError, profiler.ProfilerBusy) as e:
+                return {"error": str(e)}
+            if options.get('format') == 'json':
+                return result.to_dict()
+            return result.text()
+
+        if signal and profiler.install():
+            print("[Backend] SIGUSR1 profiles for {:g}s".format(profiler.DEFAULT_SECONDS))
+
+    def enable_rate_limit(self, rate=None, burst=None, routes=None, max_in_flight=None,
+                          max_queue=None, trusted_proxies=None):
+        """
+        Refuse the requests of a client over its rate with ``429 Too Many
+        Requests``, and every request with ``503 Service Unavailable`` while
+        the backend is overloaded (see :mod:`daemon.ratelimit`). Off unless
+        called.
+
+        :param rate (float): requests per second of a client IP, None for no limit.
+        :param burst (float): requests a client IP may send at once, ``rate``
+                              by default.
+        :param routes (dict): route path -> (rate, burst) per client IP, for
+                              the routes that are polled, e.g.
+                              ``{'/get-messages': (2, 5)}``.
+        :param max_in_flight (int): requests answered at the same time.
+        :param max_queue (int): accepted connections waiting for their turn.
+        :param trusted_proxies (list): addresses of the proxies in front of
+                                       the backend; their ``X-Forwarded-For``
+                                       names the client.
+        """
+        from . import ratelimit
+
+        for path in routes or {}:
+            if not any(route_path == path for _, route_path in self.routes):
+                raise ValueError("no route {} to limit".format(path))
+        ratelimit.configure(rate, burst, routes, max_in_flight, max_queue,
+                            trusted_proxies=trusted_proxies)
+        print("[Backend] rate limit {} per client, routes {}, {} in flight, {} queued".format(
+            rate, routes or {}, max_in_flight, max_queue))
+
     def run(self):
         """
         Start the backend server and begin handling requests.
@@ -93,9 +183,9 @@ class WeApRous:
 
         :raise: Error if IP or port has not been configured.
         """
-        if not self.ip or not self.port:
+        if not self.unix_socket and (not self.ip or not self.port):
             print("Rous app need to preapre address"
                   "by calling app.prepare_address(ip,port)")
 
-        create_backend(self.ip, self.port, self.routes)
+        create_backend(self.ip, self.port, self.routes, self.unix_socket, self.transport)
         
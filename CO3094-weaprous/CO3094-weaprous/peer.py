@@ -30,6 +30,8 @@ import argparse
 import threading
 import time
 
+from daemon import handoff, trace
+from daemon.transport import TCP
 from daemon.weaprous import WeApRous
 
 from daemon.request import Request
@@ -63,6 +65,9 @@ peers_info = {}
 my_channels = []  # List of channels this peer joined
 current_channel = None  # Current active channel
 
+# Transport of the P2P links, e.g. a MemoryTransport in simulations
+transport = TCP
+
 def register_to_tracker():
     """Register this peer to tracker server"""
     try:
@@ -112,8 +117,7 @@ def connect_to_peer(peer_ip, peer_port):
             return True
         
         # Create socket and connect
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((peer_ip, int(peer_port)))
+        sock = transport.connect(peer_ip, int(peer_port))
         
         # Store connection
         connected_peers[peer_id] = sock
@@ -345,16 +349,18 @@ def broadcast_message(message):
 
 def start_p2p_server():
     """Start P2P server to accept incoming peer connections"""
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server = None
     
     try:
-        server.bind((my_ip, my_p2p_port))
-        server.listen(10)
+        # Inherited from the previous process on a SIGUSR2 restart
+        server = transport.listen(my_ip, my_p2p_port, backlog=10)
         print(f"[P2P Server] Listening on {my_ip}:{my_p2p_port}")
         
         while True:
-            conn, addr = server.accept()
+            accepted = handoff.accept(server)
+            if accepted is None:
+                break
+            conn, addr = accepted
             peer_id = f"{addr[0]}:{addr[1]}"
             print(f"[P2P Server] Incoming connection from {peer_id}")
             
@@ -372,7 +378,8 @@ def start_p2p_server():
     except Exception as e:
         print(f"[P2P Server] Error: {e}")
     finally:
-        server.close()
+        if server is not None:
+            server.close()
 
 @app.route('/connect-peer', methods=['POST'])
 def connect(headers="guest", body="anonymous"):
@@ -718,6 +725,7 @@ def api_list_channels(headers, body):
 
     ###################################################################
 
+@trace.traced('send_http_request')
 def send_http_request(method, path, data=None):
     """Send HTTP request to tracker"""
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -731,6 +739,10 @@ def send_http_request(method, path, data=None):
         "Content-Type": "application/json",
         "Connection": "close"
     }
+    # Let the tracker spans join the trace of this call
+    traceparent = trace.traceparent()
+    if traceparent is not None:
+        req.headers[trace.TRACE_HEADER] = traceparent
     
     if data:
         req.prepare_body(data=None, files=None, json=data)  # FIX: json → json_data
@@ -872,6 +884,12 @@ if __name__ == "__main__":
     parser.add_argument('--username', default='Anonymous')
     parser.add_argument('--tracker-ip', default='127.0.0.1')
     parser.add_argument('--tracker-port', type=int, default=8000)
+    parser.add_argument('--rate-limit', type=float, default=None,
+        help='Requests per second of a client IP; 429 beyond it.')
+    parser.add_argument('--max-in-flight', type=int, default=None,
+        help='Requests answered at the same time; 503 beyond it.')
+    parser.add_argument('--poll-limit', type=float, default=None,
+        help='Polls of /get-messages per second of a client IP; 429 beyond it.')
  
     args = parser.parse_args()
     
@@ -899,5 +917,9 @@ if __name__ == "__main__":
     print(f"[Peer] Found {len(peers_info)} peers (not connected yet)")
     
     # Start API server
+    if args.rate_limit or args.poll_limit or args.max_in_flight:
+        polls = {'/get-messages': (args.poll_limit, None)} if args.poll_limit else None
+        app.enable_rate_limit(rate=args.rate_limit, routes=polls,
+                              max_in_flight=args.max_in_flight)
     app.prepare_address(my_ip, args.server_port)
     app.run()
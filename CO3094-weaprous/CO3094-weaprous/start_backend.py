@@ -25,7 +25,7 @@ server's IP address and port, and then launches the backend server.
 import socket
 import argparse
 
-from daemon import create_backend
+from daemon import create_backend, log, timeouts, trace
 
 # Default port number used if none is specified via command-line arguments.
 PORT = 8080 
@@ -40,6 +40,15 @@ if __name__ == "__main__":
 
     :arg --server-ip (str): IP address to bind the server (default: 127.0.0.1).
     :arg --server-port (int): Port number to bind the server (default: 9000).
+    :arg --unix-socket (str): Unix domain socket path to listen on instead.
+    :arg --log-level (str): ``debug``, ``info`` (default), ``warning`` or ``error``.
+    :arg --access-log (str): Optional access log path, ``-`` for stdout.
+    :arg --trace-dir (str): Optional directory of the trace file of this process.
+    :arg --max-connections (int): Open connections at most, refused with 503 beyond.
+    :arg --header-timeout (float): Seconds for a client to send its request headers.
+    :arg --body-timeout (float): Seconds for a client to send its request body.
+    :arg --write-timeout (float): Seconds for a client to read the response.
+    :arg --idle-timeout (float): Seconds a connection may wait idle for its request.
     """
 
     parser = argparse.ArgumentParser(
@@ -58,9 +67,70 @@ if __name__ == "__main__":
         default=PORT,
         help='Port number to bind the server. Default is {}.'.format(PORT)
     )
+    parser.add_argument(
+        '--unix-socket',
+        type=str,
+        default=None,
+        help='Listen on this Unix domain socket path instead of IP and port.'
+    )
+    parser.add_argument(
+        '--log-level',
+        choices=sorted(log.LEVEL_NAMES),
+        default=None,
+        help='Log level, debug shows every request. Default is info.'
+    )
+    parser.add_argument(
+        '--access-log',
+        default=None,
+        help='Write one JSON access record per request to this file, - for stdout.'
+    )
+    parser.add_argument(
+        '--trace-dir',
+        default=None,
+        help='Record request spans to a Chrome trace file in this directory.'
+    )
+    parser.add_argument(
+        '--max-connections',
+        type=int,
+        default=timeouts.MAX_CONNECTIONS,
+        help='Open connections at most. Default is {}.'.format(timeouts.MAX_CONNECTIONS)
+    )
+    parser.add_argument(
+        '--header-timeout',
+        type=float,
+        default=timeouts.HEADER_TIMEOUT,
+        help='Seconds for a client to send its request headers. Default is {:g}.'.format(
+            timeouts.HEADER_TIMEOUT)
+    )
+    parser.add_argument(
+        '--body-timeout',
+        type=float,
+        default=timeouts.BODY_TIMEOUT,
+        help='Seconds for a client to send its request body. Default is {:g}.'.format(
+            timeouts.BODY_TIMEOUT)
+    )
+    parser.add_argument(
+        '--write-timeout',
+        type=float,
+        default=timeouts.WRITE_TIMEOUT,
+        help='Seconds for a client to read the response. Default is {:g}.'.format(
+            timeouts.WRITE_TIMEOUT)
+    )
+    parser.add_argument(
+        '--idle-timeout',
+        type=float,
+        default=timeouts.IDLE_TIMEOUT,
+        help='Seconds a connection may wait idle for its request. Default is {:g}.'.format(
+            timeouts.IDLE_TIMEOUT)
+    )
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
+    log.configure(level=args.log_level, access_log=args.access_log)
+    trace.configure(args.trace_dir)
+    timeouts.configure(header=args.header_timeout, body=args.body_timeout,
+                       write=args.write_timeout, idle=args.idle_timeout,
+                       max_connections=args.max_connections)
 
-    create_backend(ip, port)
+    create_backend(ip, port, unix_socket=args.unix_socket)
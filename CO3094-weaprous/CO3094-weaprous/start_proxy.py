@@ -33,6 +33,12 @@ Requirements:
 - urlparse: parses URLs to extract host and port information.
 - daemon.create_proxy: initializes and starts the proxy server.
 
+Signals:
+--------------
+- SIGHUP: reload ``config/proxy.conf``.
+- SIGUSR2: start a new proxy process on the same listening sockets, then drain this one.
+- SIGTERM: stop accepting and exit once the connections in progress are served.
+
 """
 
 import socket
@@ -42,45 +48,240 @@ import re
 from  urllib.parse import urlparse
 from collections import defaultdict
 
-from daemon import create_proxy
+from daemon import create_proxy, log, profiler, trace, ResponseCache
+from daemon.proxy import upstream_tracker
+from daemon.routing import LiveRoutes
 
 PROXY_PORT = 8080
 
+#: Virtual host configuration, reloaded on SIGHUP or when it changes.
+CONFIG_FILE = "config/proxy.conf"
+
+#: Default address of the admin listener, which is not authenticated.
+ADMIN_IP = "127.0.0.1"
+
+#: Default memory budget of the response cache in megabytes.
+CACHE_SIZE_MB = 64
+
+#: Timeout directives of a host or location block and their option names.
+TIMEOUT_DIRECTIVES = (
+    ('proxy_connect_timeout', 'connect_timeout'),
+    ('proxy_send_timeout', 'send_timeout'),
+    ('proxy_read_timeout', 'read_timeout'),
+    ('proxy_request_deadline', 'request_deadline'),
+)
+
+
+def parse_host_options(block):
+    """
+    Parses the optional per-host directives of a host block.
+
+    :block (str): body of one ``host "..." { ... }`` block.
+    :rtype dict: option name -> value, only for directives present.
+    """
+
+    options = {}
+
+    coalesce_match = re.search(r'proxy_coalesce\s+(on|off)\s*;?', block)
+    if coalesce_match:
+        options['coalesce'] = coalesce_match.group(1) == 'on'
+
+    wait_match = re.search(r'proxy_coalesce_max_wait\s+([\d.]+)', block)
+    if wait_match:
+        options['coalesce_max_wait'] = float(wait_match.group(1))
+
+    waiters_match = re.search(r'proxy_coalesce_max_waiters\s+(\d+)', block)
+    if waiters_match:
+        options['coalesce_max_waiters'] = int(waiters_match.group(1))
+
+    cert_match = re.search(r'\bssl_certificate\s+([^\s;]+)', block)
+    if cert_match:
+        options['ssl_certificate'] = cert_match.group(1)
+
+    key_match = re.search(r'\bssl_certificate_key\s+([^\s;]+)', block)
+    if key_match:
+        options['ssl_certificate_key'] = key_match.group(1)
+
+    for directive, option in TIMEOUT_DIRECTIVES:
+        timeout_match = re.search(r'\b' + directive + r'\s+(\d+(?:\.\d+)?(?:ms|s)?)\s*;?', block)
+        if timeout_match:
+            options[option] = parse_duration(timeout_match.group(1))
+
+    return options
+
+
+def parse_duration(value):
+    """
+    Parses a duration in seconds, with an optional ``ms`` or ``s`` suffix.
+
+    :value (str): e.g. ``2``, ``1.5s`` or ``500ms``.
+    :rtype float: seconds.
+    :raises ValueError: if the value is not a duration.
+    """
+
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)(ms|s)?', value.strip())
+    if not match:
+        raise ValueError("Invalid duration {!r}".format(value))
+    seconds = float(match.group(1))
+    if match.group(2) == 'ms':
+        seconds /= 1000.0
+    return seconds
+
+
+def parse_upstream_params(params):
+    """
+    Parses the ``name=value`` parameters following a proxy_pass address.
+
+    :params (str): e.g. ``max_conns=8 queue=32 queue_timeout=500ms``.
+    :rtype dict: ``max_conns`` and ``queue`` as int, ``queue_timeout`` in
+                 seconds, only for the parameters present.
+    :raises ValueError: on an unknown parameter or an invalid value.
+    """
+
+    parsed = {}
+    for param in params.split():
+        name, sep, value = param.partition('=')
+        if not sep:
+            raise ValueError("Invalid proxy_pass parameter {!r}".format(param))
+        if name in ('max_conns', 'queue'):
+            parsed[name] = int(value)
+        elif name == 'queue_timeout':
+            parsed[name] = parse_duration(value)
+        else:
+            raise ValueError("Unknown proxy_pass parameter {!r}".format(name))
+    return parsed
+
+
+def find_blocks(config_text, keyword):
+    """
+    Finds ``keyword "name" { ... }`` blocks, honouring nested braces.
+
+    :config_text (str): text to search.
+    :keyword (str): block keyword, e.g. ``host`` or ``location``.
+    :rtype list of tuple: (name, body, start, end) for each block, where
+                          start/end delimit the whole block in config_text.
+    :raises ValueError: if a block is not closed.
+    """
+
+    pattern = re.compile(r'\b' + keyword + r'\s+(?:"([^"]+)"|([^\s{]+))\s*\{')
+    blocks = []
+    pos = 0
+    while True:
+        match = pattern.search(config_text, pos)
+        if not match:
+            break
+        name = match.group(1) or match.group(2)
+        depth = 1
+        end = match.end()
+        while end < len(config_text) and depth:
+            if config_text[end] == '{':
+                depth += 1
+            elif config_text[end] == '}':
+                depth -= 1
+            end += 1
+        if depth:
+            raise ValueError("Unclosed {} block {!r}".format(keyword, name))
+        blocks.append((name, config_text[match.end():end - 1], match.start(), end))
+        pos = end
+    return blocks
+
+
+def parse_directives(block):
+    """
+    Parses the proxy_pass, dist_policy and option directives of one block.
+
+    :block (str): block body without nested blocks.
+    :rtype tuple: (list of proxy_pass, dist_policy or None, options dict).
+    """
+
+    # Find all proxy_pass entries, with their optional limits
+    proxy_passes = []
+    limits = {}
+    for upstream, params in re.findall(r'proxy_pass\s+(?:http://|(?=unix:))([^\s;]+)([^;]*);', block):
+        proxy_passes.append(upstream)
+        if params.strip():
+            limits[upstream] = parse_upstream_params(params)
+
+    # Find dist_policy if present
+    policy_match = re.search(r'dist_policy\s+([\w-]+)', block)
+    policy = policy_match.group(1) if policy_match else None
+
+    options = parse_host_options(block)
+    if limits:
+        options['upstream_limits'] = limits
+    if re.search(r'\bdefault_server\s*;', block):
+        options['default_server'] = True
+    return proxy_passes, policy, options
+
 
 def parse_virtual_hosts(config_file):
     """
     Parses virtual host blocks from a config file.
 
+    A host name may be exact (``"app1.local"``, ``"192.168.56.103:8080"``),
+    a leading wildcard (``"*.example.local"``) or ``"_"`` for the default
+    server; ``default_server;`` inside a block also makes it the default.
+    Besides ``proxy_pass`` and ``dist_policy`` a host block accepts the
+    request coalescing options::
+
+        proxy_coalesce on;
+        proxy_coalesce_max_wait 2;        # seconds a waiter may block
+        proxy_coalesce_max_waiters 64;    # waiters sharing one fetch
+
+    the upstream timeouts, in seconds or with an ``ms`` / ``s`` suffix::
+
+        proxy_connect_timeout 2;          # connecting an upstream
+        proxy_send_timeout 10;            # sending it the request
+        proxy_read_timeout 30;            # between two reads of the response
+        proxy_request_deadline 45;        # whole exchange, sent upstream
+
+    Each ``proxy_pass`` may cap the connections the proxy opens to it; a
+    request finding it full goes to another upstream of the block with a
+    free slot, or waits up to ``queue_timeout`` in a FIFO of ``queue``
+    places, and is answered 503 otherwise::
+
+        proxy_pass http://192.168.56.103:9001 max_conns=8 queue=32 queue_timeout=500ms;
+
+    A backend on the same machine can be reached through its Unix domain
+    socket (see ``create_backend(..., unix_socket=...)``)::
+
+        proxy_pass unix:/run/weaprous/app1.sock;
+
+    With ``--tls-port`` the proxy also terminates TLS, choosing the host's
+    certificate by SNI (see :mod:`daemon.tls`)::
+
+        ssl_certificate     config/certs/app1.local.crt;
+        ssl_certificate_key config/certs/app1.local.key;
+
+    and ``location /prefix { ... }`` blocks with the same directives. The
+    longest matching prefix wins; directives missing from a location are
+    inherited from its host.
+
     :config_file (str): Path to the NGINX config file.
-    :rtype list of dict: Each dict contains 'listen'and 'server_name'.
+    :rtype dict: hostname -> (proxy_pass or list of proxy_pass, dist_policy,
+                 options dict). Locations are in ``options['locations']``
+                 as prefix -> (list of proxy_pass, dist_policy, options).
     """
 
     with open(config_file, 'r') as f:
         config_text = f.read()
 
-    # Match each host block
-    host_blocks = re.findall(r'host\s+"([^"]+)"\s*\{(.*?)\}', config_text, re.DOTALL)
+    routes = {}
+    for host, block, _, _ in find_blocks(config_text, 'host'):
 
-    dist_policy_map = ""
+        # Split the location blocks off the host level directives
+        locations = {}
+        host_level = block
+        for prefix, location_block, start, end in reversed(find_blocks(block, 'location')):
+            locations[prefix] = parse_directives(location_block)
+            host_level = host_level[:start] + host_level[end:]
 
-    routes = {}
-    for host, block in host_blocks:
-        
-        proxy_map = {}
-
-        # Find all proxy_pass entries
-        proxy_passes = re.findall(r'proxy_pass\s+http://([^\s;]+);', block)
-        map = proxy_map.get(host,[])
-        map = map + proxy_passes
-        proxy_map[host] = map
-
-        # Find dist_policy if present
-        policy_match = re.search(r'dist_policy\s+(\w+)', block)
-        if policy_match:
-            dist_policy_map = policy_match.group(1)
-        else: #default policy is round_robin
+        proxy_map, dist_policy_map, options = parse_directives(host_level)
+        if dist_policy_map is None: #default policy is round_robin
             dist_policy_map = 'round-robin'
-            
+        if locations:
+            options['locations'] = locations
+
         #
         # @bksysnet: Build the mapping and policy
         # TODO: this policy varies among scenarios 
@@ -89,13 +290,10 @@ def parse_virtual_hosts(config_file):
         #       the policy is applied to identify the highes matching
         #       proxy_pass
         #
-        if len(proxy_map.get(host,[])) == 1:
-            routes[host] = (proxy_map.get(host,[])[0], dist_policy_map)
-        # esle if:
-        #         TODO:  apply further policy matching here
-        #
+        if len(proxy_map) == 1:
+            routes[host] = (proxy_map[0], dist_policy_map, options)
         else:
-            routes[host] = (proxy_map.get(host,[]), dist_policy_map)
+            routes[host] = (proxy_map, dist_policy_map, options)
 
     for key, value in routes.items():
         print (key, value)
@@ -112,16 +310,64 @@ if __name__ == "__main__":
 
     :arg --server-ip (str): IP address to bind the server (default: 127.0.0.1).
     :arg --server-port (int): Port number to bind the server (default: 9000).
+    :arg --cache-size (int): Response cache memory budget in MB, 0 disables it.
+    :arg --cache-dir (str): Optional directory where evicted entries spill.
+    :arg --engine (str): ``thread`` (default) or ``asyncio``.
+    :arg --tls-port (int): Optional TLS listener port (e.g. 8443).
+    :arg --admin-port (int): Optional port of the ``/stats`` and ``/metrics`` listener.
+    :arg --admin-ip (str): IP address of the admin listener (default: 127.0.0.1).
+    :arg --log-level (str): ``debug``, ``info`` (default), ``warning`` or ``error``.
+    :arg --access-log (str): Optional access log path, ``-`` for stdout.
+    :arg --trace-dir (str): Optional directory of the trace file of this process.
+    :arg --profiler (flag): Profile for 10 seconds on SIGUSR1, into a file.
+    :arg --config (str): Virtual host configuration (default: config/proxy.conf).
     """
 
     parser = argparse.ArgumentParser(prog='Proxy', description='', epilog='Proxy daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PROXY_PORT)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE_MB,
+        help='Response cache memory budget in MB, 0 disables it. Default is {}.'.format(CACHE_SIZE_MB))
+    parser.add_argument('--cache-dir', default=None,
+        help='Directory where entries evicted from memory spill to disk.')
+    parser.add_argument('--engine', choices=['thread', 'asyncio'], default='thread',
+        help='Proxy engine: one thread per client or a single asyncio loop.')
+    parser.add_argument('--tls-port', type=int, default=None,
+        help='Also accept TLS on this port, with the ssl_certificate of each host.')
+    parser.add_argument('--admin-port', type=int, default=None,
+        help='Serve upstream statistics on /stats (JSON) and /metrics (Prometheus) on this port.')
+    parser.add_argument('--admin-ip', default=ADMIN_IP,
+        help='Address of the admin listener. Default is {}.'.format(ADMIN_IP))
+    parser.add_argument('--log-level', choices=sorted(log.LEVEL_NAMES), default=None,
+        help='Log level, debug shows every request. Default is info.')
+    parser.add_argument('--access-log', default=None,
+        help='Write one JSON access record per request to this file, - for stdout.')
+    parser.add_argument('--trace-dir', default=None,
+        help='Record request spans to a Chrome trace file in this directory.')
+    parser.add_argument('--config', default=CONFIG_FILE,
+        help='Virtual host configuration file. Default is {}.'.format(CONFIG_FILE))
+    parser.add_argument('--profiler', action='store_true',
+        help='Write a sampling profile of {:g}s to ${} (default: the temp dir) on SIGUSR1.'
+             .format(profiler.DEFAULT_SECONDS, profiler.PROFILE_DIR_ENV))
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
+    log.configure(level=args.log_level, access_log=args.access_log)
+    trace.configure(args.trace_dir)
+    if args.profiler and profiler.install():
+        print("[Proxy] SIGUSR1 profiles for {:g}s".format(profiler.DEFAULT_SECONDS))
+
+    cache = None
+    if args.cache_size > 0:
+        cache = ResponseCache(max_bytes=args.cache_size * 1024 * 1024,
+                              cache_dir=args.cache_dir)
 
-    routes = parse_virtual_hosts("config/proxy.conf")
+    routes = LiveRoutes(lambda: parse_virtual_hosts(args.config),
+                        upstream_tracker, watch=args.config)
     print("route create success fully")
-    create_proxy(ip, port, routes)
+    admin_address = None
+    if args.admin_port is not None:
+        admin_address = (args.admin_ip, args.admin_port)
+    create_proxy(ip, port, routes, cache, engine=args.engine, tls_port=args.tls_port,
+                 admin_address=admin_address)
@@ -28,6 +28,7 @@ import json
 import socket
 import argparse
 
+from daemon import log, timeouts, trace
 from daemon.weaprous import WeApRous
 
 PORT = 8000  # Default port
@@ -65,11 +66,51 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(prog='Backend', description='', epilog='Beckend daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PORT)
+    parser.add_argument('--unix-socket', default=None,
+        help='Listen on this Unix domain socket path instead of IP and port.')
+    parser.add_argument('--metrics', action='store_true',
+        help='Serve Prometheus metrics on GET /metrics.')
+    parser.add_argument('--log-level', choices=sorted(log.LEVEL_NAMES), default=None,
+        help='Log level, debug shows every request. Default is info.')
+    parser.add_argument('--access-log', default=None,
+        help='Write one JSON access record per request to this file, - for stdout.')
+    parser.add_argument('--trace-dir', default=None,
+        help='Record request spans to a Chrome trace file in this directory.')
+    parser.add_argument('--profiler', action='store_true',
+        help='Serve a sampling profiler on /profile and profile on SIGUSR1.')
+    parser.add_argument('--rate-limit', type=float, default=None,
+        help='Requests per second of a client IP; 429 beyond it.')
+    parser.add_argument('--max-in-flight', type=int, default=None,
+        help='Requests answered at the same time; 503 beyond it.')
+    parser.add_argument('--trusted-proxy', action='append', default=None,
+        help='Address of a proxy whose X-Forwarded-For names the client; repeatable.')
+    parser.add_argument('--max-connections', type=int, default=timeouts.MAX_CONNECTIONS,
+        help='Open connections at most; 503 beyond it.')
+    parser.add_argument('--header-timeout', type=float, default=timeouts.HEADER_TIMEOUT,
+        help='Seconds for a client to send its request headers.')
+    parser.add_argument('--body-timeout', type=float, default=timeouts.BODY_TIMEOUT,
+        help='Seconds for a client to send its request body.')
+    parser.add_argument('--write-timeout', type=float, default=timeouts.WRITE_TIMEOUT,
+        help='Seconds for a client to read the response.')
+    parser.add_argument('--idle-timeout', type=float, default=timeouts.IDLE_TIMEOUT,
+        help='Seconds a connection may wait idle for its request.')
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
+    log.configure(level=args.log_level, access_log=args.access_log)
+    trace.configure(args.trace_dir)
+    timeouts.configure(header=args.header_timeout, body=args.body_timeout,
+                       write=args.write_timeout, idle=args.idle_timeout,
+                       max_connections=args.max_connections)
 
     # Prepare and launch the RESTful application
-    app.prepare_address(ip, port)
+    if args.metrics:
+        app.enable_metrics()
+    if args.profiler:
+        app.enable_profiler()
+    if args.rate_limit or args.max_in_flight:
+        app.enable_rate_limit(rate=args.rate_limit, max_in_flight=args.max_in_flight,
+                              trusted_proxies=args.trusted_proxy)
+    app.prepare_address(ip, port, args.unix_socket)
     app.run()
\ No newline at end of file
@@ -0,0 +1,84 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+Shared fixtures. The daemons are exercised in-process over a
+:class:`MemoryTransport <daemon.transport.MemoryTransport>`, so that the
+tests need no free ports and run the same everywhere.
+"""
+
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from daemon import proxy  # noqa: E402
+from daemon.transport import MemoryTransport  # noqa: E402
+
+
+@pytest.fixture
+def net():
+    """An in-memory network, also used by the proxy for its upstreams."""
+    network = MemoryTransport(latency=0.0005, seed=1)
+    saved = proxy.proxy_transport
+    proxy.proxy_transport = network
+    yield network
+    proxy.proxy_transport = saved
+
+
+@pytest.fixture
+def upstream(net):
+    """
+    Start upstreams on :func:`net` that read one request head per
+    connection, answer it with fixed bytes and close.
+
+    :rtype callable: ``(ip, port, response) -> list`` of the request heads
+                     received.
+    """
+    stop = threading.Event()
+    started = []
+
+    def serve(listener, response, heads):
+        while not stop.is_set():
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                continue
+            data = b''
+            while b'\r\n\r\n' not in data:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+            heads.append(data)
+            conn.sendall(response)
+            conn.close()
+
+    def start(ip, port, response):
+        listener = net.listen(ip, port)
+        heads = []
+        thread = threading.Thread(target=serve, args=(listener, response, heads), daemon=True)
+        thread.start()
+        started.append((listener, thread))
+        return heads
+
+    yield start
+    stop.set()
+    for listener, thread in started:
+        thread.join(5)
+        net.unregister(listener)
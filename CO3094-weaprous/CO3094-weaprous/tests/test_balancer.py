@@ -0,0 +1,109 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""Upstream load accounting: p2c-ewma with failing upstreams, max_conns queues."""
+
+import random
+import threading
+import time
+
+import pytest
+
+from daemon import proxy
+from daemon.balancer import (DEFAULT_RTT, FAILURE_PENALTY, ConnectionLimiter,
+                             UpstreamBusy, UpstreamTracker)
+from daemon.routing import compile_routes
+
+OK = b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok'
+
+
+def test_p2c_avoids_a_refusing_upstream():
+    tracker = UpstreamTracker(rng=random.Random(7))
+    picks = {'good': 0, 'dead': 0}
+    for _ in range(2000):
+        selected = tracker.pick_p2c(['good', 'dead'])
+        picks[selected] += 1
+        if selected == 'good':
+            tracker.release(selected, latency=0.020)
+        else:
+            tracker.release(selected, failed=True)
+    assert picks['dead'] <= 5
+
+
+def test_failed_upstream_is_tried_again_once_the_penalty_decays():
+    tracker = UpstreamTracker(decay=0.05)
+    tracker.acquire('dead')
+    tracker.release('dead', failed=True)
+    assert tracker.cost('dead') >= FAILURE_PENALTY * 0.5
+    time.sleep(0.5)
+    assert tracker.cost('dead') < DEFAULT_RTT * 2
+
+
+def test_limiter_queues_in_arrival_order():
+    limiter = ConnectionLimiter()
+    limiter.configure({'up': (1, 2, 5.0)})
+    assert limiter.try_admit('up')
+    assert not limiter.try_admit('up')
+    order = []
+
+    def waiter(name):
+        limiter.wait('up')
+        order.append(name)
+
+    threads = []
+    for name in ('first', 'second'):
+        thread = threading.Thread(target=waiter, args=(name,))
+        thread.start()
+        threads.append(thread)
+        # Let the waiter queue before the next one
+        time.sleep(0.05)
+    assert limiter.snapshot()['up']['waiting'] == 2
+    limiter.release('up')
+    threads[0].join(5)
+    limiter.release('up')
+    threads[1].join(5)
+    assert order == ['first', 'second']
+    assert limiter.snapshot()['up']['queued'] == 2
+
+
+def test_limiter_rejects_when_the_queue_is_full():
+    limiter = ConnectionLimiter()
+    limiter.configure({'up': (1, 0, 5.0)})
+    assert limiter.try_admit('up')
+    with pytest.raises(UpstreamBusy, match='queue full'):
+        limiter.wait('up')
+    assert limiter.snapshot()['up']['rejected'] == 1
+
+
+def test_limiter_wait_times_out():
+    limiter = ConnectionLimiter()
+    limiter.configure({'up': (1, 1, 0.05)})
+    assert limiter.try_admit('up')
+    with pytest.raises(UpstreamBusy, match='queue timeout'):
+        limiter.wait('up')
+    snapshot = limiter.snapshot()['up']
+    assert snapshot['timeouts'] == 1 and snapshot['waiting'] == 0
+    # The slot was never handed to the timed out waiter
+    limiter.release('up')
+    assert limiter.try_admit('up')
+
+
+def test_proxy_routes_around_a_refusing_upstream(net, upstream):
+    heads = upstream('10.0.2.1', 9001, OK)
+    # Nothing listens on 10.0.2.2:9001, connections to it are refused.
+    table = compile_routes({'app': (['10.0.2.1:9001', '10.0.2.2:9001'], 'p2c-ewma')},
+                           proxy.upstream_tracker)
+    request = 'GET / HTTP/1.1\r\nHost: app\r\n\r\n'
+    answers = [proxy.proxy_exchange('app', request, table) for _ in range(100)]
+    failed = sum(answer is proxy.FORWARD_ERROR for answer in answers)
+    assert failed <= 2
+    assert len(heads) == 100 - failed
@@ -0,0 +1,113 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""Freshness and revalidation of static files through the proxy cache."""
+
+import pytest
+
+from daemon import proxy, response
+from daemon.cache import ResponseCache
+from daemon.request import Request
+from daemon.response import STATIC_MAX_AGE, Response
+from daemon.routing import compile_routes
+
+ROUTES = compile_routes({'app': ('127.0.0.1:9000', 'round-robin')}, proxy.upstream_tracker)
+
+CSS = 'GET /css/site.css HTTP/1.1\r\nHost: app\r\n{}\r\n'
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """
+    Serve ``tmp_path/static`` with the backend's :class:`Response` in place
+    of the upstream connections of the proxy.
+
+    :rtype list: the requests the backend received.
+    """
+    (tmp_path / 'static' / 'css').mkdir(parents=True)
+    (tmp_path / 'static' / 'css' / 'site.css').write_text('body { color: red }')
+    monkeypatch.setattr(response, 'BASE_DIR', str(tmp_path) + '/')
+    received = []
+
+    def forward(host, port, request, *args, **kwargs):
+        received.append(request)
+        return Response().build_response(Request().prepare(request, {}))
+
+    monkeypatch.setattr(proxy, 'forward_request', forward)
+    return received
+
+
+def head_of(raw):
+    return raw.split(b'\r\n\r\n', 1)[0].decode('latin-1')
+
+
+def test_static_file_has_a_lifetime_and_validators(backend):
+    raw = proxy.proxy_exchange('app', CSS.format(''), ROUTES)
+    head = head_of(raw)
+    assert 'Cache-Control: max-age={}'.format(STATIC_MAX_AGE) in head
+    assert 'ETag: "' in head and 'Last-Modified: ' in head
+    assert 'Pragma' not in head
+    assert raw.endswith(b'body { color: red }')
+
+
+def test_backend_answers_a_matching_validator_with_304(backend):
+    etag = head_of(proxy.proxy_exchange('app', CSS.format(''), ROUTES)).split('ETag: ', 1)[1].split('\r\n')[0]
+    raw = proxy.proxy_exchange('app', CSS.format('If-None-Match: {}\r\n'.format(etag)), ROUTES)
+    assert raw.startswith(b'HTTP/1.1 304 Not Modified\r\n')
+    assert raw.endswith(b'\r\n\r\n') and b'Content-Length' not in raw
+    raw = proxy.proxy_exchange('app', CSS.format('If-None-Match: "other"\r\n'), ROUTES)
+    assert raw.startswith(b'HTTP/1.1 200 OK\r\n')
+
+
+def test_fresh_entry_is_served_from_the_cache(backend):
+    cache = ResponseCache()
+    first = proxy.cached_exchange('app', CSS.format(''), ROUTES, cache)
+    second = proxy.cached_exchange('app', CSS.format(''), ROUTES, cache)
+    assert b'X-Cache: MISS' in first and b'X-Cache: HIT' in second
+    assert second.endswith(b'body { color: red }')
+    assert len(backend) == 1
+
+
+def test_stale_entry_is_revalidated(backend):
+    cache = ResponseCache()
+    proxy.cached_exchange('app', CSS.format(''), ROUTES, cache)
+    entry = cache.lookup(('app', '/css/site.css'), {})
+    entry.stored_at -= STATIC_MAX_AGE + 1
+    assert not entry.is_fresh()
+    raw = proxy.cached_exchange('app', CSS.format(''), ROUTES, cache)
+    assert b'X-Cache: REVALIDATED' in raw
+    assert raw.endswith(b'body { color: red }')
+    # The backend was asked with the validator and answered 304
+    assert 'If-None-Match: {}'.format(entry.etag) in backend[-1]
+    assert entry.is_fresh()
+
+
+def test_changed_file_replaces_the_stale_entry(backend, tmp_path):
+    cache = ResponseCache()
+    proxy.cached_exchange('app', CSS.format(''), ROUTES, cache)
+    cache.lookup(('app', '/css/site.css'), {}).stored_at -= STATIC_MAX_AGE + 1
+    (tmp_path / 'static' / 'css' / 'site.css').write_text('body { color: blue }')
+    raw = proxy.cached_exchange('app', CSS.format(''), ROUTES, cache)
+    assert b'X-Cache: MISS' in raw and raw.endswith(b'body { color: blue }')
+    raw = proxy.cached_exchange('app', CSS.format(''), ROUTES, cache)
+    assert b'X-Cache: HIT' in raw and raw.endswith(b'body { color: blue }')
+
+
+def test_responses_are_not_shared_between_cookies(backend):
+    cache = ResponseCache()
+    proxy.cached_exchange('app', CSS.format('Cookie: auth=true\r\n'), ROUTES, cache)
+    raw = proxy.cached_exchange('app', CSS.format('Cookie: auth=other\r\n'), ROUTES, cache)
+    assert b'X-Cache: MISS' in raw
+    raw = proxy.cached_exchange('app', CSS.format('Cookie: auth=true\r\n'), ROUTES, cache)
+    assert b'X-Cache: HIT' in raw
+    raw = proxy.cached_exchange('app', CSS.format('Authorization: Basic eDp5\r\n'), ROUTES, cache)
+    assert b'X-Cache: BYPASS' in raw
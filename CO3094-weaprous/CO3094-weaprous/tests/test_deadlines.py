@@ -0,0 +1,79 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""The backend sheds requests whose X-Deadline-Ms budget ran out."""
+
+import socket
+import threading
+import time
+
+from daemon.httpadapter import HttpAdapter
+from daemon.weaprous import WeApRous
+
+
+def make_app(calls):
+    app = WeApRous()
+
+    @app.route('/ping', methods=['GET'])
+    def ping(headers, body):
+        calls.append(headers)
+        return {'pong': True}
+
+    return app
+
+
+def exchange(routes, message, delay):
+    """Wait ``delay`` seconds on the connection, send ``message``, read the answer."""
+    server, client = socket.socketpair()
+    adapter = HttpAdapter('127.0.0.1', 0, server, ('127.0.0.1', 40000), routes)
+    thread = threading.Thread(target=adapter.handle_client,
+                              args=(server, ('127.0.0.1', 40000), routes))
+    thread.start()
+    try:
+        time.sleep(delay)
+        client.sendall(message)
+        client.settimeout(5)
+        answer = b''
+        while True:
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            answer += chunk
+        return answer
+    finally:
+        thread.join(5)
+        client.close()
+
+
+def request(budget_ms):
+    return 'GET /ping HTTP/1.1\r\nHost: app\r\nX-Deadline-Ms: {}\r\n\r\n'.format(budget_ms).encode()
+
+
+def test_request_within_budget_is_answered():
+    calls = []
+    answer = exchange(make_app(calls).routes, request(5000), delay=0.0)
+    assert answer.startswith(b'HTTP/1.1 200')
+    assert len(calls) == 1
+
+
+def test_request_whose_budget_ran_out_while_arriving_is_shed():
+    calls = []
+    answer = exchange(make_app(calls).routes, request(50), delay=0.2)
+    assert answer.startswith(b'HTTP/1.1 504')
+    assert calls == []
+
+
+def test_spent_budget_is_shed_at_once():
+    calls = []
+    answer = exchange(make_app(calls).routes, request(0), delay=0.0)
+    assert answer.startswith(b'HTTP/1.1 504')
+    assert calls == []
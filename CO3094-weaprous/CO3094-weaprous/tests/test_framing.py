@@ -0,0 +1,121 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""Reframing of upstream responses for persistent client connections."""
+
+import socket
+import threading
+
+from daemon import proxy
+from daemon.framing import reframe_response
+from daemon.routing import compile_routes
+
+
+def test_missing_length_is_added():
+    out = reframe_response(b'HTTP/1.1 200 OK\r\n\r\nhello', 'GET', True)
+    assert out == b'HTTP/1.1 200 OK\r\nContent-Length: 5\r\nConnection: keep-alive\r\n\r\nhello'
+
+
+def test_bytes_past_the_length_are_dropped():
+    out = reframe_response(b'HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\nabcdef', 'GET', True)
+    assert out.endswith(b'Connection: keep-alive\r\n\r\nabc')
+
+
+def test_head_and_bodiless_statuses_lose_their_body():
+    assert reframe_response(b'HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\nabc',
+                            'HEAD', True).endswith(b'\r\n\r\n')
+    out = reframe_response(b'HTTP/1.1 304 Not Modified\r\nContent-Length: 3\r\n\r\nabc', 'GET', True)
+    assert b'Content-Length' not in out and out.endswith(b'\r\n\r\n')
+
+
+def test_upstream_connection_headers_are_replaced():
+    out = reframe_response(b'HTTP/1.1 200 OK\r\nConnection: close\r\nKeep-Alive: x\r\n'
+                           b'Content-Length: 0\r\n\r\n', 'GET', True, 'timeout=5')
+    assert out == (b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\nConnection: keep-alive\r\n'
+                   b'Keep-Alive: timeout=5\r\n\r\n')
+
+
+def test_short_body_closes_the_connection():
+    out = reframe_response(b'HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\nabc', 'GET', True)
+    assert b'Connection: close' in out
+    assert b'keep-alive' not in out
+
+
+def test_unterminated_chunked_body_closes_the_connection():
+    truncated = b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n'
+    assert b'Connection: close' in reframe_response(truncated, 'GET', True)
+    complete = truncated + b'0\r\n\r\n'
+    assert b'Connection: keep-alive' in reframe_response(complete, 'GET', True)
+
+
+def serve_pipelined(monkeypatch, upstream_response, requests):
+    """
+    Send pipelined ``requests`` to the proxy over a socket pair, every one
+    answered ``upstream_response`` by the upstream; read until close.
+    """
+    monkeypatch.setattr(proxy, 'forward_request', lambda *args, **kwargs: upstream_response)
+    table = compile_routes({'app': ('10.0.1.1:9001', 'round-robin')}, proxy.upstream_tracker)
+    server, client = socket.socketpair()
+    thread = threading.Thread(target=proxy.handle_client,
+                              args=('127.0.0.1', 8080, server, ('127.0.0.1', 40000), table))
+    thread.start()
+    client.sendall(requests)
+    client.settimeout(5)
+    answer = b''
+    while True:
+        chunk = client.recv(65536)
+        if not chunk:
+            break
+        answer += chunk
+    thread.join(5)
+    client.close()
+    return answer
+
+
+def test_proxy_stops_after_a_truncated_response(monkeypatch):
+    request = b'GET /a HTTP/1.1\r\nHost: app\r\n\r\n'
+    answer = serve_pipelined(monkeypatch, b'HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\nabc',
+                             request * 2)
+    assert answer.count(b'HTTP/1.1 ') == 1
+    assert b'Connection: close' in answer and answer.endswith(b'\r\n\r\nabc')
+
+
+def exchange_through_proxy(net, table, requests):
+    """Send pipelined ``requests`` to an in-memory proxy, read until close."""
+    listener = net.listen('10.0.1.9', 8080)
+    try:
+        client = net.connect('10.0.1.9', 8080, timeout=5)
+        conn, addr = listener.accept()
+        thread = threading.Thread(target=proxy.handle_client,
+                                  args=('10.0.1.9', 8080, conn, addr, table))
+        thread.start()
+        client.sendall(requests)
+        answer = b''
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            answer += chunk
+        thread.join(5)
+        return answer
+    finally:
+        net.unregister(listener)
+
+
+def test_proxy_keeps_a_complete_response_alive(net, upstream):
+    upstream('10.0.1.2', 9001, b'HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\nabc')
+    table = compile_routes({'app': ('10.0.1.2:9001', 'round-robin')}, proxy.upstream_tracker)
+    first = b'GET /a HTTP/1.1\r\nHost: app\r\n\r\n'
+    last = b'GET /b HTTP/1.1\r\nHost: app\r\nConnection: close\r\n\r\n'
+    answer = exchange_through_proxy(net, table, first + last)
+    assert answer.count(b'HTTP/1.1 200 OK') == 2
+    assert b'Connection: keep-alive' in answer
@@ -0,0 +1,117 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""HPACK against the examples of RFC 7541 Appendix C."""
+
+import pytest
+
+from daemon.hpack import (Decoder, Encoder, HPACKError, decode_integer, encode_integer,
+                          huffman_decode, huffman_encode)
+
+
+def block(text):
+    return bytes.fromhex(text.replace(' ', '').replace('\n', ''))
+
+
+@pytest.mark.parametrize('value, prefix, encoded', [
+    (10, 5, b'\x0a'),           # C.1.1
+    (1337, 5, b'\x1f\x9a\x0a'),  # C.1.2
+    (42, 8, b'\x2a'),           # C.1.3
+])
+def test_integer_representation(value, prefix, encoded):
+    assert encode_integer(value, prefix) == encoded
+    assert decode_integer(encoded, 0, prefix) == (value, len(encoded))
+
+
+def test_requests_with_huffman_coding():
+    """C.4: three requests on one connection, sharing the dynamic table."""
+    decoder = Decoder()
+    assert decoder.decode(block('8286 8441 8cf1 e3c2 e5f2 3a6b a0ab 90f4 ff')) == [
+        (':method', 'GET'), (':scheme', 'http'), (':path', '/'),
+        (':authority', 'www.example.com'),
+    ]
+    assert decoder.dynamic == [(':authority', 'www.example.com')]
+    assert decoder._size == 57
+
+    assert decoder.decode(block('8286 84be 5886 a8eb 1064 9cbf')) == [
+        (':method', 'GET'), (':scheme', 'http'), (':path', '/'),
+        (':authority', 'www.example.com'), ('cache-control', 'no-cache'),
+    ]
+    assert decoder.dynamic == [('cache-control', 'no-cache'), (':authority', 'www.example.com')]
+    assert decoder._size == 110
+
+    assert decoder.decode(block(
+        '8287 85bf 4088 25a8 49e9 5ba9 7d7f 8925 a849 e95b b8e8 b4bf')) == [
+        (':method', 'GET'), (':scheme', 'https'), (':path', '/index.html'),
+        (':authority', 'www.example.com'), ('custom-key', 'custom-value'),
+    ]
+    assert decoder.dynamic == [('custom-key', 'custom-value'), ('cache-control', 'no-cache'),
+                               (':authority', 'www.example.com')]
+    assert decoder._size == 164
+
+
+def test_responses_with_huffman_coding_and_eviction():
+    """C.6: three responses with a 256 byte table, entries are evicted."""
+    decoder = Decoder(max_table_size=256)
+    assert decoder.decode(block('''
+        4882 6402 5885 aec3 771a 4b61 96d0 7abe 9410 54d4 44a8 2005 9504 0b81
+        66e0 82a6 2d1b ff6e 919d 29ad 1718 63c7 8f0b 97c8 e9ae 82ae 43d3''')) == [
+        (':status', '302'), ('cache-control', 'private'),
+        ('date', 'Mon, 21 Oct 2013 20:13:21 GMT'), ('location', 'https://www.example.com'),
+    ]
+    assert decoder.dynamic == [
+        ('location', 'https://www.example.com'), ('date', 'Mon, 21 Oct 2013 20:13:21 GMT'),
+        ('cache-control', 'private'), (':status', '302'),
+    ]
+    assert decoder._size == 222
+
+    assert decoder.decode(block('4883 640e ffc1 c0bf')) == [
+        (':status', '307'), ('cache-control', 'private'),
+        ('date', 'Mon, 21 Oct 2013 20:13:21 GMT'), ('location', 'https://www.example.com'),
+    ]
+    # (":status", "302") was evicted to make room for (":status", "307")
+    assert decoder.dynamic == [
+        (':status', '307'), ('location', 'https://www.example.com'),
+        ('date', 'Mon, 21 Oct 2013 20:13:21 GMT'), ('cache-control', 'private'),
+    ]
+    assert decoder._size == 222
+
+    assert decoder.decode(block('''
+        88c1 6196 d07a be94 1054 d444 a820 0595 040b 8166 e084 a62d 1bff c05a
+        839b d9ab 77ad 94e7 821d d7f2 e6c7 b335 dfdf cd5b 3960 d5af 2708 7f36
+        72c1 ab27 0fb5 291f 9587 3160 65c0 03ed 4ee5 b106 3d50 07''')) == [
+        (':status', '200'), ('cache-control', 'private'),
+        ('date', 'Mon, 21 Oct 2013 20:13:22 GMT'), ('location', 'https://www.example.com'),
+        ('content-encoding', 'gzip'),
+        ('set-cookie', 'foo=ASDJKHQKBZXOQWEOPIUAXQWEOIU; max-age=3600; version=1'),
+    ]
+    assert decoder.dynamic == [
+        ('set-cookie', 'foo=ASDJKHQKBZXOQWEOPIUAXQWEOIU; max-age=3600; version=1'),
+        ('content-encoding', 'gzip'), ('date', 'Mon, 21 Oct 2013 20:13:22 GMT'),
+    ]
+    assert decoder._size == 215
+
+
+def test_huffman_round_trip():
+    assert huffman_encode(b'www.example.com') == block('f1e3 c2e5 f23a 6ba0 ab90 f4ff')
+    assert huffman_decode(block('f1e3 c2e5 f23a 6ba0 ab90 f4ff')) == b'www.example.com'
+
+
+def test_encoder_output_decodes_to_the_same_headers():
+    headers = [(':status', '200'), ('content-type', 'text/html'), ('x-trace-id', 'abc123'),
+               ('cache-control', 'max-age=60')]
+    assert Decoder().decode(Encoder().encode(headers)) == headers
+
+
+def test_index_out_of_the_table_is_an_error():
+    with pytest.raises(HPACKError):
+        Decoder().decode(b'\xbe')
@@ -0,0 +1,73 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""The backend accounts its requests and serves them on /metrics."""
+
+import socket
+import threading
+
+from daemon import metrics
+from daemon.httpadapter import HttpAdapter
+from daemon.weaprous import WeApRous
+
+ADDR = ('127.0.0.1', 40000)
+
+
+def make_app():
+    app = WeApRous()
+
+    @app.route('/ping', methods=['GET'])
+    def ping(headers, body):
+        return {'pong': True}
+
+    app.enable_metrics()
+    return app
+
+
+def get(routes, path):
+    server, client = socket.socketpair()
+    adapter = HttpAdapter('127.0.0.1', 0, server, ADDR, routes)
+    thread = threading.Thread(target=adapter.handle_client, args=(server, ADDR, routes))
+    thread.start()
+    try:
+        client.sendall('GET {} HTTP/1.1\r\nHost: app\r\n\r\n'.format(path).encode())
+        client.settimeout(5)
+        answer = b''
+        while True:
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            answer += chunk
+        return answer
+    finally:
+        thread.join(5)
+        client.close()
+
+
+def test_metrics_are_served_in_the_prometheus_text_format():
+    routes = make_app().routes
+    get(routes, '/ping')
+    head, _, body = get(routes, '/metrics').partition(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.1 200')
+    assert 'Content-Type: {}'.format(metrics.CONTENT_TYPE).encode() in head
+    assert b'weaprous_requests_total{method="GET",route="/ping"}' in body
+
+
+def test_plain_string_hooks_stay_text_plain():
+    app = WeApRous()
+
+    @app.route('/hello', methods=['GET'])
+    def hello(headers, body):
+        return 'hello'
+
+    head = get(app.routes, '/hello').partition(b'\r\n\r\n')[0]
+    assert b'Content-Type: text/plain\r\n' in head
@@ -0,0 +1,152 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""Token buckets, their expiry and eviction, and the admission limits."""
+
+import socket
+import threading
+
+import pytest
+
+from daemon import proxy, ratelimit
+from daemon.httpadapter import HttpAdapter
+from daemon.proxy import forwarded_for
+from daemon.ratelimit import Limits, TokenBuckets
+from daemon.routing import compile_routes
+from daemon.weaprous import WeApRous
+
+PROXY = ('127.0.0.1', 40000)
+
+
+def test_burst_then_refill():
+    buckets = TokenBuckets(rate=10, burst=2)
+    assert buckets.take('a', now=0.0) == 0
+    assert buckets.take('a', now=0.0) == 0
+    assert buckets.take('a', now=0.0) == pytest.approx(0.1)
+    assert buckets.take('a', now=0.1) == 0
+
+
+def test_full_buckets_expire():
+    buckets = TokenBuckets(rate=10, burst=2)
+    buckets.take('a', now=0.0)
+    buckets.take('b', now=0.1)
+    assert len(buckets) == 2
+    # 'a' is full again after burst / rate = 0.2 s and is dropped
+    buckets.take('c', now=0.25)
+    assert len(buckets) == 2
+    assert 'a' not in buckets._buckets
+
+
+def test_least_recently_used_buckets_are_evicted():
+    buckets = TokenBuckets(rate=1, burst=5, max_keys=100)
+    for client in range(1000):
+        buckets.take(client, now=0.0)
+    assert len(buckets) == 100
+    assert set(buckets._buckets) == set(range(900, 1000))
+    # A request refreshes a bucket, which then outlives older ones
+    buckets.take(900, now=0.0)
+    buckets.take('new', now=0.0)
+    assert 900 in buckets._buckets and 901 not in buckets._buckets
+
+
+def test_refused_request_costs_no_route_token():
+    limits = Limits(rate=1, burst=1, routes={'/poll': (1, 3)})
+    assert limits.admit('c', '/poll') is None
+    limits.release()
+    for _ in range(5):
+        code, retry_after = limits.admit('c', '/poll')
+        assert code == 429 and retry_after > 0
+    # The client bucket refused them all, the route bucket kept its tokens
+    tokens, _ = limits.routes['/poll']._buckets['c']
+    assert tokens == pytest.approx(2, abs=0.01)
+
+
+def test_admission_limits_requests_in_flight():
+    limits = Limits(max_in_flight=1)
+    assert limits.admit('a', None) is None
+    assert limits.admit('b', None) == (503, 1)
+    limits.release()
+    assert limits.admit('b', None) is None
+
+
+def test_forwarded_for_is_trusted_from_proxies_only():
+    limits = Limits(rate=1, trusted_proxies=['127.0.0.1'])
+    assert limits.client_of('127.0.0.1', '10.0.0.1, 10.0.0.7') == '10.0.0.7'
+    assert limits.client_of('10.0.0.9', '10.0.0.7') == '10.0.0.9'
+    assert limits.client_of('127.0.0.1', None) == '127.0.0.1'
+
+
+def test_proxy_appends_its_client_to_forwarded_for():
+    assert forwarded_for(None, ('10.0.0.7', 5000)) == '10.0.0.7'
+    assert forwarded_for('10.0.0.1', ('10.0.0.7', 5000)) == '10.0.0.1, 10.0.0.7'
+
+
+def test_thread_proxy_sends_forwarded_for_upstream(net, upstream):
+    heads = upstream('10.0.4.1', 9001, b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n')
+    table = compile_routes({'app': ('10.0.4.1:9001', 'round-robin')}, proxy.upstream_tracker)
+    listener = net.listen('10.0.4.9', 8080)
+    try:
+        client = net.connect('10.0.4.9', 8080, timeout=5)
+        conn, addr = listener.accept()
+        thread = threading.Thread(target=proxy.handle_client,
+                                  args=('10.0.4.9', 8080, conn, addr, table))
+        thread.start()
+        client.sendall(b'GET / HTTP/1.1\r\nHost: app\r\nX-Forwarded-For: 10.0.0.1\r\n'
+                       b'Connection: close\r\n\r\n')
+        while client.recv(65536):
+            pass
+        thread.join(5)
+    finally:
+        net.unregister(listener)
+    assert 'X-Forwarded-For: 10.0.0.1, {}'.format(addr[0]).encode() in heads[0]
+
+
+@pytest.fixture
+def limited():
+    """Backend routes behind the proxy at :data:`PROXY`, one request per client."""
+    app = WeApRous()
+
+    @app.route('/ping', methods=['GET'])
+    def ping(headers, body):
+        return {'pong': True}
+
+    app.enable_rate_limit(rate=0.01, burst=1, trusted_proxies=[PROXY[0]])
+    yield app.routes
+    ratelimit.limits = None
+
+
+def get_forwarded(routes, client):
+    server, conn = socket.socketpair()
+    adapter = HttpAdapter('127.0.0.1', 0, server, PROXY, routes)
+    thread = threading.Thread(target=adapter.handle_client, args=(server, PROXY, routes))
+    thread.start()
+    try:
+        conn.sendall('GET /ping HTTP/1.1\r\nHost: app\r\nX-Forwarded-For: {}\r\n\r\n'
+                     .format(client).encode())
+        conn.settimeout(5)
+        answer = b''
+        while True:
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            answer += chunk
+        return answer[9:12]
+    finally:
+        thread.join(5)
+        conn.close()
+
+
+def test_forwarded_clients_get_their_own_buckets(limited):
+    assert get_forwarded(limited, '10.0.0.7') == b'200'
+    assert get_forwarded(limited, '10.0.0.7') == b'429'
+    # Same proxy connection address, another client behind it
+    assert get_forwarded(limited, '10.0.0.8') == b'200'
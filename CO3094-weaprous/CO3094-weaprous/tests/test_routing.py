@@ -0,0 +1,153 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""Compiled routing tables and their live reloading."""
+
+import pytest
+
+from daemon.balancer import UpstreamTracker
+from daemon.routing import LiveRoutes, as_routing_table, compile_routes
+
+UPSTREAMS = ['10.0.0.1:80', '10.0.0.2:80', '10.0.0.3:80']
+
+
+def test_policy_state_lasts_across_requests():
+    tracker = UpstreamTracker()
+    table = compile_routes({'app': (UPSTREAMS, 'round-robin')}, tracker)
+    picks = [as_routing_table(table).lookup('app').select()[0] for _ in range(6)]
+    assert picks == UPSTREAMS * 2
+
+
+def test_plain_dicts_are_not_compiled_per_request():
+    with pytest.raises(TypeError):
+        as_routing_table({'app': (UPSTREAMS, 'round-robin')})
+
+
+def test_reload_swaps_the_table_and_the_watcher_stops(tmp_path):
+    config = tmp_path / 'proxy.conf'
+    config.write_text('')
+    hosts = {'app': (UPSTREAMS[:1], 'round-robin')}
+    live = LiveRoutes(lambda: dict(hosts), UpstreamTracker(), watch=str(config))
+    first = live.current
+    hosts['api'] = (UPSTREAMS[1:], 'round-robin')
+    assert live.reload()
+    assert live.generation == 2 and live.current is not first
+    assert set(live.current.routes) == {'app', 'api'}
+    watcher = live.start_watcher(interval=0.01)
+    live.stop_watcher()
+    watcher.join(1)
+    assert not watcher.is_alive()
+
+
+def location_table():
+    return compile_routes({
+        'app.local': ('10.0.1.1:80', 'round-robin', {'locations': {
+            '/api': ('10.0.1.2:80', None, {}),
+            '/api/v2': ('10.0.1.3:80', None, {}),
+            '/static/': ('10.0.1.4:80', None, {'cache': True}),
+        }}),
+    }, UpstreamTracker())
+
+
+@pytest.mark.parametrize('path, upstream', [
+    ('/', '10.0.1.1:80'),
+    ('/index.html', '10.0.1.1:80'),
+    ('/api', '10.0.1.2:80'),
+    ('/api/v1/users', '10.0.1.2:80'),
+    ('/api/v2', '10.0.1.3:80'),
+    ('/api/v2/users', '10.0.1.3:80'),
+    ('/ap', '10.0.1.1:80'),
+    ('/static', '10.0.1.1:80'),
+    ('/static/css/site.css', '10.0.1.4:80'),
+])
+def test_longest_location_prefix_wins(path, upstream):
+    route = location_table().lookup('app.local', path)
+    assert route.upstreams == (upstream,)
+
+
+def test_location_options_extend_the_host_options():
+    table = compile_routes({
+        'app.local': ('10.0.1.1:80', 'round-robin', {'timeout': 5, 'locations': {
+            '/static/': (None, None, {'cache': True}),
+        }}),
+    }, UpstreamTracker())
+    route = table.lookup('app.local', '/static/a.css')
+    assert route.location == '/static/'
+    assert route.upstreams == ('10.0.1.1:80',)
+    assert dict(route.options) == {'timeout': 5, 'cache': True}
+
+
+def host_table():
+    return compile_routes({
+        'app.local': ('10.0.2.1:80', 'round-robin'),
+        '*.app.local': ('10.0.2.2:80', 'round-robin'),
+        '*.api.app.local': ('10.0.2.3:80', 'round-robin'),
+        'fallback.local': ('10.0.2.4:80', 'round-robin', {'default_server': True}),
+    }, UpstreamTracker())
+
+
+@pytest.mark.parametrize('host, upstream', [
+    ('app.local', '10.0.2.1:80'),
+    ('APP.local:8080', '10.0.2.1:80'),
+    ('www.app.local', '10.0.2.2:80'),
+    ('a.b.app.local:80', '10.0.2.2:80'),
+    ('v1.api.app.local', '10.0.2.3:80'),
+    ('api.app.local', '10.0.2.2:80'),
+    ('otherapp.local', '10.0.2.4:80'),
+    ('unknown', '10.0.2.4:80'),
+    ('fallback.local', '10.0.2.4:80'),
+])
+def test_exact_then_longest_wildcard_then_default_host(host, upstream):
+    assert host_table().lookup(host).upstreams == (upstream,)
+
+
+def test_unknown_host_without_default_server_goes_to_the_default_upstream():
+    table = compile_routes({'app.local': ('10.0.2.1:80', 'round-robin')}, UpstreamTracker())
+    assert table.lookup('other.local').upstreams == ('127.0.0.1:9000',)
+
+
+def test_two_default_servers_are_rejected():
+    with pytest.raises(ValueError, match='default'):
+        compile_routes({
+            'a.local': ('10.0.2.1:80', 'round-robin', {'default_server': True}),
+            '_': ('10.0.2.2:80', 'round-robin'),
+        }, UpstreamTracker())
+
+
+LIMITED = {'app': (['10.0.3.1:80', '10.0.3.2:80'], 'round-robin', {
+    'upstream_limits': {'10.0.3.1:80': {'max_conns': 2, 'queue': 4}},
+})}
+
+
+def test_compiling_leaves_the_limits_in_force_alone():
+    tracker = UpstreamTracker()
+    tracker.limiter.configure({'10.0.9.9:80': (1, 0, 1.0)})
+    table = compile_routes(LIMITED, tracker)
+    assert dict(table.limits) == {'10.0.3.1:80': (2, 4, 1.0)}
+    assert tracker.limiter.limits == {'10.0.9.9:80': (1, 0, 1.0)}
+    table.install(tracker)
+    assert tracker.limiter.limits == {'10.0.3.1:80': (2, 4, 1.0)}
+
+
+def test_live_routes_install_the_limits_of_the_table_swapped_in():
+    tracker = UpstreamTracker()
+    hosts = dict(LIMITED)
+    live = LiveRoutes(lambda: dict(hosts), tracker)
+    assert tracker.limiter.limits == {'10.0.3.1:80': (2, 4, 1.0)}
+    hosts['app'] = (['10.0.3.1:80'], 'round-robin', {'upstream_limits': {
+        '10.0.3.1:80': {'max_conns': 0}}})
+    # Invalid, the running table and its limits stay
+    assert not live.reload()
+    assert tracker.limiter.limits == {'10.0.3.1:80': (2, 4, 1.0)}
+    hosts['app'] = (['10.0.3.1:80'], 'round-robin')
+    assert live.reload()
+    assert tracker.limiter.limits == {}
@@ -0,0 +1,138 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""Read and write deadlines, the body limit and the idle reaper."""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from daemon import metrics, timeouts
+from daemon.httpadapter import HttpAdapter
+from daemon.weaprous import WeApRous
+
+ADDR = ('127.0.0.1', 40000)
+
+
+@pytest.fixture
+def short_deadlines():
+    saved = (timeouts.header_timeout, timeouts.body_timeout,
+             timeouts.write_timeout, timeouts.idle_timeout)
+    timeouts.configure(header=0.5, body=0.5, write=0.5, idle=0.2)
+    yield
+    header, body, write, idle = saved
+    timeouts.configure(header=header, body=body, write=write, idle=idle)
+
+
+def counted(metric, labels=()):
+    return metrics.REGISTRY.collect()[1].get((metric.name, labels), 0)
+
+
+def serve(routes=None):
+    """Serve one connection of a socket pair, return (client, thread)."""
+    routes = routes if routes is not None else {}
+    server, client = socket.socketpair()
+    assert timeouts.connections.open(server)
+    adapter = HttpAdapter('127.0.0.1', 0, server, ADDR, routes)
+
+    def run():
+        try:
+            adapter.handle_client(server, ADDR, routes)
+        finally:
+            timeouts.connections.close(server)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return client, thread
+
+
+def read_all(client):
+    client.settimeout(5)
+    answer = b''
+    while True:
+        try:
+            chunk = client.recv(65536)
+        except ConnectionResetError:
+            break
+        if not chunk:
+            break
+        answer += chunk
+    return answer
+
+
+def test_silent_client_is_reaped(short_deadlines):
+    before = counted(metrics.reaped_total)
+    client, thread = serve()
+    time.sleep(0.3)
+    assert timeouts.connections.reap() == 1
+    thread.join(5)
+    assert read_all(client) == b''
+    assert counted(metrics.reaped_total) == before + 1
+
+
+def test_trickled_head_misses_the_header_deadline(short_deadlines):
+    client, thread = serve()
+    # Every byte comes well within the idle timeout, the head never ends
+    for byte in b'GET / HTTP/1.1\r\nHost: app\r\n':
+        try:
+            client.send(bytes([byte]))
+        except OSError:
+            break
+        time.sleep(0.05)
+    thread.join(5)
+    assert read_all(client).startswith(b'HTTP/1.1 408')
+
+
+def test_body_is_not_reaped_but_misses_the_body_deadline(short_deadlines):
+    client, thread = serve()
+    client.sendall(b'POST /login HTTP/1.1\r\nContent-Length: 10\r\n\r\nab')
+    time.sleep(0.3)
+    # The head is in: the reaper leaves the connection to the body deadline
+    assert timeouts.connections.reap() == 0
+    thread.join(5)
+    assert read_all(client).startswith(b'HTTP/1.1 408')
+
+
+def test_oversized_body_is_refused():
+    client, thread = serve()
+    client.sendall('POST /login HTTP/1.1\r\nContent-Length: {}\r\n\r\n'.format(
+        timeouts.MAX_BODY_BYTES + 1).encode())
+    thread.join(5)
+    assert read_all(client).startswith(b'HTTP/1.1 413')
+
+
+def test_oversized_head_is_refused():
+    client, thread = serve()
+    filler = 'X-Filler: {}\r\n'.format('a' * 1000) * (timeouts.MAX_HEADER_BYTES // 1000 + 1)
+    client.sendall('GET / HTTP/1.1\r\nHost: app\r\n{}'.format(filler).encode())
+    thread.join(5)
+    assert read_all(client).startswith(b'HTTP/1.1 431 Request Header Fields Too Large')
+
+
+def test_slow_reader_misses_the_write_deadline(short_deadlines):
+    app = WeApRous()
+
+    @app.route('/big', methods=['GET'])
+    def big(headers, body):
+        return 'x' * (8 * 1024 * 1024)
+
+    before = counted(metrics.timeouts_total, ('write',))
+    client, thread = serve(app.routes)
+    client.sendall(b'GET /big HTTP/1.1\r\nHost: app\r\n\r\n')
+    time.sleep(0.3)
+    assert timeouts.connections.reap() == 0
+    thread.join(5)
+    assert not thread.is_alive()
+    assert counted(metrics.timeouts_total, ('write',)) == before + 1
+    client.close()
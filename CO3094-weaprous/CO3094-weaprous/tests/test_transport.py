@@ -0,0 +1,108 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""A WeApRous backend served over the in-memory transport."""
+
+import threading
+import time
+
+import pytest
+
+from daemon import handoff
+from daemon.backend import run_backend
+from daemon.transport import MemoryTransport
+from daemon.weaprous import WeApRous
+
+#: Body of ``GET /blob``, several segments long.
+BLOB = 'abcdefgh' * 8000
+
+
+@pytest.fixture
+def backend():
+    """Run a backend with an echo route on a given network, stop it after."""
+    threads = []
+
+    def start(network, ip='10.0.3.1', port=9001):
+        app = WeApRous()
+
+        @app.route('/echo', methods=['POST'])
+        def echo(headers, body):
+            return {'echo': body}
+
+        @app.route('/blob', methods=['GET'])
+        def blob(headers, body):
+            return BLOB
+
+        thread = threading.Thread(target=run_backend, args=(ip, port, app.routes, None, network))
+        thread.start()
+        threads.append(thread)
+        deadline = time.monotonic() + 5
+        while (ip, port) not in network.listeners and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    yield start
+    handoff.stopping.set()
+    for thread in threads:
+        thread.join(5)
+    handoff.stopping.clear()
+
+
+def send(network, request, ip='10.0.3.1', port=9001):
+    conn = network.connect(ip, port, timeout=5)
+    conn.sendall(request)
+    answer = b''
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        answer += chunk
+    conn.close()
+    return answer
+
+
+def post(network, payload):
+    body = payload.encode()
+    return send(network, 'POST /echo HTTP/1.1\r\nHost: app\r\nContent-Type: text/plain\r\n'
+                'Content-Length: {}\r\n\r\n'.format(len(body)).encode() + body)
+
+
+def test_backend_answers_over_memory(backend):
+    network = MemoryTransport()
+    backend(network)
+    answer = post(network, 'hello')
+    assert answer.startswith(b'HTTP/1.1 200')
+    assert b'hello' in answer
+    assert network.stats['connections'] == 1
+
+
+def test_latency_is_simulated(backend):
+    network = MemoryTransport(latency=0.02)
+    backend(network)
+    started = time.monotonic()
+    post(network, 'x')
+    # Handshake round trip, then the request and the response one way each
+    assert time.monotonic() - started >= 4 * 0.02
+
+
+def test_lost_segments_are_retransmitted_in_order(backend):
+    network = MemoryTransport(loss=0.5, rto=0.01, seed=3)
+    backend(network)
+    answer = send(network, b'GET /blob HTTP/1.1\r\nHost: app\r\n\r\n')
+    assert answer.endswith(b'\r\n\r\n' + BLOB.encode())
+    assert network.stats['lost'] > 0
+
+
+def test_nothing_listening_is_refused():
+    network = MemoryTransport()
+    with pytest.raises(ConnectionRefusedError):
+        network.connect('10.0.3.9', 9001, timeout=1)
+    assert network.stats['refused'] == 1
@@ -234,11 +234,28 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(prog='Backend', description='', epilog='Beckend daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PORT)
+    parser.add_argument('--metrics', action='store_true',
+        help='Serve Prometheus metrics on GET /metrics.')
+    parser.add_argument('--profiler', action='store_true',
+        help='Serve a sampling profiler on /profile and profile on SIGUSR1.')
+    parser.add_argument('--rate-limit', type=float, default=None,
+        help='Requests per second of a client IP; 429 beyond it.')
+    parser.add_argument('--max-in-flight', type=int, default=None,
+        help='Requests answered at the same time; 503 beyond it.')
+    parser.add_argument('--trusted-proxy', action='append', default=None,
+        help='Address of a proxy whose X-Forwarded-For names the client; repeatable.')
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
     # Prepare and launch the RESTful application
+    if args.metrics:
+        app.enable_metrics()
+    if args.profiler:
+        app.enable_profiler()
+    if args.rate_limit or args.max_in_flight:
+        app.enable_rate_limit(rate=args.rate_limit, max_in_flight=args.max_in_flight,
+                              trusted_proxies=args.trusted_proxy)
     app.prepare_address(ip, port)
     app.run()